@@ -1,6 +1,9 @@
 # main.py
 from __future__ import annotations
 
+import asyncio
+import os
+import sys
 from contextlib import asynccontextmanager
 from typing import AsyncIterator
 
@@ -46,11 +49,9 @@ from routers.auction_session_winner_prints import router as auction_session_winn
 from routers.auction_documents_print import router as auction_documents_print_router
 from fastapi_account_manager.middlewares.rbac_guard import rbac_guard_middleware
 from routers.invoice_exports import router as invoice_exports_router
-from routers.billing import router as billing_router
 
 from routers.auction_banned_persons import router as auction_banned_persons_router
 from routers.guide import router as guide_router
-from routers.forms import router as forms_router
 
 # ✅ Lots (tách từ projects.py)
 from routers.lots import router as lots_router  # <-- NEW
@@ -66,8 +67,53 @@ from routers import deposit_refunds
 from routers.auction_prints import router as auction_prints_router
 from routers import auction_session_display
 
-#Mobile
-from routers.mobile.wire import mount_routers as mount_mobile_routers
+from routers.lazy_mount import load_all_lazy, mount_lazy
+from utils.pdf_render_pool import start_pdf_pool, stop_pdf_pool
+from utils.bid_ticket_qr import stop_qr_pool
+from utils.templates import TEMPLATE_PRECOMPILE, precompile_templates
+from routers.mobile.ingest_spool import resume_pending_flush as resume_ingest_spool, stop_flusher as stop_ingest_spool
+
+# LAZY_ROUTERS=1: biểu mẫu/docgen, billing, mobile mirror chỉ import khi có request
+# đầu tiên (hoặc khi warmup sau LAZY_ROUTERS_WARMUP_SECONDS; <0 = không warmup).
+LAZY_ROUTERS = os.getenv("LAZY_ROUTERS", "0").strip().lower() in ("1", "true", "yes")
+LAZY_ROUTERS_WARMUP_SECONDS = float(os.getenv("LAZY_ROUTERS_WARMUP_SECONDS", "30"))
+
+# PDF_RENDER_WARMUP=1: spawn + warm process pool render PDF ngay sau startup
+PDF_RENDER_WARMUP = os.getenv("PDF_RENDER_WARMUP", "1").strip().lower() in ("1", "true", "yes")
+
+# ROUTE_DUMP=1: in danh sách route bank lúc startup (debug)
+ROUTE_DUMP = os.getenv("ROUTE_DUMP", "0").strip().lower() in ("1", "true", "yes")
+
+
+def _include_forms(app: FastAPI) -> None:
+    from routers.forms import router as forms_router
+
+    app.include_router(forms_router)
+
+
+def _include_billing(app: FastAPI) -> None:
+    from routers.billing import router as billing_router
+
+    app.include_router(billing_router)
+
+
+def _include_mobile(app: FastAPI) -> None:
+    #Mobile
+    from routers.mobile.wire import mount_routers as mount_mobile_routers
+
+    mount_mobile_routers(app)
+
+
+def _include_rare(app: FastAPI, *, name: str, prefixes: tuple[str, ...], loader) -> None:
+    if LAZY_ROUTERS:
+        mount_lazy(app, name=name, prefixes=prefixes, loader=loader)
+    else:
+        loader(app)
+
+
+async def _warmup_lazy_routers(app: FastAPI) -> None:
+    await asyncio.sleep(LAZY_ROUTERS_WARMUP_SECONDS)
+    load_all_lazy(app)
 
 
 def _dump_bank_routes(app: FastAPI) -> None:
@@ -87,9 +133,24 @@ def _dump_bank_routes(app: FastAPI) -> None:
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     # --- startup ---
-    _dump_bank_routes(app)
+    if ROUTE_DUMP:
+        _dump_bank_routes(app)
+    warmup = None
+    if LAZY_ROUTERS and LAZY_ROUTERS_WARMUP_SECONDS >= 0:
+        warmup = asyncio.create_task(_warmup_lazy_routers(app))
+    pdf_warmup = asyncio.create_task(start_pdf_pool()) if PDF_RENDER_WARMUP else None
+    tpl_warmup = asyncio.create_task(asyncio.to_thread(precompile_templates)) if TEMPLATE_PRECOMPILE else None
+    resume_ingest_spool()
     yield
+    for task in (warmup, pdf_warmup, tpl_warmup):
+        if task is not None and not task.done():
+            task.cancel()
     # --- shutdown ---
+    stop_pdf_pool()
+    stop_qr_pool()
+    await stop_ingest_spool()
+    if "routers.mobile.service_a_client" in sys.modules:  # mirror mobile nạp lười
+        await sys.modules["routers.mobile.service_a_client"].aclose_proxy_client()
     # (nếu cần đóng kết nối/cleanup thì thêm ở đây)
 
 
@@ -136,7 +197,7 @@ app.include_router(company_mailers.router)
 app.include_router(auction_docs.router)
 app.include_router(bid_tickets_router.router)
 app.include_router(invoice_exports_router)
-app.include_router(billing_router)
+_include_rare(app, name="billing", prefixes=("/billing",), loader=_include_billing)
 
 # Bid attendance (list/print) + exclusions (detail/exclude/clear)
 app.include_router(bid_attendance_router.router)
@@ -160,10 +221,15 @@ app.include_router(auction_documents_print_router)  # <-- NEW (attendance, futur
 
 app.include_router(auction_banned_persons_router)
 app.include_router(guide_router)
-app.include_router(forms_router)
+_include_rare(app, name="forms", prefixes=("/bieu-mau",), loader=_include_forms)
 
 #Mobile
-mount_mobile_routers(app)
+_include_rare(
+    app,
+    name="mobile",
+    prefixes=("/apis/mobile/v1", "/api/mobile"),
+    loader=_include_mobile,
+)
 
 @app.get("/healthz")
 def healthz():
@@ -9,11 +9,16 @@ from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 
 from utils.templates import templates
 from utils.auth import get_access_token
+from utils.live_hub import LIVE_HUB_POLL_MS, LiveHub, subscriber_scope
+from services.session_progress import invalidate_session_progress_for_path
 
 router = APIRouter(tags=["auction_counting"])
 
 SERVICE_A_BASE_URL = os.getenv("SERVICE_A_BASE_URL", "http://127.0.0.1:8824")
 
+# 1 poller / (người xem đã verify, dự án, phiên) cho màn hình kiểm phiếu
+_snapshot_hub = LiveHub("counting_display")
+
 
 def _log(msg: str):
     print(f"[AUCTION_COUNTING_B] {msg}")
@@ -61,6 +66,7 @@ async def _post_json(path: str, token: str, payload: Dict[str, Any] | None = Non
         except Exception as e:
             _log(f"← EXC {url} error={e}")
             return 599, {"detail": str(e)}
+    invalidate_session_progress_for_path(path)
     try:
         js = r.json()
         _log(f"← {r.status_code} {url} json={_preview_body(js)}")
@@ -79,6 +85,7 @@ async def _put_json(path: str, token: str, payload: Dict[str, Any]):
         except Exception as e:
             _log(f"← EXC {url} error={e}")
             return 599, {"detail": str(e)}
+    invalidate_session_progress_for_path(path)
     try:
         js = r.json()
         _log(f"← {r.status_code} {url} json={_preview_body(js)}")
@@ -347,3 +354,29 @@ async def api_display_snapshot(
 
     st, js = await _get_json("/api/v1/auction-counting/display/snapshot", token, params)
     return JSONResponse(js, status_code=200 if st == 200 else 502)
+
+
+@router.get("/auction/counting/api/display/stream")
+async def api_display_stream(
+    request: Request,
+    project_id: int = Query(..., ge=1),
+    session_id: Optional[int] = Query(None),
+):
+    """SSE của /display/snapshot: 1 poll A dùng chung, đẩy khi snapshot đổi."""
+    token = get_access_token(request)
+    if not token:
+        return _unauth_json()
+
+    params: Dict[str, Any] = {"project_id": project_id}
+    if session_id:
+        params["session_id"] = session_id
+
+    async def fetch(tok: str):
+        return await _get_json("/api/v1/auction-counting/display/snapshot", tok, params)
+
+    return _snapshot_hub.stream(
+        ("snapshot", subscriber_scope(request, token), project_id, session_id),
+        fetch,
+        interval=LIVE_HUB_POLL_MS / 1000,
+        token=token,
+    )
@@ -1,17 +1,21 @@
 # routers/auction_documents_print.py  (Service B - Admin Portal)
 from __future__ import annotations
 
+import asyncio
 import os
 import re
 from typing import Any, Dict, Optional, List, Tuple
 
 import httpx
 from fastapi import APIRouter, Request, Path, Query
-from fastapi.responses import HTMLResponse, Response
+from fastapi.responses import HTMLResponse, JSONResponse
 
-from utils.templates import templates
-from utils.auth import get_access_token, fetch_me
+from utils.templates import stream_template, templates
+from utils.auth import get_access_token, fetch_me, me_cache_scope, verified_cache_scope
 from utils.document_templates.registry import DocKind, company_code_from_me, resolve_template
+from utils.fanout import SharedLimit, bounded_gather
+from services.session_progress import get_session_progress, invalidate_session_progress
+from services.session_snapshot import invalidate_session_snapshots, snapshot_or_build
 
 router = APIRouter(tags=["auction_sessions:documents_print"])
 
@@ -21,6 +25,18 @@ SERVICE_A_BASE_URL = os.getenv("SERVICE_A_BASE_URL", "http://127.0.0.1:8824").rs
 ORG_NAME = (os.getenv("AUCTION_ORG_NAME", "").strip() or os.getenv("ORG_NAME", "").strip())
 ORG_NOTE = (os.getenv("AUCTION_ORG_NOTE", "").strip() or os.getenv("ORG_NOTE", "").strip())
 
+# Ballot-counts: trần request đồng thời tới Service A (chung cả worker) + timeout từng lô.
+BALLOT_FETCH_CONCURRENCY = max(1, int(os.getenv("BALLOT_FETCH_CONCURRENCY", "8")))
+BALLOT_FETCH_TIMEOUT = float(os.getenv("BALLOT_FETCH_TIMEOUT", "30"))
+# Endpoint batch (tuỳ chọn): GET ?round_lot_ids=1,2,3 ->
+#   {"data": {"<round_lot_id>": {...}}} hoặc {"data": [{"round_lot_id": .., ...}]}
+# mỗi phần tử cùng shape với /round-lots/{id}/ballot-counts. Để trống -> fan-out từng lô.
+BALLOT_COUNTS_BATCH_EP = os.getenv("BALLOT_COUNTS_BATCH_EP", "").strip()
+BALLOT_COUNTS_BATCH_SIZE = max(1, int(os.getenv("BALLOT_COUNTS_BATCH_SIZE", "200")))
+
+_ballot_limit = SharedLimit(BALLOT_FETCH_CONCURRENCY)
+_ballot_batch_supported = bool(BALLOT_COUNTS_BATCH_EP)
+
 # =========================================================
 # Logging helpers (mask sensitive)
 # =========================================================
@@ -98,21 +114,26 @@ async def _a_get_json(
     token: str,
     params: Optional[Dict[str, Any]] = None,
     timeout: float = 60.0,
+    client: Optional[httpx.AsyncClient] = None,
 ) -> Tuple[int, Dict[str, Any]]:
     """
     GET JSON from Service A with Bearer token.
+    client: truyền vào để dùng chung connection pool (fan-out); không có thì tạo mới.
     Returns: (status_code, json_dict)
     """
     url = f"{SERVICE_A_BASE_URL}{path}"
     headers = {"Authorization": f"Bearer {token}"}
     _log(f"→ GET(A) {url} params={_mask(params or {})}")
 
-    async with httpx.AsyncClient(timeout=timeout) as c:
-        try:
-            r = await c.get(url, headers=headers, params=params or {})
-        except Exception as e:
-            _log(f"← EXC(A) {url} error={e}")
-            return 599, {"detail": str(e)}
+    try:
+        if client is not None:
+            r = await client.get(url, headers=headers, params=params or {}, timeout=timeout)
+        else:
+            async with httpx.AsyncClient(timeout=timeout) as c:
+                r = await c.get(url, headers=headers, params=params or {})
+    except Exception as e:
+        _log(f"← EXC(A) {url} error={e}")
+        return 599, {"detail": str(e)}
 
     try:
         js = r.json()
@@ -559,7 +580,7 @@ async def print_attendance_list(
     cc = company_code_from_me(me) or str(sess_data.get("company_code") or "").strip().lower()
     attendance_tpl = resolve_template(cc, DocKind.ATTENDANCE_SESSION)
 
-    return templates.TemplateResponse(
+    return stream_template(
         attendance_tpl,
         {
             "request": request,
@@ -776,7 +797,7 @@ async def print_attendance_seat_labels(
     cc = company_code_from_me(me) or str(session_out.get("company_code") or "").strip().lower()
     seat_tpl = resolve_template(cc, DocKind.ATTENDANCE_SEAT_LABELS)
 
-    return templates.TemplateResponse(
+    return stream_template(
         seat_tpl,
         {
             "request": request,
@@ -1069,32 +1090,8 @@ def _chunk_pages(
     return pages
 
 
-@router.get(
-    "/auction/sessions/{session_id}/documents/attendance/winner-sign-list",
-    response_class=HTMLResponse,
-)
-async def print_winner_sign_list(
-    request: Request,
-    session_id: int = Path(..., ge=1),
-    title: Optional[str] = Query(None),
-    autoprint: int = Query(0, ge=0, le=1),
-):
-    """
-    In danh sách ký xác nhận trúng đấu giá (A4 ngang).
-    Dòng = các lô trong phiên (nguồn vòng 1); giá khởi điểm = vòng 1.
-    """
-    token = get_access_token(request)
-    if not token:
-        return templates.TemplateResponse(
-            "pages/error.html",
-            {
-                "request": request,
-                "title": "Chưa đăng nhập",
-                "message": "Vui lòng đăng nhập lại.",
-            },
-            status_code=401,
-        )
-
+async def _build_winner_sign_data(token: str, session_id: int) -> Dict[str, Any]:
+    """Dataset DS ký xác nhận trúng đấu giá (phiên, dự án, dòng lô vòng 1)."""
     error: Optional[Dict[str, Any]] = None
 
     st_s, sess = await _a_get_json(
@@ -1234,6 +1231,64 @@ async def print_winner_sign_list(
         "auction_mode": auction_mode,
     }
 
+    return {
+        "session": sess_data,
+        "session_out": session_out,
+        "project": project,
+        "company_code": company_code,
+        "company_name": company_name,
+        "rows": rows,
+        "auction_mode": auction_mode,
+        "price_unit": unit,
+        "date_line": date_line,
+        "venue": venue,
+        "error": error,
+    }
+
+
+@router.get(
+    "/auction/sessions/{session_id}/documents/attendance/winner-sign-list",
+    response_class=HTMLResponse,
+)
+async def print_winner_sign_list(
+    request: Request,
+    session_id: int = Path(..., ge=1),
+    title: Optional[str] = Query(None),
+    autoprint: int = Query(0, ge=0, le=1),
+):
+    """
+    In danh sách ký xác nhận trúng đấu giá (A4 ngang).
+    Dòng = các lô trong phiên (nguồn vòng 1); giá khởi điểm = vòng 1.
+    """
+    token = get_access_token(request)
+    if not token:
+        return templates.TemplateResponse(
+            "pages/error.html",
+            {
+                "request": request,
+                "title": "Chưa đăng nhập",
+                "message": "Vui lòng đăng nhập lại.",
+            },
+            status_code=401,
+        )
+
+    data = await snapshot_or_build(
+        verified_cache_scope(request, token),
+        session_id,
+        "winner_sign_list",
+        lambda: _build_winner_sign_data(token, session_id),
+    )
+    error = data.get("error")
+    session_out = data.get("session_out") or {"id": session_id}
+    project = data.get("project") or {}
+    company_code = _to_str(data.get("company_code") or "")
+    company_name = _to_str(data.get("company_name") or "")
+    rows = data.get("rows") or []
+    auction_mode = data.get("auction_mode") or "PER_LOT"
+    unit = data.get("price_unit") or _auction_mode_unit_label(auction_mode)
+    date_line = data.get("date_line") or ""
+    venue = data.get("venue") or ""
+
     me = await fetch_me(token)
     cc = company_code_from_me(me) or company_code.strip().lower()
     tpl = resolve_template(cc, DocKind.WINNER_SIGN_LIST)
@@ -1408,27 +1463,102 @@ def _result_status_label(
     return "Chưa chốt", "pending"
 
 
-async def _fetch_ballots_for_lots(
+async def _fetch_ballots_batch(
+    client: httpx.AsyncClient,
     token: str,
     round_lot_ids: List[int],
-) -> Dict[int, Dict[str, Any]]:
-    import asyncio
+) -> Optional[Dict[int, Dict[str, Any]]]:
+    """1 call batch cho nhiều round-lot; None nếu A không hỗ trợ / lỗi (caller fallback)."""
+    global _ballot_batch_supported
 
-    async def _one(rlid: int) -> Tuple[int, Dict[str, Any]]:
+    async with _ballot_limit.semaphore():
         st, js = await _a_get_json(
-            f"/api/v1/auction-sessions/round-lots/{rlid}/ballot-counts",
+            BALLOT_COUNTS_BATCH_EP,
             token,
-            None,
-            timeout=30.0,
+            {"round_lot_ids": ",".join(str(x) for x in round_lot_ids)},
+            timeout=BALLOT_FETCH_TIMEOUT,
+            client=client,
         )
-        if st == 200 and isinstance(js, dict):
-            return rlid, js
-        return rlid, {}
+    if st in (404, 405, 501):
+        # A chưa có endpoint batch -> tắt cho cả worker, khỏi thử lại mỗi lần in
+        _ballot_batch_supported = False
+        return None
+    if st != 200 or not isinstance(js, dict):
+        return None
 
+    out: Dict[int, Dict[str, Any]] = {}
+    data = js.get("data")
+    if isinstance(data, dict):
+        items = data.items()
+    elif isinstance(data, list):
+        items = ((x.get("round_lot_id"), x) for x in data if isinstance(x, dict))
+    else:
+        return None
+    for k, v in items:
+        try:
+            rid = int(k or 0)
+        except Exception:
+            continue
+        if rid > 0 and isinstance(v, dict):
+            out[rid] = v
+    return out
+
+
+async def _fetch_ballots_for_lots(
+    token: str,
+    round_lot_ids: List[int],
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Ballot-counts cho danh sách round-lot:
+    - có BALLOT_COUNTS_BATCH_EP -> gọi batch theo từng cụm BALLOT_COUNTS_BATCH_SIZE;
+    - lô còn thiếu -> fan-out từng lô, tối đa BALLOT_FETCH_CONCURRENCY request đồng thời
+      (chung cả worker), timeout + lỗi cô lập theo lô (lô lỗi -> {}).
+    """
     if not round_lot_ids:
         return {}
-    pairs = await asyncio.gather(*[_one(rid) for rid in round_lot_ids])
-    return {rid: data for rid, data in pairs}
+
+    out: Dict[int, Dict[str, Any]] = {}
+    limits = httpx.Limits(
+        max_connections=BALLOT_FETCH_CONCURRENCY,
+        max_keepalive_connections=BALLOT_FETCH_CONCURRENCY,
+    )
+    async with httpx.AsyncClient(timeout=BALLOT_FETCH_TIMEOUT, limits=limits) as client:
+        if _ballot_batch_supported:
+            chunks = [
+                round_lot_ids[i : i + BALLOT_COUNTS_BATCH_SIZE]
+                for i in range(0, len(round_lot_ids), BALLOT_COUNTS_BATCH_SIZE)
+            ]
+            for part in await asyncio.gather(
+                *[_fetch_ballots_batch(client, token, c) for c in chunks]
+            ):
+                out.update(part or {})
+
+        missing = [rid for rid in round_lot_ids if rid not in out]
+
+        async def _one(rlid: int) -> Dict[str, Any]:
+            st, js = await _a_get_json(
+                f"/api/v1/auction-sessions/round-lots/{rlid}/ballot-counts",
+                token,
+                None,
+                timeout=BALLOT_FETCH_TIMEOUT,
+                client=client,
+            )
+            if st == 200 and isinstance(js, dict):
+                return js
+            return {}
+
+        if missing:
+            results = await bounded_gather(
+                missing,
+                _one,
+                timeout=BALLOT_FETCH_TIMEOUT,
+                semaphore=_ballot_limit.semaphore(),
+                label="ballot-counts",
+            )
+            for rid, data in zip(missing, results):
+                out[rid] = data or {}
+
+    return {rid: out.get(rid) or {} for rid in round_lot_ids}
 
 
 def _stt_sort_key(v: Any) -> tuple:
@@ -1620,31 +1750,8 @@ def _build_round_result_rows(
     return rows
 
 
-@router.get(
-    "/auction/sessions/{session_id}/rounds/{round_no}/results/print",
-    response_class=HTMLResponse,
-)
-async def print_round_results(
-    request: Request,
-    session_id: int = Path(..., ge=1),
-    round_no: int = Path(..., ge=1),
-    title: Optional[str] = Query(None),
-    autoprint: int = Query(0, ge=0, le=1),
-    download: Optional[str] = Query(None),
-):
-    """In bảng kết quả toàn vòng: kiểm phiếu, giá, trạng thái, người trúng / vào vòng trong."""
-    token = get_access_token(request)
-    if not token:
-        return templates.TemplateResponse(
-            "pages/error.html",
-            {
-                "request": request,
-                "title": "Chưa đăng nhập",
-                "message": "Vui lòng đăng nhập lại.",
-            },
-            status_code=401,
-        )
-
+async def _build_round_results_data(token: str, session_id: int, round_no: int) -> Dict[str, Any]:
+    """Dataset bảng kết quả 1 vòng (UI vòng + kết quả phiên + kiểm phiếu)."""
     error: Optional[Dict[str, Any]] = None
 
     st_s, sess = await _a_get_json(
@@ -1738,6 +1845,58 @@ async def print_round_results(
         "province": sess_data.get("province"),
     }
 
+    return {
+        "session": sess_data,
+        "session_out": session_out,
+        "project_name": project_name,
+        "project_code": project_code,
+        "auction_mode": auction_mode,
+        "price_labels": price_labels,
+        "rows": rows,
+        "error": error,
+    }
+
+
+@router.get(
+    "/auction/sessions/{session_id}/rounds/{round_no}/results/print",
+    response_class=HTMLResponse,
+)
+async def print_round_results(
+    request: Request,
+    session_id: int = Path(..., ge=1),
+    round_no: int = Path(..., ge=1),
+    title: Optional[str] = Query(None),
+    autoprint: int = Query(0, ge=0, le=1),
+    download: Optional[str] = Query(None),
+):
+    """In bảng kết quả toàn vòng: kiểm phiếu, giá, trạng thái, người trúng / vào vòng trong."""
+    token = get_access_token(request)
+    if not token:
+        return templates.TemplateResponse(
+            "pages/error.html",
+            {
+                "request": request,
+                "title": "Chưa đăng nhập",
+                "message": "Vui lòng đăng nhập lại.",
+            },
+            status_code=401,
+        )
+
+    data = await snapshot_or_build(
+        verified_cache_scope(request, token),
+        session_id,
+        f"round_results_{int(round_no)}",
+        lambda: _build_round_results_data(token, session_id, round_no),
+    )
+    error = data.get("error")
+    sess_data = data.get("session") or {"id": session_id}
+    session_out = data.get("session_out") or {"id": session_id}
+    project_name = data.get("project_name") or ""
+    project_code = data.get("project_code") or ""
+    auction_mode = data.get("auction_mode") or "PER_LOT"
+    price_labels = data.get("price_labels") or _price_column_labels(auction_mode)
+    rows = data.get("rows") or []
+
     me = await fetch_me(token)
     cc = company_code_from_me(me) or _to_str(sess_data.get("company_code")).strip().lower()
     tpl = resolve_template(cc, DocKind.ROUND_RESULTS)
@@ -1775,15 +1934,14 @@ async def print_round_results(
     }
 
     if for_download:
-        html = templates.get_template(tpl).render(**ctx)
         fname = f"ket-qua-vong-{round_no}-phien-{session_id}.html"
-        return Response(
-            content=html.encode("utf-8"),
-            media_type="text/html; charset=utf-8",
+        return stream_template(
+            tpl,
+            ctx,
             headers={"Content-Disposition": f'attachment; filename="{fname}"'},
         )
 
-    return templates.TemplateResponse(tpl, ctx)
+    return stream_template(tpl, ctx)
 
 
 # =========================================================
@@ -2203,18 +2361,39 @@ async def _fetch_round_rows_for_print(
     return round_no, rows, _round_stats(rows)
 
 
+async def fetch_session_for_print(token: str, session_id: int) -> Tuple[int, Dict[str, Any]]:
+    return await _a_get_json(
+        f"/api/v1/auction-sessions/sessions/{session_id}", token, None, timeout=60.0
+    )
+
+
+async def fetch_session_results_for_print(token: str, session_id: int) -> Tuple[int, Any]:
+    return await _a_get_json(
+        f"/api/v1/auction-sessions/sessions/{session_id}/results",
+        token,
+        None,
+        timeout=60.0,
+    )
+
+
 async def build_session_progress_data(
     token: str,
     session_id: int,
+    *,
+    session_js: Optional[Tuple[int, Dict[str, Any]]] = None,
+    results_js: Optional[Tuple[int, Any]] = None,
 ) -> Dict[str, Any]:
-    """Dữ liệu diễn biến phiên (lô không thành, lô trúng, từng vòng) — dùng chung in & biên bản."""
-    import asyncio
-
+    """
+    Dữ liệu diễn biến phiên (lô không thành, lô trúng, từng vòng) — dùng chung in & biên bản.
+    session_js / results_js: (status, json) của GET session / kết quả phiên nếu caller
+    đã có (tránh gọi lại).
+    Nên gọi qua services.session_progress.get_session_progress (có cache theo phiên).
+    """
     error: Optional[Dict[str, Any]] = None
 
-    st_s, sess = await _a_get_json(
-        f"/api/v1/auction-sessions/sessions/{session_id}", token, None, timeout=60.0
-    )
+    if session_js is None:
+        session_js = await fetch_session_for_print(token, session_id)
+    st_s, sess = session_js
     if st_s != 200 or not isinstance(sess, dict):
         error = {"message": f"Không tải được phiên đấu (status={st_s})", "body": sess}
         sess_data: Dict[str, Any] = {"id": session_id}
@@ -2241,12 +2420,9 @@ async def build_session_progress_data(
 
     price_labels = _price_column_labels(auction_mode)
 
-    st_res, res_js = await _a_get_json(
-        f"/api/v1/auction-sessions/sessions/{session_id}/results",
-        token,
-        None,
-        timeout=60.0,
-    )
+    if results_js is None:
+        results_js = await fetch_session_results_for_print(token, session_id)
+    st_res, res_js = results_js
     session_results = _api_data_list(res_js) if st_res == 200 else []
     if st_res != 200 and not error:
         error = {"message": f"Không tải được kết quả phiên (status={st_res})", "body": res_js}
@@ -2355,6 +2531,8 @@ async def build_session_progress_data(
 
     return {
         "session_id": session_id,
+        "session": sess_data,
+        "project": {"id": project_id, "name": project_name, "project_code": project_code},
         "auction_mode": auction_mode,
         "price_labels": price_labels,
         "failed_lots": failed_lots,
@@ -2399,16 +2577,11 @@ async def print_session_progress(
             status_code=401,
         )
 
-    prog = await build_session_progress_data(token, session_id)
-    error = prog.get("error")
-
-    st_s, sess = await _a_get_json(
-        f"/api/v1/auction-sessions/sessions/{session_id}", token, None, timeout=60.0
+    prog = await get_session_progress(
+        token, session_id, scope=verified_cache_scope(request, token)
     )
-    if st_s == 200 and isinstance(sess, dict):
-        sess_data = (sess.get("data") or sess) if isinstance(sess, dict) else {"id": session_id}
-    else:
-        sess_data = {"id": session_id}
+    error = prog.get("error")
+    sess_data = prog.get("session") or {"id": session_id}
 
     project_name = sess_data.get("project_name") or sess_data.get("p_project_name") or ""
     project_code = sess_data.get("project_code") or sess_data.get("p_project_code") or ""
@@ -2459,12 +2632,36 @@ async def print_session_progress(
     }
 
     if for_download:
-        html = templates.get_template(tpl).render(**ctx)
         fname = f"dien-bien-phien-{session_id}.html"
-        return Response(
-            content=html.encode("utf-8"),
-            media_type="text/html; charset=utf-8",
+        return stream_template(
+            tpl,
+            ctx,
             headers={"Content-Disposition": f'attachment; filename="{fname}"'},
         )
 
-    return templates.TemplateResponse(tpl, ctx)
+    return stream_template(tpl, ctx)
+
+
+# =========================================================
+# Snapshot phiên đã đóng — admin xoá để dựng lại từ Service A
+# =========================================================
+@router.post("/auction/sessions/{session_id}/documents/snapshot/invalidate")
+async def invalidate_session_documents_snapshot(
+    request: Request,
+    session_id: int = Path(..., ge=1),
+):
+    token = get_access_token(request)
+    me = await fetch_me(token)
+    if not me:
+        return JSONResponse({"error": "unauthorized"}, status_code=401)
+    # /auth/me verify đúng token này -> công ty + quyền đáng tin; chỉ xoá snapshot công ty mình
+    if (me.get("role") or "").upper() not in ("COMPANY_ADMIN", "SUPER_ADMIN"):
+        return JSONResponse({"error": "forbidden"}, status_code=403)
+    # cùng cách đọc /auth/me với verified_cache_scope (bên ghi snapshot)
+    scope = me_cache_scope(me)
+    if not scope:
+        return JSONResponse({"error": "forbidden"}, status_code=403)
+    removed = invalidate_session_snapshots(session_id, scope=scope)
+    invalidate_session_progress(session_id, scope=scope)
+    _log(f"snapshot invalidate session={session_id} company={scope} removed={removed}")
+    return JSONResponse({"ok": True, "session_id": session_id, "removed": removed})
@@ -7,11 +7,12 @@ from typing import Any, Dict, Optional, List
 
 import httpx
 from fastapi import APIRouter, Request, HTTPException, Query
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 
 from utils.templates import templates
 from utils.auth import get_access_token, fetch_me
 from utils.document_templates.registry import DocKind, extract_company_code, resolve_template
+from utils.zip_stream import DocumentJob, safe_filename, stream_documents_zip
 
 router = APIRouter(tags=["auction:prints"])
 
@@ -209,6 +210,53 @@ async def view_project_winner_slips(
     )
 
 
+# =========================================================
+# 3) Export ZIP: mỗi lô trúng 1 file phiếu (HTML hoặc PDF)
+# =========================================================
+@router.get("/auction/prints/projects/{project_id}/export.zip")
+async def export_project_winner_slips_zip(
+    request: Request,
+    project_id: int,
+    format: str = Query("html", pattern="^(html|pdf)$"),
+    only_lucky_draw: bool = Query(False),
+):
+    token = get_access_token(request)
+    if not token:
+        raise HTTPException(status_code=401, detail="Not logged in")
+
+    data = await fetch_project_print_data(project_id, token, only_lucky_draw=only_lucky_draw)
+    project = data.get("project") or {}
+    items: List[Dict[str, Any]] = data.get("items") or []
+    if only_lucky_draw:
+        items = [x for x in items if x.get("is_lucky_draw") is True]
+    _log(f"export zip project_id={project_id} items={len(items)} format={format}")
+
+    me = await fetch_me(token)
+    winner_tpl = resolve_template(extract_company_code(me=me, project=project), DocKind.WINNER_SLIP)
+
+    def jobs():
+        for w in items:
+            lot = w.get("lot") or {}
+            cust = w.get("customer") or {}
+            yield DocumentJob(
+                name=safe_filename(lot.get("lot_code") or w.get("lot_code"), cust.get("full_name")),
+                template=winner_tpl,
+                context={
+                    "request": request,
+                    "data": {"project": project, "winner": w},
+                    "project": project,
+                    "winner": w,
+                },
+            )
+
+    fname = safe_filename("phieu-trung", project.get("project_code") or project_id)
+    return StreamingResponse(
+        stream_documents_zip(jobs(), as_pdf=(format == "pdf")),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{fname}.zip"'},
+    )
+
+
 # =========================================================
 # ALIAS ROUTES (để khớp link UI: /auction/results/print...)
 # =========================================================
@@ -10,10 +10,16 @@ from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Resp
 
 from utils.templates import templates
 from utils.auth import get_access_token
+from utils.live_hub import LiveHub, subscriber_scope
+from services.session_progress import invalidate_session_progress_for_path
 
 router = APIRouter(tags=["auction_results"])
 
 SERVICE_A_BASE_URL = os.getenv("SERVICE_A_BASE_URL", "http://127.0.0.1:8824")
+# màn hình công bố kết quả: kết quả đổi chậm -> poll A thưa hơn màn hình phiên
+LIVE_RESULTS_POLL_MS = max(1000, int(os.getenv("LIVE_RESULTS_POLL_MS", "10000")))
+
+_results_hub = LiveHub("results_present")
 
 
 def _log(msg: str):
@@ -62,6 +68,7 @@ async def _put_json(path: str, token: str, payload: Dict[str, Any]):
         except Exception as e:
             _log(f"← EXC {url} error={e}")
             return 599, {"detail": str(e)}
+    invalidate_session_progress_for_path(path)
     try:
         js = r.json()
         _log(f"← {r.status_code} {url} json={_preview_body(js)}")
@@ -80,6 +87,7 @@ async def _post_json(path: str, token: str, payload: Dict[str, Any]):
         except Exception as e:
             _log(f"← EXC {url} error={e}")
             return 599, {"detail": str(e)}
+    invalidate_session_progress_for_path(path)
     try:
         js = r.json()
         _log(f"← {r.status_code} {url} json={_preview_body(js)}")
@@ -262,6 +270,36 @@ async def api_list_lots(
     return JSONResponse(js, status_code=200 if st == 200 else 502)
 
 
+@router.get("/auction/results/api/projects/{project_id}/lots/stream")
+async def api_stream_lots(
+    request: Request,
+    project_id: int = Path(..., ge=1),
+    q: Optional[str] = Query(None),
+    result_status: Optional[str] = Query(None),
+    size: int = Query(200, ge=1, le=500),
+):
+    """SSE cho màn hình công bố (/present): 1 poll A / bộ lọc, đẩy khi danh sách lô đổi."""
+    token = get_access_token(request)
+    if not token:
+        return _unauth_json()
+
+    params: Dict[str, Any] = {"page": 1, "size": size}
+    if q:
+        params["q"] = q
+    if result_status:
+        params["result_status"] = result_status
+
+    async def fetch(tok: str):
+        return await _get_json(f"/api/v1/auction-results/projects/{project_id}/lots", tok, params)
+
+    return _results_hub.stream(
+        ("lots", subscriber_scope(request, token), project_id, q or "", result_status or "", size),
+        fetch,
+        interval=LIVE_RESULTS_POLL_MS / 1000,
+        token=token,
+    )
+
+
 @router.get("/auction/results/api/projects/{project_id}/lots/{lot_code}/eligible-customers")
 async def api_eligible_customers(
     request: Request,
@@ -10,11 +10,15 @@ from fastapi.responses import HTMLResponse, JSONResponse
 
 from utils.templates import templates
 from utils.auth import get_access_token
+from utils.live_hub import LIVE_HUB_POLL_MS, LiveHub, subscriber_scope
 
 router = APIRouter(tags=["auction_sessions:display"])
 
 SERVICE_A_BASE_URL = os.getenv("SERVICE_A_BASE_URL", "http://127.0.0.1:8824")
 
+# 1 poller / (người xem đã verify, phiên, vòng) dùng chung cho mọi màn hình trình chiếu của người đó
+_display_hub = LiveHub("session_display")
+
 
 # =========================================================
 # Helpers
@@ -118,6 +122,36 @@ async def proxy_display_payload(
         )
 
 
+# =========================================================
+# SSE: cùng payload như trên, đẩy khi thay đổi (1 poll A / phiên, không theo số màn hình)
+#   B: /auction/sessions/api/display/sessions/{session_id}/stream?round_no=...
+# =========================================================
+@router.get("/auction/sessions/api/display/sessions/{session_id}/stream")
+async def stream_display_payload(
+    request: Request,
+    session_id: int = Path(..., ge=1),
+    round_no: Optional[int] = Query(None, ge=1),
+):
+    token = get_access_token(request)
+    if not token:
+        return JSONResponse(status_code=401, content={"detail": "unauthorized"})
+
+    params: Dict[str, Any] = {"round_no": round_no} if round_no else {}
+    url = f"{SERVICE_A_BASE_URL.rstrip('/')}/api/v1/auction-sessions/display/sessions/{session_id}"
+
+    async def fetch(tok: str) -> tuple[int, Any]:
+        async with httpx.AsyncClient(timeout=30) as client:
+            r = await client.get(url, params=params, headers={"Authorization": f"Bearer {tok}"})
+        return r.status_code, await _get_json_or_text(r)
+
+    return _display_hub.stream(
+        ("session", subscriber_scope(request, token), session_id, round_no),
+        fetch,
+        interval=LIVE_HUB_POLL_MS / 1000,
+        token=token,
+    )
+
+
 # =========================================================
 # SSR page: trình chiếu
 #   /auction/sessions/{session_id}/display?round_no=...
@@ -6,12 +6,13 @@ from typing import Any, Dict, List, Optional
 
 import httpx
 from fastapi import APIRouter, Request, Path, Query, Body
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
 from utils.templates import templates
 from utils.auth import get_access_token, fetch_me
 from utils.document_templates.registry import DocKind, extract_company_code, resolve_template
+from utils.zip_stream import DocumentJob, safe_filename, stream_documents_zip
 
 router = APIRouter(tags=["auction_session_winner_printing"])
 
@@ -215,6 +216,68 @@ async def page_print_session_winners(
     )
 
 
+@router.get("/auction/sessions/{session_id}/winners/export.zip")
+async def export_session_winner_confirms_zip(
+    request: Request,
+    session_id: int = Path(..., ge=1),
+    format: str = Query("html", pattern="^(html|pdf)$"),
+):
+    """ZIP xác nhận trúng đấu giá: mỗi khách hàng trúng 1 file (gồm các lô đã trúng)."""
+    data = await _svc_get(request, f"/api/v1/auction-sessions/print/sessions/{session_id}/winners")
+    winner_tpl = await _winner_confirm_template(request, data)
+    session = data.get("session") or {}
+    project = data.get("project") or {}
+
+    # Gom theo customer_id; dòng không có id bị bỏ (gom theo tên dễ gộp nhầm 2 khách trùng tên)
+    by_customer: Dict[int, List[Dict[str, Any]]] = {}
+    skipped = 0
+    for w in data.get("items") or []:
+        cust = (w or {}).get("customer") or {}
+        cid = _as_int(w.get("customer_id") if w else None, 0) or _as_int(cust.get("id"), 0)
+        if cid <= 0:
+            skipped += 1
+            continue
+        by_customer.setdefault(cid, []).append(w)
+    _log(
+        f"export zip session_id={session_id} customers={len(by_customer)} "
+        f"skipped_no_customer_id={skipped} format={format}"
+    )
+
+    def jobs():
+        for items in by_customer.values():
+            cust = items[0].get("customer") or {}
+            yield DocumentJob(
+                name=safe_filename(cust.get("customer_code") or cust.get("id"), cust.get("full_name")),
+                template=winner_tpl,
+                context={
+                    "request": request,
+                    "title": "In phiếu trúng đấu giá (theo khách hàng)",
+                    "mode": "CUSTOMER",
+                    "session": session,
+                    "project": project,
+                    "round": None,
+                    "customer": cust,
+                    "items": items,
+                    "total_items": len(items),
+                    # raw chỉ chứa phần của khách này (cùng dạng API theo khách hàng)
+                    "raw": {
+                        "session": session,
+                        "project": project,
+                        "customer": cust,
+                        "items": items,
+                        "total_winners": len(items),
+                    },
+                },
+            )
+
+    fname = safe_filename("xac-nhan-trung", f"phien-{session_id}")
+    return StreamingResponse(
+        stream_documents_zip(jobs(), as_pdf=(format == "pdf")),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{fname}.zip"'},
+    )
+
+
 @router.get("/auction/sessions/{session_id}/rounds/{round_no}/winners/print", response_class=HTMLResponse)
 async def page_print_round_winners(
     request: Request,
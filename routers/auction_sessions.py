@@ -11,6 +11,11 @@ from urllib.parse import quote
 
 from utils.templates import templates
 from utils.auth import get_access_token
+from utils.bid_ticket_issue_client import invalidate_issued_tokens, invalidate_issued_tokens_for_path
+from services.session_progress import (
+    invalidate_session_progress,
+    invalidate_session_progress_for_path,
+)
 
 router = APIRouter(tags=["auction_sessions"])
 
@@ -102,6 +107,8 @@ async def _put_json(path: str, token: str, payload: Dict[str, Any]):
             _log(f"← EXC {url} error={e}")
             return 599, {"detail": str(e)}
 
+    invalidate_session_progress_for_path(path)
+    invalidate_issued_tokens_for_path(path)
     try:
         js = r.json()
         _log(f"← {r.status_code} {url} json={_preview_body(js)}")
@@ -148,6 +155,8 @@ async def _post_json(path: str, token: str, payload: Dict[str, Any]):
             _log(f"← EXC {url} error={e}")
             return 599, {"detail": str(e)}
 
+    invalidate_session_progress_for_path(path)
+    invalidate_issued_tokens_for_path(path)
     try:
         js = r.json()
         _log(f"← {r.status_code} {url} json={_preview_body(js)}")
@@ -915,6 +924,8 @@ async def api_delete_last_round(
         except Exception as e:
             _log(f"← EXC {url} error={e}")
             return JSONResponse({"detail": str(e)}, status_code=503)
+    invalidate_session_progress(session_id)
+    invalidate_issued_tokens(session_id=session_id)
 
     try:
         js = r.json()
@@ -988,6 +999,8 @@ async def api_delete_session(
         except Exception as e:
             _log(f"← EXC {url} error={e}")
             return JSONResponse({"detail": str(e)}, status_code=503)
+    invalidate_session_progress(session_id)
+    invalidate_issued_tokens(session_id=session_id)
 
     try:
         js = r.json()
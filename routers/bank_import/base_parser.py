@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import TypedDict, List, Dict, Any, Protocol
+from typing import TypedDict, List, Dict, Any, Optional, Protocol, Tuple, FrozenSet
 
 class ParseResult(TypedDict, total=False):
     ok: bool
@@ -8,5 +8,8 @@ class ParseResult(TypedDict, total=False):
     row_errors: List[Dict[str, Any]]
 
 class BankStatementParser(Protocol):
+    # các bộ ô header (lowercase) đặc trưng của ngân hàng — registry đánh index để chọn parser
+    HEADER_SIGNATURES: Tuple[FrozenSet[str], ...]
+
     def can_parse(self, file_bytes: bytes, filename: str) -> bool: ...
-    def parse(self, file_bytes: bytes) -> ParseResult: ...
+    def parse(self, file_bytes: bytes, *, fmt: Optional[str] = None) -> ParseResult: ...
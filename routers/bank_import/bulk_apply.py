@@ -0,0 +1,248 @@
+"""
+Gửi import sao kê sang Service A theo chunk (song song có giới hạn) + con trỏ resume.
+
+- items chia thành chunk BANK_IMPORT_CHUNK_SIZE, gửi tối đa BANK_IMPORT_CONCURRENCY chunk
+  cùng lúc tới /api/v1/bank-transactions/bulk; mỗi chunk có timeout riêng.
+- Trạng thái từng chunk ghi ra file JSON (BANK_IMPORT_JOB_DIR/{job_id}.json). job_id lấy
+  từ stage_id (+ công ty, tài khoản); router gửi lại đúng danh sách dòng đã chốt trong
+  stage -> bấm "Gửi" lại chỉ gửi những chunk chưa thành công, chunk đã xong dùng lại kết
+  quả đã lưu. Đổi kích thước chunk / số dòng giữa chừng -> job làm lại từ đầu.
+- Kết quả các chunk được cộng dồn (số đếm cộng, danh sách nối) thành 1 kết quả chung.
+- `confirmed`: vị trí các item Service A xác nhận đã ghi/đã có (theo kết quả từng dòng
+  của chunk); chunk trả 2xx mà không nói rõ từng dòng thì không dòng nào được tính.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+SERVICE_A_BASE_URL = os.getenv("SERVICE_A_BASE_URL", "http://127.0.0.1:8824")
+
+BANK_IMPORT_CHUNK_SIZE = max(1, int(os.getenv("BANK_IMPORT_CHUNK_SIZE", "1000")))
+BANK_IMPORT_CONCURRENCY = max(1, int(os.getenv("BANK_IMPORT_CONCURRENCY", "3")))
+BANK_IMPORT_CHUNK_TIMEOUT = float(os.getenv("BANK_IMPORT_CHUNK_TIMEOUT", "120"))
+BANK_IMPORT_JOB_TTL = float(os.getenv("BANK_IMPORT_JOB_TTL", "86400"))
+BANK_IMPORT_JOB_DIR = os.getenv("BANK_IMPORT_JOB_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "var", "bank_import_jobs"
+)
+
+_BULK_PATH = "/api/v1/bank-transactions/bulk"
+
+
+def import_job_id(company_code: str, account_id: int, stage_id: str) -> str:
+    h = hashlib.sha256(f"{company_code}\0{int(account_id)}\0{stage_id}".encode("utf-8"))
+    return h.hexdigest()[:32]
+
+
+def _job_path(job_id: str) -> str:
+    return os.path.join(BANK_IMPORT_JOB_DIR, f"{job_id}.json")
+
+
+def _load_job(job_id: str) -> Dict[str, Any]:
+    try:
+        with open(_job_path(job_id), "r", encoding="utf-8") as f:
+            doc = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning("bank import job %s unreadable: %s", job_id, e)
+        return {}
+    if not isinstance(doc, dict) or time.time() - float(doc.get("created_at") or 0) > BANK_IMPORT_JOB_TTL:
+        return {}
+    return doc
+
+
+def _prune_expired(now: float) -> None:
+    try:
+        names = os.listdir(BANK_IMPORT_JOB_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(BANK_IMPORT_JOB_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > BANK_IMPORT_JOB_TTL:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _write_job(job_id: str, text: str) -> None:
+    path = _job_path(job_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+    _prune_expired(time.time())
+
+
+async def _save_job(job_id: str, doc: Dict[str, Any]) -> None:
+    # serialize trên loop (doc còn bị các chunk khác sửa), chỉ I/O chạy trong thread
+    text = json.dumps(doc, ensure_ascii=False, default=str)
+    try:
+        await asyncio.to_thread(_write_job, job_id, text)
+    except Exception as e:
+        logger.warning("bank import job %s save failed: %s", job_id, e)
+
+
+def merge_bulk_results(results: List[Any]) -> Dict[str, Any]:
+    """Cộng kết quả chunk: số -> cộng, list -> nối, giá trị khác giữ bản đầu tiên."""
+    merged: Dict[str, Any] = {}
+    for res in results:
+        body = res.get("data") if isinstance(res, dict) and isinstance(res.get("data"), dict) else res
+        if not isinstance(body, dict):
+            continue
+        for k, v in body.items():
+            if isinstance(v, bool):
+                merged.setdefault(k, v)
+            elif isinstance(v, (int, float)):
+                merged[k] = merged.get(k, 0) + v
+            elif isinstance(v, list):
+                merged.setdefault(k, []).extend(v)
+            else:
+                merged.setdefault(k, v)
+    return merged
+
+
+def _item_ok(item: Any) -> bool:
+    if not isinstance(item, dict):
+        return False
+    if item.get("duplicate") is True:
+        return True
+    for k in ("ok", "inserted"):
+        if isinstance(item.get(k), bool):
+            return item[k]
+    status = item.get("status_code", item.get("status"))
+    if isinstance(status, int) and not isinstance(status, bool):
+        return 200 <= status < 300
+    return str(status or "").lower() in ("ok", "created", "inserted", "duplicate", "skipped")
+
+
+def chunk_item_results(res: Any, items: List[Dict[str, Any]]) -> Optional[List[bool]]:
+    """
+    Từng dòng của chunk đã ghi/đã có trên Service A chưa; None nếu body không nói rõ.
+    Hiểu được: list kết quả đủ n dòng ("results"/"items" hoặc cả body), hoặc
+    inserted + duplicates (+ số lỗi, mỗi lỗi có src_line) đúng bằng n.
+    """
+    n = len(items)
+    body = res.get("data") if isinstance(res, dict) and isinstance(res.get("data"), (dict, list)) else res
+    if isinstance(body, list):
+        return [_item_ok(x) for x in body] if len(body) == n else None
+    if not isinstance(body, dict):
+        return None
+    for k in ("results", "items"):
+        rs = body.get(k)
+        if isinstance(rs, list) and len(rs) == n:
+            return [_item_ok(x) for x in rs]
+    counts = [body.get(k) for k in ("inserted", "duplicates")]
+    if not all(isinstance(c, int) and not isinstance(c, bool) for c in counts):
+        return None
+    errors = body.get("errors") or []
+    if not isinstance(errors, list):
+        return None
+    bad = {e.get("src_line") for e in errors if isinstance(e, dict)}
+    if len(bad) != len(errors) or None in bad or sum(counts) + len(errors) != n:
+        return None
+    out = [it.get("src_line") not in bad for it in items]
+    return out if out.count(False) == len(errors) else None
+
+
+async def _post_chunk(
+    client: httpx.AsyncClient,
+    token: str,
+    *,
+    company_code: str,
+    items: List[Dict[str, Any]],
+) -> Tuple[int, Any]:
+    r = await client.post(
+        f"{SERVICE_A_BASE_URL}{_BULK_PATH}",
+        headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+        params={"body_company_code": company_code},
+        json={"company_code": company_code, "policy": "STRICT", "items": items},
+        timeout=BANK_IMPORT_CHUNK_TIMEOUT,
+    )
+    try:
+        body = r.json()
+    except Exception:
+        body = {"detail": r.text[:400]}
+    return r.status_code, body
+
+
+async def apply_in_chunks(
+    client: httpx.AsyncClient,
+    token: str,
+    *,
+    company_code: str,
+    account_id: int,
+    stage_id: str,
+    items: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    Gửi items theo chunk; trả {"job_id", "chunks_total", "chunks_ok", "failed_chunks",
+    "result", "confirmed"} — result là kết quả Service A đã cộng dồn của các chunk thành
+    công, confirmed là vị trí (trong items) các dòng A xác nhận đã ghi/đã có.
+    """
+    job_id = import_job_id(company_code, account_id, stage_id)
+    chunks = [items[i : i + BANK_IMPORT_CHUNK_SIZE] for i in range(0, len(items), BANK_IMPORT_CHUNK_SIZE)]
+    layout = {"chunks_total": len(chunks), "chunk_size": BANK_IMPORT_CHUNK_SIZE, "rows": len(items)}
+    job = await asyncio.to_thread(_load_job, job_id)
+    if not job or any(job.get(k) != v for k, v in layout.items()):
+        job = {"created_at": time.time(), **layout, "done": {}, "failed": {}}
+    done: Dict[str, Any] = job["done"]
+    failed: Dict[str, Any] = {}
+    resumed = len(done)
+
+    window = asyncio.Semaphore(BANK_IMPORT_CONCURRENCY)
+    save_lock = asyncio.Lock()
+
+    async def run(idx: int, chunk: List[Dict[str, Any]]) -> None:
+        async with window:
+            try:
+                status, body = await _post_chunk(client, token, company_code=company_code, items=chunk)
+            except Exception as e:
+                logger.warning("bank import job %s chunk %s/%s error: %s", job_id, idx + 1, len(chunks), e)
+                failed[str(idx)] = {"status": None, "error": str(e) or e.__class__.__name__}
+                return
+        if status >= 400:
+            logger.warning("bank import job %s chunk %s/%s HTTP %s", job_id, idx + 1, len(chunks), status)
+            failed[str(idx)] = {"status": status, "body": body}
+            return
+        async with save_lock:
+            done[str(idx)] = body
+            job["failed"] = failed
+            await _save_job(job_id, job)
+
+    await asyncio.gather(*[run(i, c) for i, c in enumerate(chunks) if str(i) not in done])
+
+    job["failed"] = failed
+    await _save_job(job_id, job)
+
+    confirmed: List[int] = []
+    for k in sorted(done, key=int):
+        start = int(k) * BANK_IMPORT_CHUNK_SIZE
+        oks = chunk_item_results(done[k], chunks[int(k)])
+        if oks is None:
+            logger.info("bank import job %s chunk %s: no per-row result, not indexed", job_id, int(k) + 1)
+            continue
+        confirmed.extend(start + j for j, ok in enumerate(oks) if ok)
+
+    return {
+        "job_id": job_id,
+        "chunks_total": len(chunks),
+        "chunks_ok": len(done),
+        "chunks_resumed": resumed,
+        "failed_chunks": [
+            {"chunk": int(k) + 1, "rows": len(chunks[int(k)]), **v} for k, v in sorted(failed.items(), key=lambda x: int(x[0]))
+        ],
+        "result": merge_bulk_results([done[k] for k in sorted(done, key=int)]),
+        "confirmed": confirmed,
+    }
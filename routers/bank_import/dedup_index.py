@@ -0,0 +1,215 @@
+"""
+Chỉ mục dấu vân tay giao dịch đã có trên Service A, theo từng tài khoản công ty — lọc
+trước các dòng sao kê trùng (upload chồng kỳ) để preview đánh dấu và apply chỉ gửi phần mới.
+
+- Dấu vân tay: (txn_time quy về epoch giây, amount, balance_after) — đúng bộ Service A
+  dùng để dedup; thêm refer_code của các dòng đã import qua Web B (Service A không lưu
+  refer_code nên tập này chỉ nhớ cục bộ).
+- Chỉ mục chia theo ngày (giờ VN); ngày nào cần mà chưa có/quá BANK_DEDUP_WINDOW_TTL giây
+  thì tải lại cả khoảng ngày đó từ GET /api/v1/bank-transactions (from_date/to_date).
+- Đếm theo bội số (Counter): 2 giao dịch thật giống hệt nhau trong file chỉ bị coi là đã
+  có khi Service A cũng có đủ 2 bản. Tải lỗi -> ngày đó không đánh dấu (gửi A như cũ).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+import httpx
+
+from utils.auth import token_cache_scope
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+SERVICE_A_BASE_URL = os.getenv("SERVICE_A_BASE_URL", "http://127.0.0.1:8824")
+
+BANK_DEDUP_ENABLED = os.getenv("BANK_DEDUP_ENABLED", "1").strip().lower() not in ("0", "false", "no", "off")
+BANK_DEDUP_WINDOW_TTL = float(os.getenv("BANK_DEDUP_WINDOW_TTL", "900"))
+BANK_DEDUP_PAGE_SIZE = max(1, int(os.getenv("BANK_DEDUP_PAGE_SIZE", "500")))
+BANK_DEDUP_MAX_PAGES = max(1, int(os.getenv("BANK_DEDUP_MAX_PAGES", "40")))
+
+VN_TZ = ZoneInfo("Asia/Ho_Chi_Minh")
+
+Fingerprint = Tuple[int, float, Optional[float]]
+
+
+class _AccountIndex:
+    def __init__(self) -> None:
+        self.days: Dict[str, Tuple[float, Counter]] = {}
+        self.refer_codes: Set[str] = set()
+
+
+# (phạm vi công ty, account_id) -> chỉ mục; giữ tối đa 256 tài khoản, bỏ sau 1 ngày không dùng
+_indexes = TTLCache(ttl_seconds=86400, maxsize=256)
+
+
+def _index_for(token: str, account_id: int) -> _AccountIndex:
+    key = (token_cache_scope(token), int(account_id))
+    idx = _indexes.get(key)
+    if idx is None:
+        idx = _AccountIndex()
+        _indexes.set(key, idx)
+    return idx
+
+
+def _round(v: Any) -> Optional[float]:
+    if v is None or v == "":
+        return None
+    try:
+        return round(float(v), 2)
+    except (TypeError, ValueError):
+        return None
+
+
+def txn_fingerprint(txn_time: Any, amount: Any, balance_after: Any) -> Optional[Tuple[str, Fingerprint]]:
+    """(ngày VN 'YYYY-MM-DD', dấu vân tay) hoặc None nếu thiếu thời gian/số tiền."""
+    if not txn_time or _round(amount) is None:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(txn_time).strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=VN_TZ)
+    local = dt.astimezone(VN_TZ)
+    return local.date().isoformat(), (int(dt.timestamp()), _round(amount), _round(balance_after))
+
+
+async def _fetch_days(
+    client: httpx.AsyncClient,
+    token: str,
+    *,
+    company_code: str,
+    bank_code: str,
+    account_number: str,
+    day_from: str,
+    day_to: str,
+) -> Optional[Dict[str, Counter]]:
+    """Tải mọi giao dịch của tài khoản trong [day_from, day_to]; None nếu lỗi/quá giới hạn trang."""
+    by_day: Dict[str, Counter] = {}
+    for page in range(1, BANK_DEDUP_MAX_PAGES + 1):
+        params = {
+            "company_code": company_code,
+            "bank_code": bank_code,
+            "account_number": account_number,
+            "from_date": day_from,
+            "to_date": day_to,
+            "page": page,
+            "size": BANK_DEDUP_PAGE_SIZE,
+        }
+        r = await client.get(
+            f"{SERVICE_A_BASE_URL}/api/v1/bank-transactions",
+            headers={"Authorization": f"Bearer {token}"},
+            params=params,
+            timeout=25.0,
+        )
+        if r.status_code != 200:
+            logger.info("bank dedup fetch %s..%s HTTP %s", day_from, day_to, r.status_code)
+            return None
+        js = r.json() if r.content else {}
+        data = js.get("data") if isinstance(js, dict) else js
+        if not isinstance(data, list):
+            return None
+        for t in data:
+            if not isinstance(t, dict):
+                continue
+            fp = txn_fingerprint(t.get("txn_time"), t.get("amount"), t.get("balance_after", t.get("balance")))
+            if fp:
+                by_day.setdefault(fp[0], Counter())[fp[1]] += 1
+        if len(data) < BANK_DEDUP_PAGE_SIZE:
+            return by_day
+    logger.info("bank dedup fetch %s..%s exceeded %s pages", day_from, day_to, BANK_DEDUP_MAX_PAGES)
+    return None
+
+
+async def _refresh(
+    client: httpx.AsyncClient,
+    token: str,
+    idx: _AccountIndex,
+    days: Set[str],
+    account: Dict[str, Any],
+) -> None:
+    now = time.monotonic()
+    stale = sorted(d for d in days if d not in idx.days or now - idx.days[d][0] > BANK_DEDUP_WINDOW_TTL)
+    if not stale:
+        return
+    got = await _fetch_days(
+        client,
+        token,
+        company_code=account["company_code"],
+        bank_code=account["bank_code"],
+        account_number=account["account_number"],
+        day_from=stale[0],
+        day_to=stale[-1],
+    )
+    if got is None:
+        for d in stale:
+            idx.days.pop(d, None)
+        return
+    for d in stale:
+        idx.days[d] = (now, got.get(d, Counter()))
+
+
+async def mark_known_rows(
+    client: httpx.AsyncClient,
+    token: str,
+    *,
+    account_id: int,
+    account: Dict[str, Any],
+    rows: List[Dict[str, Any]],
+) -> int:
+    """
+    Gắn row["known"]=True cho dòng đã có trên Service A; trả số dòng đã có.
+    account cần company_code, bank_code, account_number (đã chuẩn hoá như khi apply).
+    Cờ known có sẵn trên dòng (client / lần preview trước) luôn bị xoá trước khi tính.
+    """
+    for r in rows:
+        r.pop("known", None)
+    if not BANK_DEDUP_ENABLED or not rows:
+        return 0
+    idx = _index_for(token, account_id)
+    fps = [txn_fingerprint(r.get("txn_time"), r.get("amount"), r.get("balance_after")) for r in rows]
+    try:
+        await _refresh(client, token, idx, {fp[0] for fp in fps if fp}, account)
+    except Exception as e:
+        logger.warning("bank dedup refresh failed (account=%s): %s", account_id, e)
+
+    seen: Counter = Counter()
+    known = 0
+    for r, fp in zip(rows, fps):
+        hit = bool(r.get("refer_code")) and r.get("refer_code") in idx.refer_codes
+        if not hit and fp and fp[0] in idx.days:
+            seen[fp[1]] += 1
+            hit = seen[fp[1]] <= idx.days[fp[0]][1].get(fp[1], 0)
+        r["known"] = hit
+        known += hit
+    return known
+
+
+def record_applied(token: str, account_id: int, rows: Iterable[Dict[str, Any]]) -> None:
+    """
+    Thêm vào chỉ mục (không cần tải lại) các dòng Service A đã xác nhận ghi/đã có —
+    chỉ truyền dòng có kết quả từng dòng, không phải mọi dòng của chunk 2xx.
+    """
+    if not BANK_DEDUP_ENABLED:
+        return
+    idx = _index_for(token, account_id)
+    for r in rows:
+        if r.get("refer_code"):
+            idx.refer_codes.add(str(r["refer_code"]))
+        fp = txn_fingerprint(r.get("txn_time"), r.get("amount"), r.get("balance_after"))
+        if fp and fp[0] in idx.days:
+            idx.days[fp[0]][1][fp[1]] += 1
+
+
+def forget_account(token: str, account_id: int) -> None:
+    """Bỏ chỉ mục ngày (lần sau tải lại) — dùng khi apply lỗi giữa chừng."""
+    idx = _indexes.get((token_cache_scope(token), int(account_id)))
+    if idx is not None:
+        idx.days.clear()
@@ -1,19 +1,27 @@
 from __future__ import annotations
-import io
 import re
 import math
 from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 from zoneinfo import ZoneInfo
 
-import pandas as pd
-
 from ..base_parser import ParseResult
+from ..readers import FMT_HTML, detect_format, read_table
 from ..utils.date_utils import parse_date as parse_date_util
 from ..utils.money_utils import parse_amount as parse_amount_util
-from ..utils.refer_code import gen_refer_code  # <- giữ nguyên
+from ..utils.refer_code import gen_refer_code, gen_refer_codes  # <- giữ nguyên
+
+if TYPE_CHECKING:  # pandas chỉ import khi parse (giảm thời gian khởi động worker)
+    import pandas as pd
 
 VN_TZ = ZoneInfo("Asia/Ho_Chi_Minh")
 
+# Thứ tự format giống _parse_txn_time: date_utils.parse_date trước, rồi format Woori
+_DATE_UTIL_FORMATS = ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d/%m/%y", "%Y/%m/%d", "%m/%d/%Y")
+_WOORI_FORMATS = ("%d.%m.%Y %H:%M:%S", "%d.%m.%Y %H:%M", "%d.%m.%Y")
+_PLAIN_INT_RE = re.compile(r"[+-]?[0-9]+")
+_WS_RE = re.compile(r"\s+")
+
 
 class WooriXlsParser:
     """
@@ -32,6 +40,12 @@ class WooriXlsParser:
     """
     BANK_CODE = "WOORI"
 
+    # header bắt buộc (ô đã chuẩn hoá lowercase) — registry dùng để chọn parser theo nội dung
+    HEADER_SIGNATURES = (
+        frozenset({"transaction time and date", "amount deposited"}),
+        frozenset({"거래일시", "맡기신금액"}),
+    )
+
     WOORI_HEADER_KEYS = {
         # English (đang có)
         "transaction time and date": "txn_time",
@@ -61,21 +75,15 @@ class WooriXlsParser:
             return True
         return name.endswith(".xls") or name.endswith(".xlsx") or name.endswith(".csv")
 
-    def _read_any(self, file_bytes: bytes, filename: str) -> pd.DataFrame:
-        name = (filename or "").lower()
-        if name.endswith(".csv"):
-            return pd.read_csv(io.BytesIO(file_bytes), header=None, dtype=str)
-        # Excel: đọc không đặt header (để tự dò)
+    def _read_any(self, file_bytes: bytes, filename: str, fmt: Optional[str] = None) -> pd.DataFrame:
+        fmt = fmt or detect_format(file_bytes, filename)
         try:
-            return pd.read_excel(io.BytesIO(file_bytes), header=None, dtype=str)
+            return read_table(file_bytes, fmt)
         except Exception:
-            # một số .xls là HTML table
-            tables = pd.read_html(io.BytesIO(file_bytes))
-            if not tables:
+            if fmt == FMT_HTML:
                 raise
-            df = tables[0]
-            df = df.astype(str)
-            return df
+            # một số .xls là HTML table (không có thẻ mở đầu nhận ra được)
+            return read_table(file_bytes, FMT_HTML)
 
     @staticmethod
     def _norm_text(x: str) -> str:
@@ -83,7 +91,7 @@ class WooriXlsParser:
             return ""
         s = str(x)
         s = s.replace('"', "").replace("’", "'").strip()
-        s = re.sub(r"\s+", " ", s)
+        s = _WS_RE.sub(" ", s)
         return s
 
     def _detect_header_row(self, df: pd.DataFrame) -> int:
@@ -175,18 +183,155 @@ class WooriXlsParser:
         except Exception:
             return None
 
+    # ---------- cột (column-wise) ----------
+    # Mỗi hàm dưới đây cho kết quả giống hệt hàm scalar tương ứng từng dòng (refer_code
+    # phụ thuộc vào đúng giá trị) — chỉ dạng phổ biến đi đường nhanh, còn lại gọi lại scalar.
+    # Cột object (dtype=str): 1 vòng list Python nhanh hơn chuỗi .str.replace của pandas.
+
+    def _norm_list(self, s: Optional[pd.Series], n: int) -> List[str]:
+        if s is None:
+            return [""] * n
+        memo: Dict[Any, str] = {}
+        out: List[str] = []
+        for v in s.tolist():
+            if not isinstance(v, str):
+                out.append(self._norm_text(v))
+                continue
+            if v not in memo:
+                memo[v] = self._norm_text(v)
+            out.append(memo[v])
+        return out
+
+    def _txn_time_column(self, s: Optional[pd.Series], n: int) -> List[Optional[datetime]]:
+        import pandas as pd
+
+        if s is None:
+            return [None] * n
+        text = pd.Series(self._norm_list(s, n), index=s.index, dtype=object)
+        parsed = pd.Series(pd.NaT, index=text.index, dtype="datetime64[ns]")
+        # chuỗi dạng số đi nhánh "Excel serial" của parse_date -> để scalar xử lý
+        todo = (text != "") & pd.to_numeric(text, errors="coerce").isna()
+        # format date_utils không có '.', format Woori luôn có '.' -> mỗi dòng chỉ thử 1 nhóm
+        dotted = text.str.contains(".", regex=False)
+        for formats, group in ((_DATE_UTIL_FORMATS, ~dotted), (_WOORI_FORMATS, dotted)):
+            for fmt in formats:
+                mask = todo & group & parsed.isna()
+                if not mask.any():
+                    break
+                got = pd.to_datetime(text[mask], format=fmt, errors="coerce")
+                got = got[got.notna()]
+                parsed[got.index] = got
+
+        out: List[Optional[datetime]] = list(parsed.array.to_pydatetime())
+        for i, (val, dt) in enumerate(zip(s.tolist(), out)):
+            if dt is None or dt != dt:  # NaT -> đường scalar (kể cả ô rỗng/lỗi)
+                out[i] = self._parse_txn_time(val)
+        return out
+
+    def _amount_column(self, s: Optional[pd.Series], n: int) -> List[Optional[float]]:
+        """_parse_amount_any cho cả cột: số nguyên sau khi bỏ , . khoảng trắng -> đường nhanh."""
+        if s is None:
+            return [self._parse_amount_any(None)] * n
+        memo: Dict[Any, Optional[float]] = {}
+        out: List[Optional[float]] = []
+        for v in s.tolist():
+            if isinstance(v, str):
+                digits = v.replace(",", "").replace(".", "").replace(" ", "")
+                if _PLAIN_INT_RE.fullmatch(digits):
+                    out.append(float(digits))
+                    continue
+                key = v
+            else:
+                key = "\0nan" if isinstance(v, float) and math.isnan(v) else v
+            if key not in memo:
+                memo[key] = self._parse_amount_any(v)
+            out.append(memo[key])
+        return out
+
+    @staticmethod
+    def _raw_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """= row.to_dict() từng dòng, NaN -> None."""
+        cols = list(df.columns)
+        columns = [
+            [None if (isinstance(v, float) and math.isnan(v)) else v for v in df[c].tolist()]
+            for c in cols
+        ]
+        return [dict(zip(cols, vals)) for vals in zip(*columns)] if cols else [{} for _ in range(len(df))]
+
     # ---------- main ----------
-    def parse(self, file_bytes: bytes) -> ParseResult:
+    def parse(self, file_bytes: bytes, *, fmt: Optional[str] = None) -> ParseResult:
         try:
-            df_raw = self._read_any(file_bytes, "woori_file")
+            df_raw = self._read_any(file_bytes, "woori_file", fmt=fmt)
         except Exception as e:
             return {"ok": False, "errors": [f"Lỗi đọc file: {e}"], "rows": [], "row_errors": []}
 
         header_row = self._detect_header_row(df_raw)
         df = self._build_named_df(df_raw, header_row)
 
-        rows, row_errors = [], []
+        if df.columns.is_unique:
+            rows, row_errors = self._parse_rows_columnar(df)
+        else:
+            rows, row_errors = self._parse_rows_iter(df)
+
+        errors = []
+        if not rows:
+            errors.append("Không tìm thấy dòng giao dịch hợp lệ nào (có thể header chưa nhận đúng).")
+
+        return {"ok": True, "rows": rows, "errors": errors, "row_errors": row_errors}
+
+    def _parse_rows_columnar(self, df: pd.DataFrame) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        n = len(df)
+
+        def col(name: str) -> Optional[pd.Series]:
+            return df[name] if name in df.columns else None
+
+        times = self._txn_time_column(col("txn_time"), n)
+        debits = self._amount_column(col("debit"), n)
+        credits = self._amount_column(col("credit"), n)
+        balances = self._amount_column(col("balance_after"), n)
+        remarks = self._norm_list(col("remarks"), n)
+        summaries = self._norm_list(col("summary"), n)
+        raws = self._raw_records(df)
+
+        rows: List[Dict[str, Any]] = []
+        row_errors: List[Dict[str, Any]] = []
+        for idx in range(n):
+            try:
+                txn_time_dt = times[idx]
+                if not txn_time_dt:
+                    raise ValueError("Thiếu ngày giao dịch")
+                if txn_time_dt.tzinfo is None:
+                    txn_time_dt = txn_time_dt.replace(tzinfo=VN_TZ)
+                txn_time_dt = txn_time_dt.astimezone(VN_TZ).replace(microsecond=0)
+
+                parts = [p for p in (remarks[idx], summaries[idx]) if p]
+                desc = " — ".join(parts) if parts else ""
+
+                amount = (credits[idx] or 0.0) - (debits[idx] or 0.0)
+                if abs(amount) < 1e-9:
+                    raise ValueError("Số tiền = 0 hoặc không đọc được")
+
+                rows.append(
+                    {
+                        "bank_code": self.BANK_CODE,
+                        "txn_time": txn_time_dt.isoformat(),
+                        "description": desc or None,
+                        "amount": amount,
+                        "balance_after": balances[idx],
+                        "ref_no": None,
+                        "raw": raws[idx],
+                    }
+                )
+            except Exception as e:
+                row_errors.append({"row": idx + 1, "reason": str(e)})
 
+        for row_obj, code in zip(rows, gen_refer_codes(rows)):
+            row_obj["refer_code"] = code
+        return rows, row_errors
+
+    def _parse_rows_iter(self, df: pd.DataFrame) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Đường cũ từng dòng — dùng khi header trùng tên cột (không tách cột được)."""
+        rows, row_errors = [], []
         for idx, row in df.iterrows():
             try:
                 txn_time_dt = self._parse_txn_time(row.get("txn_time"))
@@ -235,8 +380,4 @@ class WooriXlsParser:
             except Exception as e:
                 row_errors.append({"row": int(idx) + 1, "reason": str(e)})
 
-        errors = []
-        if not rows:
-            errors.append("Không tìm thấy dòng giao dịch hợp lệ nào (có thể header chưa nhận đúng).")
-
-        return {"ok": True, "rows": rows, "errors": errors, "row_errors": row_errors}
+        return rows, row_errors
@@ -0,0 +1,102 @@
+from __future__ import annotations
+import csv
+import io
+import os
+import re
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:  # pandas chỉ import khi đọc file
+    import pandas as pd
+
+# Định dạng file sao kê nhận biết được (theo nội dung, không tin đuôi file)
+FMT_XLSX = "xlsx"
+FMT_XLS = "xls"
+FMT_HTML = "html"  # nhiều ngân hàng xuất ".xls" thực chất là bảng HTML
+FMT_CSV = "csv"
+
+BANK_IMPORT_SAMPLE_ROWS = int(os.getenv("BANK_IMPORT_SAMPLE_ROWS", "50"))
+# HTML/CSV: chỉ đọc N byte đầu để lấy header khi chọn parser
+BANK_IMPORT_SAMPLE_BYTES = int(os.getenv("BANK_IMPORT_SAMPLE_BYTES", str(256 * 1024)))
+
+_ZIP_MAGIC = b"PK\x03\x04"
+_OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+_HTML_RE = re.compile(rb"<\s*(!doctype|html|table|meta|head|body|\?xml)", re.I)
+_WS_RE = re.compile(r"\s+")
+
+
+def detect_format(file_bytes: bytes, filename: str = "") -> str:
+    """Nhận dạng theo magic bytes; chỉ dùng đuôi file khi nội dung không nói gì."""
+    head = file_bytes[:1024]
+    if head.startswith(_ZIP_MAGIC):
+        return FMT_XLSX
+    if head.startswith(_OLE_MAGIC):
+        return FMT_XLS
+    text_head = head.lstrip(b"\xef\xbb\xbf\xff\xfe\xfe\xff \t\r\n\x00")
+    if _HTML_RE.match(text_head):
+        return FMT_HTML
+    name = (filename or "").lower()
+    if name.endswith(".xlsx"):
+        return FMT_XLSX
+    if name.endswith(".xls"):
+        return FMT_XLS
+    return FMT_CSV
+
+
+def read_table(file_bytes: bytes, fmt: str, *, nrows: Optional[int] = None) -> pd.DataFrame:
+    """
+    Đọc bảng thô (header=None, dtype=str) bằng đúng 1 reader theo định dạng.
+    - xlsx: openpyxl read-only (pandas tự dùng chế độ stream), nrows dừng sớm.
+    - csv: csv.reader đọc tuần tự từng dòng (chấp nhận dòng tiêu đề lệch số cột).
+    """
+    import pandas as pd
+
+    if fmt == FMT_CSV:
+        return _read_csv(file_bytes, nrows)
+    if fmt == FMT_HTML:
+        data = file_bytes[:BANK_IMPORT_SAMPLE_BYTES] if nrows is not None else file_bytes
+        tables = pd.read_html(io.BytesIO(data))
+        if not tables:
+            raise ValueError("Không có bảng nào trong file HTML")
+        df = tables[0].astype(str)
+        return df.head(nrows) if nrows is not None else df
+    engine = "openpyxl" if fmt == FMT_XLSX else "xlrd"
+    return pd.read_excel(io.BytesIO(file_bytes), header=None, dtype=str, nrows=nrows, engine=engine)
+
+
+def _read_csv(file_bytes: bytes, nrows: Optional[int]) -> pd.DataFrame:
+    """
+    Sao kê CSV thường có vài dòng tiêu đề ít cột hơn bảng -> pandas.read_csv báo lỗi.
+    Đọc tuần tự bằng csv.reader, pad cho đủ cột; ô rỗng = NaN như read_csv(dtype=str).
+    """
+    import pandas as pd
+
+    if nrows is not None:
+        data = file_bytes[:BANK_IMPORT_SAMPLE_BYTES]
+        stream = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8-sig", errors="replace", newline="")
+    else:
+        stream = io.TextIOWrapper(io.BytesIO(file_bytes), encoding="utf-8-sig", newline="")
+    rows: List[List[object]] = []
+    width = 0
+    for rec in csv.reader(stream):
+        if not rec or not any(c.strip() for c in rec):
+            continue
+        rows.append([c if c != "" else float("nan") for c in rec])
+        width = max(width, len(rec))
+        if nrows is not None and len(rows) >= nrows:
+            break
+    nan = float("nan")
+    return pd.DataFrame([r + [nan] * (width - len(r)) for r in rows], dtype=object)
+
+
+def _norm_cell(v) -> str:
+    if v is None:
+        return ""
+    s = str(v).replace('"', "").replace("’", "'").strip()
+    return _WS_RE.sub(" ", s).lower()
+
+
+def header_sample(file_bytes: bytes, fmt: str, rows: Optional[int] = None) -> List[List[str]]:
+    """N dòng đầu (ô đã chuẩn hoá lowercase) — đủ để dò header, không đọc cả file."""
+    n = rows or BANK_IMPORT_SAMPLE_ROWS
+    df = read_table(file_bytes, fmt, nrows=n)
+    return [[_norm_cell(v) for v in r] for r in df.head(n).itertuples(index=False, name=None)]
@@ -1,14 +1,57 @@
 from __future__ import annotations
-from typing import List
+import logging
+from typing import Dict, FrozenSet, List, Optional, Tuple
 from .base_parser import ParseResult, BankStatementParser
 from .parsers.woori_xls import WooriXlsParser
+from .readers import detect_format, header_sample
+
+logger = logging.getLogger(__name__)
 
 PARSERS: List[BankStatementParser] = [
     WooriXlsParser(),
 ]
 
+
+def _build_signature_index(
+    parsers: List[BankStatementParser],
+) -> Dict[str, List[Tuple[FrozenSet[str], BankStatementParser]]]:
+    """Ô header -> [(chữ ký đầy đủ, parser)]; mỗi chữ ký đăng ký dưới 1 ô bất kỳ của nó."""
+    index: Dict[str, List[Tuple[FrozenSet[str], BankStatementParser]]] = {}
+    for p in parsers:
+        for sig in getattr(p, "HEADER_SIGNATURES", ()) or ():
+            if sig:
+                index.setdefault(min(sig), []).append((frozenset(sig), p))
+    return index
+
+
+_SIGNATURE_INDEX = _build_signature_index(PARSERS)
+
+
+def match_parser(sample: List[List[str]]) -> Optional[BankStatementParser]:
+    """Dòng đầu tiên trong mẫu chứa đủ 1 chữ ký header -> parser tương ứng."""
+    for row in sample:
+        cells = {c for c in row if c}
+        for cell in cells:
+            for sig, parser in _SIGNATURE_INDEX.get(cell, ()):
+                if sig <= cells:
+                    return parser
+    return None
+
+
 def sniff_and_parse(file_bytes: bytes, filename: str) -> ParseResult:
-    for p in PARSERS:
-        if p.can_parse(file_bytes, filename):
-            return p.parse(file_bytes)
-    return {"ok": False, "rows": [], "errors": ["Không tìm thấy parser phù hợp"], "row_errors": []}
+    """
+    Nhận dạng định dạng theo magic bytes, đọc ~50 dòng đầu để so chữ ký header với
+    mọi parser (1 lần), rồi chỉ parser được chọn đọc toàn bộ file — đúng 1 lần.
+    Không khớp chữ ký thì rơi về can_parse theo tên file như trước.
+    """
+    fmt = detect_format(file_bytes, filename)
+    parser: Optional[BankStatementParser] = None
+    try:
+        parser = match_parser(header_sample(file_bytes, fmt))
+    except Exception as e:
+        logger.info("bank import header sample failed (%s, fmt=%s): %s", filename, fmt, e)
+    if parser is None:
+        parser = next((p for p in PARSERS if p.can_parse(file_bytes, filename)), None)
+    if parser is None:
+        return {"ok": False, "rows": [], "errors": ["Không tìm thấy parser phù hợp"], "row_errors": []}
+    return parser.parse(file_bytes, fmt=fmt)
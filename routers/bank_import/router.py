@@ -1,4 +1,6 @@
 from __future__ import annotations
+import asyncio
+import logging
 import os
 import io
 import httpx
@@ -9,7 +11,12 @@ from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 
 from utils.templates import templates
 from utils.auth import get_access_token
+from .bulk_apply import apply_in_chunks
+from .dedup_index import forget_account, mark_known_rows, record_applied
 from .registry import sniff_and_parse
+from .staging import drop_staged, load_staged, page_of, save_staged, stage_parse_result
+
+logger = logging.getLogger(__name__)
 
 SERVICE_A_BASE_URL = os.getenv("SERVICE_A_BASE_URL", "http://127.0.0.1:8824")
 
@@ -33,6 +40,34 @@ async def _api_post_json(client: httpx.AsyncClient, path: str, token: str, paylo
         timeout=45.0,
     )
 
+async def _company_and_account(client: httpx.AsyncClient, token: str, account_id: int):
+    """(company_code, account dict) — /auth/me và tài khoản công ty gọi song song."""
+    r_me, r_acc = await asyncio.gather(
+        _api_get(client, "/auth/me", token),
+        _api_get(client, f"/api/v1/company_bank_accounts/{int(account_id)}", token),
+    )
+    company_code = None
+    if r_me.status_code == 200:
+        try:
+            company_code = (r_me.json() or {}).get("company_code")
+        except Exception:
+            pass
+    account = None
+    if r_acc.status_code == 200:
+        try:
+            account = r_acc.json()
+        except Exception:
+            account = None
+    return company_code, account
+
+
+def _account_identity(account: Dict[str, Any]) -> Tuple[str, str]:
+    """(bank_code, account_number) đã chuẩn hoá — dùng cho items gửi A và chỉ mục dedup."""
+    acc_number_raw = account.get("account_number") or account.get("account_no") or ""
+    bank_code_raw = account.get("bank_code") or account.get("code") or ""
+    return str(bank_code_raw).upper().strip(), str(acc_number_raw).replace(" ", "").replace(".", "")
+
+
 @router.get("", response_class=HTMLResponse)
 async def import_upload_form(request: Request, account_id: int | None = Query(None)):
     token = get_access_token(request)
@@ -80,7 +115,8 @@ async def import_preview(request: Request, file: UploadFile, account_id: int = F
 
     content = await file.read()
 
-    result = sniff_and_parse(content, file.filename)
+    # đọc + parse file (pandas) trong thread — không chặn event loop
+    result = await asyncio.to_thread(sniff_and_parse, content, file.filename)
     if not result.get("ok"):
         return templates.TemplateResponse(
             "bank/import_preview.html",
@@ -88,21 +124,78 @@ async def import_preview(request: Request, file: UploadFile, account_id: int = F
                 "request": request,
                 "title": "Preview sao kê",
                 "error": "Không đọc được file hoặc không có parser phù hợp.",
-                "result": {"rows": [], "row_errors": [], "errors": result.get("errors", [])},
+                "errors": result.get("errors", []),
+                "summary": None,
+                "row_errors": [],
+                "page": page_of({"rows": []}, 1),
                 "filename": file.filename,
                 "account_id": account_id,
+                "stage_id": None,
             },
             status_code=400,
         )
 
+    # đánh dấu dòng đã có trên Service A (lỗi -> bỏ qua, apply vẫn dedup lại)
+    try:
+        async with httpx.AsyncClient() as client:
+            company_code, account = await _company_and_account(client, token, account_id)
+            if company_code and account:
+                bank_code, acc_number = _account_identity(account)
+                await mark_known_rows(
+                    client,
+                    token,
+                    account_id=account_id,
+                    account={"company_code": company_code, "bank_code": bank_code, "account_number": acc_number},
+                    rows=result.get("rows") or [],
+                )
+    except Exception as e:
+        logger.warning("bank import dedup preview skipped (account=%s): %s", account_id, e)
+
+    # lưu tạm kết quả parse phía server -> preview từng trang, apply theo stage_id
+    doc = await stage_parse_result(token, account_id=account_id, filename=file.filename or "", result=result)
+    return RedirectResponse(url=f"/giao-dich-ngan-hang/import/preview/{doc['id']}", status_code=303)
+
+
+@router.get("/preview/{stage_id}", response_class=HTMLResponse)
+async def import_preview_page(
+    request: Request,
+    stage_id: str,
+    page: int = Query(1, ge=1),
+    size: int | None = Query(None, ge=1, le=1000),
+):
+    token = get_access_token(request)
+    if not token:
+        return RedirectResponse(url="/login?next=%2Fgiao-dich-ngan-hang%2Fimport", status_code=303)
+
+    doc = await load_staged(token, stage_id)
+    if doc is None:
+        return templates.TemplateResponse(
+            "bank/import_preview.html",
+            {
+                "request": request,
+                "title": "Preview sao kê",
+                "error": "Bản xem trước đã hết hạn hoặc không tồn tại. Vui lòng tải file lên lại.",
+                "summary": None,
+                "row_errors": [],
+                "page": page_of({"rows": []}, 1),
+                "filename": "",
+                "account_id": None,
+                "stage_id": None,
+            },
+            status_code=404,
+        )
+
     return templates.TemplateResponse(
         "bank/import_preview.html",
         {
             "request": request,
             "title": "Preview sao kê",
-            "result": result,
-            "filename": file.filename,
-            "account_id": account_id,
+            "summary": doc["summary"],
+            "row_errors": doc.get("row_errors") or [],
+            "page": page_of(doc, page, size),
+            "filename": doc.get("filename") or "",
+            "account_id": doc["account_id"],
+            "stage_id": doc["id"],
         },
     )
 
@@ -110,7 +203,7 @@ async def import_preview(request: Request, file: UploadFile, account_id: int = F
 async def import_apply(request: Request):
     """
     Body từ FE:
-      { "account_id": 123, "rows": [ ... ] }
+      { "stage_id": "..." }   (rows lấy từ kết quả parse đã stage lúc preview)
 
     Gọi Service A (BankBulkImportIn):
       {
@@ -129,34 +222,23 @@ async def import_apply(request: Request):
     except Exception:
         return JSONResponse({"error": "bad_json"}, status_code=400)
 
-    account_id = payload_in.get("account_id")
-    rows = payload_in.get("rows") or []
-    if not account_id or not isinstance(rows, list) or len(rows) == 0:
+    stage_id = str((payload_in or {}).get("stage_id") or "")
+    if not stage_id:
+        return JSONResponse({"error": "invalid_payload"}, status_code=400)
+    doc = await load_staged(token, stage_id)
+    if doc is None:
+        return JSONResponse({"error": "stage_expired"}, status_code=410)
+    account_id = doc["account_id"]
+    # known chỉ do server tính lại bên dưới — không tin cờ có sẵn trong dữ liệu
+    rows = [{k: v for k, v in r.items() if k != "known"} for r in (doc.get("rows") or [])]
+    if len(rows) == 0:
         return JSONResponse({"error": "invalid_payload"}, status_code=400)
 
-    # --- Lấy company_code ---
-    company_code = None
+    # --- Lấy company_code + tài khoản công ty (song song) ---
     async with httpx.AsyncClient() as client:
-        r_me = await _api_get(client, "/auth/me", token)
-    if r_me.status_code == 200:
-        try:
-            me = r_me.json()
-            company_code = (me or {}).get("company_code")
-        except Exception:
-            pass
+        company_code, account = await _company_and_account(client, token, int(account_id))
     if not company_code:
         return JSONResponse({"error": "no_company_code"}, status_code=400)
-
-    # --- Lấy thông tin tài khoản công ty (bắt buộc để enrich) ---
-    async with httpx.AsyncClient() as client:
-        r_acc = await _api_get(client, f"/api/v1/company_bank_accounts/{int(account_id)}", token)
-    if r_acc.status_code != 200:
-        return JSONResponse({"error": "account_not_found"}, status_code=400)
-
-    try:
-        account = r_acc.json()
-    except Exception:
-        account = None
     if not account:
         return JSONResponse({"error": "account_not_found"}, status_code=400)
 
@@ -164,8 +246,7 @@ async def import_apply(request: Request):
     bank_code_raw  = account.get("bank_code") or account.get("code") or ""
     is_active      = account.get("is_active", True)
 
-    acc_number = str(acc_number_raw).replace(" ", "").replace(".", "")
-    bank_code  = str(bank_code_raw).upper().strip()
+    bank_code, acc_number = _account_identity(account)
 
     if not acc_number or not bank_code:
         return JSONResponse(
@@ -176,9 +257,28 @@ async def import_apply(request: Request):
     if not is_active:
         return JSONResponse({"error": "account_inactive"}, status_code=400)
 
+    # --- Bỏ dòng đã có trên Service A (chỉ mục dedup cục bộ) ---
+    # Chốt 1 lần cho stage: gửi lại sau lỗi dùng đúng danh sách này (không tính lại known,
+    # vì dòng của chunk đã xong giờ thành "đã có") -> cùng items, cùng chunk, resume được.
+    picked = doc.get("apply_rows")
+    if isinstance(picked, list):
+        known = int(doc.get("skipped_known") or 0)
+    else:
+        dedup_account = {"company_code": company_code, "bank_code": bank_code, "account_number": acc_number}
+        async with httpx.AsyncClient() as client:
+            known = await mark_known_rows(client, token, account_id=int(account_id), account=dedup_account, rows=rows)
+        picked = [i for i, r in enumerate(rows, start=1) if not r.get("known")]
+        doc["apply_rows"], doc["skipped_known"] = picked, known
+        if picked:
+            await save_staged(doc)
+    new_rows = [(i, rows[i - 1]) for i in picked if 0 < i <= len(rows)]
+    if not new_rows:
+        await drop_staged(stage_id)
+        return JSONResponse({"inserted": 0, "skipped_known": known, "import": {"chunks_total": 0}}, status_code=200)
+
     # --- Map rows -> items (NormalizedTxnIn) ---
     items: list[dict] = []
-    for i, r in enumerate(rows, start=1):
+    for i, r in new_rows:
         amt = float(r.get("amount") or 0)
 
         # balance_after: có thể None
@@ -200,13 +300,6 @@ async def import_apply(request: Request):
             "src_line"       : r.get("src_line") or i,
         })
 
-    body = {
-        "company_code": company_code,
-        "policy": "STRICT",  # đổi thành "REPLACE" nếu muốn cho phép cập nhật khi khác dữ liệu
-        "items": items,
-    }
-    params = {"body_company_code": company_code}
-
     # --- DEBUG: log payload gửi sang Service A ---
     try:
         print("=== [DEBUG] Import Bulk -> ServiceA ===")
@@ -222,24 +315,56 @@ async def import_apply(request: Request):
     except Exception:
         pass
 
-    # --- Gọi Service A ---
+    # --- Gọi Service A theo chunk (song song, resume được) ---
     async with httpx.AsyncClient() as client:
-        r = await _api_post_json(client, "/api/v1/bank-transactions/bulk", token, body, params)
-
-    # --- Log và trả về ---
-    print("=== [DEBUG] ServiceA bulk result ===")
-    print("Status:", r.status_code)
-    try:
-        print("Body:", r.json())
-    except Exception:
-        print("Text:", r.text[:400])
+        out = await apply_in_chunks(
+            client,
+            token,
+            company_code=company_code,
+            account_id=int(account_id),
+            stage_id=stage_id,
+            items=items,
+        )
+    confirmed = out.pop("confirmed")
 
-    try:
-        j = r.json()
-    except Exception:
-        j = {"detail": r.text[:400]}
+    # chỉ log số đếm (kết quả A có thể chứa dữ liệu giao dịch)
+    counts = {
+        k: v
+        for k, v in (out.get("result") or {}).items()
+        if isinstance(v, (int, float)) and not isinstance(v, bool)
+    }
+    logger.info(
+        "bank import job=%s chunks ok=%s/%s resumed=%s counts=%s",
+        out["job_id"],
+        out["chunks_ok"],
+        out["chunks_total"],
+        out["chunks_resumed"],
+        counts,
+    )
 
-    if r.status_code >= 400:
-        return JSONResponse({"error": "upstream", "status": r.status_code, "body": j}, status_code=502)
+    if out["failed_chunks"]:
+        forget_account(token, int(account_id))
+        first = out["failed_chunks"][0]
+        return JSONResponse(
+            {
+                "error": "upstream",
+                "status": first.get("status"),
+                "body": {
+                    "detail": (
+                        f"Đã gửi {out['chunks_ok']}/{out['chunks_total']} phần. "
+                        "Bấm Gửi lại để gửi tiếp các phần lỗi (phần đã xong không gửi lại)."
+                    ),
+                    "first_error": first.get("body") or first.get("error"),
+                },
+                **out,
+            },
+            status_code=502,
+        )
 
-    return JSONResponse(j, status_code=200)
+    # chỉ nhớ dòng A xác nhận đã ghi/đã có (items và new_rows cùng thứ tự)
+    record_applied(token, int(account_id), [new_rows[j][1] for j in confirmed])
+    await drop_staged(stage_id)
+    return JSONResponse(
+        {**out["result"], "skipped_known": known, "import": {k: v for k, v in out.items() if k != "result"}},
+        status_code=200,
+    )
@@ -0,0 +1,186 @@
+"""
+Kết quả parse sao kê lưu tạm phía server (stage) — preview phân trang, apply theo stage_id.
+
+- Mỗi lần upload: rows (bỏ `raw`) + row_errors + tổng hợp (tính 1 lần) ghi ra
+  BANK_IMPORT_STAGE_DIR/{stage_id}.json; nhiều worker uvicorn đọc chung được.
+- stage gắn phạm vi công ty (token_cache_scope) + account_id: id lộ ra cũng không đọc
+  chéo công ty được. Hết BANK_IMPORT_STAGE_TTL giây -> coi như không còn.
+- Vài stage gần nhất giữ trong bộ nhớ để chuyển trang không phải đọc lại JSON.
+- Lần apply đầu chốt các dòng cần gửi (apply_rows) vào stage: bấm "Gửi" lại sau lỗi gửi
+  đúng danh sách đó -> cùng bố cục chunk, job resume theo stage_id.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import secrets
+import time
+from typing import Any, Dict, List, Optional
+
+from utils.auth import token_cache_scope
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+BANK_IMPORT_STAGE_TTL = float(os.getenv("BANK_IMPORT_STAGE_TTL", "3600"))
+BANK_IMPORT_STAGE_DIR = os.getenv("BANK_IMPORT_STAGE_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "var", "bank_import_staged"
+)
+BANK_IMPORT_PREVIEW_PAGE_SIZE = max(1, int(os.getenv("BANK_IMPORT_PREVIEW_PAGE_SIZE", "100")))
+
+_memo = TTLCache(ttl_seconds=BANK_IMPORT_STAGE_TTL, maxsize=8)
+
+
+def _stage_path(stage_id: str) -> str:
+    return os.path.join(BANK_IMPORT_STAGE_DIR, f"{stage_id}.json")
+
+
+def _valid_id(stage_id: str) -> bool:
+    return bool(stage_id) and len(stage_id) <= 64 and all(c.isalnum() or c in "-_" for c in stage_id)
+
+
+def summarize_rows(rows: List[Dict[str, Any]], row_errors: List[Any]) -> Dict[str, Any]:
+    """Tổng hợp hiển thị đầu trang preview (chỉ tính lúc stage)."""
+    credit = debit = 0.0
+    known = 0
+    times: List[str] = []
+    for r in rows:
+        try:
+            amt = float(r.get("amount") or 0)
+        except (TypeError, ValueError):
+            amt = 0.0
+        if amt >= 0:
+            credit += amt
+        else:
+            debit += -amt
+        if r.get("known"):
+            known += 1
+        if r.get("txn_time"):
+            times.append(str(r["txn_time"]))
+    return {
+        "rows": len(rows),
+        "row_errors": len(row_errors or []),
+        "known": known,
+        "new": len(rows) - known,
+        "credit": credit,
+        "debit": debit,
+        "first_time": min(times) if times else None,
+        "last_time": max(times) if times else None,
+    }
+
+
+def _prune_expired(now: float) -> None:
+    try:
+        names = os.listdir(BANK_IMPORT_STAGE_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(BANK_IMPORT_STAGE_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > BANK_IMPORT_STAGE_TTL:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _write_stage(stage_id: str, text: str) -> None:
+    path = _stage_path(stage_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+    _prune_expired(time.time())
+
+
+def _read_stage(stage_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_stage_path(stage_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("bank import stage %s unreadable: %s", stage_id, e)
+        return None
+
+
+async def stage_parse_result(
+    token: str,
+    *,
+    account_id: int,
+    filename: str,
+    result: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Lưu kết quả parse; trả doc đã stage (có `id`, `summary`)."""
+    rows = [{k: v for k, v in r.items() if k != "raw"} for r in (result.get("rows") or [])]
+    row_errors = result.get("row_errors") or []
+    doc = {
+        "id": secrets.token_urlsafe(16),
+        "created_at": time.time(),
+        "scope": token_cache_scope(token),
+        "account_id": int(account_id),
+        "filename": filename or "",
+        "rows": rows,
+        "row_errors": row_errors,
+        "summary": summarize_rows(rows, row_errors),
+    }
+    text = json.dumps(doc, ensure_ascii=False, default=str)
+    await asyncio.to_thread(_write_stage, doc["id"], text)
+    _memo.set(doc["id"], doc)
+    return doc
+
+
+async def save_staged(doc: Dict[str, Any]) -> None:
+    """Ghi lại doc đã stage (vd sau khi chốt các dòng cần gửi lúc apply)."""
+    text = json.dumps(doc, ensure_ascii=False, default=str)
+    await asyncio.to_thread(_write_stage, doc["id"], text)
+    _memo.set(doc["id"], doc)
+
+
+async def load_staged(token: str, stage_id: str) -> Optional[Dict[str, Any]]:
+    """Doc đã stage của đúng phạm vi công ty, còn hạn; None nếu không có."""
+    if not _valid_id(stage_id):
+        return None
+    doc = _memo.get(stage_id)
+    if doc is None:
+        doc = await asyncio.to_thread(_read_stage, stage_id)
+        if doc is None:
+            return None
+        _memo.set(stage_id, doc)
+    if time.time() - float(doc.get("created_at") or 0) > BANK_IMPORT_STAGE_TTL:
+        return None
+    if doc.get("scope") != token_cache_scope(token):
+        return None
+    return doc
+
+
+async def drop_staged(stage_id: str) -> None:
+    if not _valid_id(stage_id):
+        return
+    _memo.invalidate(stage_id)
+    try:
+        await asyncio.to_thread(os.remove, _stage_path(stage_id))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning("bank import stage %s remove failed: %s", stage_id, e)
+
+
+def page_of(doc: Dict[str, Any], page: int, size: Optional[int] = None) -> Dict[str, Any]:
+    """1 trang rows + thông tin phân trang (start: vị trí dòng đầu trang trong toàn bộ rows)."""
+    size = max(1, min(int(size or BANK_IMPORT_PREVIEW_PAGE_SIZE), 1000))
+    rows = doc.get("rows") or []
+    total = len(rows)
+    pages = max(1, (total + size - 1) // size)
+    page = min(max(1, int(page or 1)), pages)
+    start = (page - 1) * size
+    return {
+        "page": page,
+        "size": size,
+        "total": total,
+        "pages": pages,
+        "start": start,
+        "rows": rows[start : start + size],
+    }
@@ -2,7 +2,10 @@
 from __future__ import annotations
 import hashlib
 import json
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, List
+
+# = json.dumps(row, sort_keys=True, ensure_ascii=False) nhưng không dựng encoder mỗi dòng
+_ENCODER = json.JSONEncoder(sort_keys=True, ensure_ascii=False)
 
 
 def gen_refer_code(row: Dict[str, Any]) -> str:
@@ -15,8 +18,13 @@ def gen_refer_code(row: Dict[str, Any]) -> str:
     """
     # Chỉ giữ các trường ổn định; raw có thể lớn nhưng vẫn OK cho tính duy nhất
     try:
-        base_str = json.dumps(row, sort_keys=True, ensure_ascii=False)
+        base_str = _ENCODER.encode(row)
     except Exception:
         base_str = str(row)
     h = hashlib.sha256(base_str.encode("utf-8")).hexdigest()[:8]
     return f"REF:{h.upper()}"
+
+
+def gen_refer_codes(rows: Iterable[Dict[str, Any]]) -> List[str]:
+    """gen_refer_code cho cả lô dòng (cùng kết quả từng dòng)."""
+    return [gen_refer_code(r) for r in rows]
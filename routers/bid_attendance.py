@@ -9,7 +9,7 @@ import httpx
 from fastapi import APIRouter, Request, Query
 from fastapi.responses import HTMLResponse, RedirectResponse
 
-from utils.templates import templates
+from utils.templates import stream_template, templates
 from utils.auth import get_access_token, fetch_me
 from utils.document_templates.registry import DocKind, company_code_from_me, resolve_template
 
@@ -215,7 +215,7 @@ async def print_bid_attendance(
         )
     )
 
-    return templates.TemplateResponse(
+    return stream_template(
         resolve_template(company_code_from_me(me), DocKind.ATTENDANCE_PRE),
         {
             "request": request,
@@ -11,6 +11,7 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 
 from utils.templates import templates
 from utils.auth import get_access_token, fetch_me
+from utils.bid_ticket_issue_client import invalidate_issued_tokens
 from routers.bid_attendance_group_exclusions import (
     fetch_registration_mode,
     render_group_detail_page,
@@ -49,6 +50,9 @@ async def _post_json(
     params: Optional[dict] = None,
 ):
     r = await client.post(url, headers=headers, params=params or {}, json=payload)
+    if r.status_code == 200 and (payload or {}).get("project_id") is not None:
+        # loại/gỡ loại khách-lô-đơn: phiếu đã phát hành (token QR) không còn dùng lại
+        invalidate_issued_tokens(payload["project_id"], customer_id=payload.get("customer_id"))
     try:
         return r.status_code, r.json()
     except Exception:
@@ -8,9 +8,9 @@ import httpx
 from fastapi import APIRouter, Request, Query
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 
-from utils.templates import templates
+from utils.templates import stream_template, templates
 from utils.auth import get_access_token, fetch_me
-from utils.bid_ticket_issue_client import attach_qr_to_tickets
+from utils.bid_ticket_issue_client import attach_qr_to_tickets, invalidate_issued_tokens
 from utils.document_templates.registry import DocKind, company_code_from_me, resolve_template
 
 router = APIRouter(prefix="/bid-tickets", tags=["bid_tickets"])
@@ -530,6 +530,7 @@ async def api_assign_group_deposit_lot_bid_tickets(
         if r.status_code >= 400:
             msg = _api_error_message(body, "Gán lô thất bại")
             return JSONResponse({"ok": False, "error": msg, "detail": body.get("detail")}, status_code=r.status_code)
+        invalidate_issued_tokens(pid)
         return JSONResponse(body, status_code=r.status_code)
     except Exception as e:
         return JSONResponse({"ok": False, "error": str(e)}, status_code=500)
@@ -567,6 +568,7 @@ async def api_unassign_group_deposit_lot_bid_tickets(
         if r.status_code >= 400:
             msg = _api_error_message(body, "Huỷ gán lô thất bại")
             return JSONResponse({"ok": False, "error": msg, "detail": body.get("detail")}, status_code=r.status_code)
+        invalidate_issued_tokens(pid)
         return JSONResponse(body, status_code=r.status_code)
     except Exception as e:
         return JSONResponse({"ok": False, "error": str(e)}, status_code=500)
@@ -706,7 +708,7 @@ async def print_all_bid_tickets(
 
     rows = await _tickets_with_qr(token, rows, source="PRE_SESSION")
 
-    return templates.TemplateResponse(
+    return stream_template(
         _bid_sheet_template(me),
         {
             "request": request,
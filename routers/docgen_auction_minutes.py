@@ -10,7 +10,7 @@ import httpx
 from fastapi import APIRouter, Form, Query, Request
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
 
-from routers.auction_documents_print import build_session_progress_data
+from services.session_progress import get_session_progress
 from services.docgen_v1_client import (
     create_instance,
     finalize_instance,
@@ -21,15 +21,17 @@ from services.docgen_v1_client import (
     reopen_instance,
     update_instance,
 )
-from utils.auth import fetch_me, get_access_token
+from utils.auth import fetch_me, get_access_token, verified_cache_scope
 from utils.docgen_auction_minutes_render import (
     DEFAULT_BIDDERS_NOTE,
     attachment_content_disposition,
     download_filename,
-    html_to_pdf_bytes,
+    html_to_pdf_bytes_async,
     render_auction_minutes_html,
 )
 from utils.docgen_contract_render import ctx_for_editor
+from utils.pdf_render_pool import PdfRenderBusy
+from utils.render_cache import cached_html, cached_pdf
 from utils.document_templates.registry import DocKind, company_code_from_me, resolve_template
 from utils.forms_catalog.catalog import get_form_item, get_phase
 from utils.templates import templates
@@ -242,14 +244,26 @@ async def _render_auction_minutes(
     fields = dict(fields_override if fields_override is not None else (inst.get("fields") or {}))
     fields = await _enrich_minutes_from_session(token, fields)
     tpl = resolve_template(company_code or None, DocKind.AUCTION_MINUTES)
-    html = render_auction_minutes_html(
-        request,
-        template_path=tpl,
-        fields=fields,
-        ctx=ctx,
-        instance=inst,
-        for_download=for_download,
-        for_preview=for_preview,
+    html = await cached_html(
+        instance_id,
+        tpl,
+        {
+            "ctx": ctx,
+            "fields": fields,
+            "instance": inst,
+            "for_download": for_download,
+            "for_preview": for_preview,
+            "base": str(request.base_url),
+        },
+        lambda: render_auction_minutes_html(
+            request,
+            template_path=tpl,
+            fields=fields,
+            ctx=ctx,
+            instance=inst,
+            for_download=for_download,
+            for_preview=for_preview,
+        ),
     )
     return html, inst, ctx, tpl
 
@@ -472,7 +486,9 @@ async def auction_minutes_sync_progression(
             status_code=400,
         )
     try:
-        prog = await build_session_progress_data(token, int(session_id))
+        prog = await get_session_progress(
+            token, int(session_id), scope=verified_cache_scope(request, token)
+        )
     except Exception as e:
         return JSONResponse({"ok": False, "error": _err_msg(e)}, status_code=502)
 
@@ -548,7 +564,9 @@ async def auction_minutes_download_pdf(request: Request, instance_id: int):
         html, inst, _, _ = await _render_auction_minutes(
             request, token, instance_id, cc, for_download=True
         )
-        pdf = html_to_pdf_bytes(html)
+        pdf = await cached_pdf(instance_id, html, html_to_pdf_bytes_async)
+    except PdfRenderBusy as e:
+        return HTMLResponse(str(e), status_code=503)
     except Exception as e:
         return HTMLResponse(f"Error: {_err_msg(e)}", status_code=500)
     fname = download_filename(inst, "pdf")
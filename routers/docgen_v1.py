@@ -34,11 +34,13 @@ from services.docgen_v1_client import (
 )
 from utils.auth import fetch_me, get_access_token
 from utils.document_templates.registry import DocKind, company_code_from_me, resolve_template
+from utils.pdf_render_pool import PdfRenderBusy
+from utils.render_cache import cached_html, cached_pdf
 from utils.docgen_contract_render import (
     attachment_content_disposition,
     ctx_for_editor,
     download_filename,
-    html_to_pdf_bytes,
+    html_to_pdf_bytes_async,
     merge_fields_for_render,
     merge_ctx_values_for_render,
     render_contract_html,
@@ -570,12 +572,17 @@ async def _render_contract(
     )
     ov = overrides_override if overrides_override is not None else (inst.get("overrides") or {})
     ctx = merge_ctx_values_for_render(ctx, fields, ov)
-    html = await render_contract_html(
-        request,
-        template_path=tpl,
-        ctx=ctx,
-        fields=fields,
-        for_download=for_download,
+    html = await cached_html(
+        instance_id,
+        tpl,
+        {"ctx": ctx, "fields": fields, "for_download": for_download, "base": str(request.base_url)},
+        lambda: render_contract_html(
+            request,
+            template_path=tpl,
+            ctx=ctx,
+            fields=fields,
+            for_download=for_download,
+        ),
     )
     return html, inst, ctx, tpl
 
@@ -753,7 +760,9 @@ async def contract_download_pdf(request: Request, instance_id: int):
     cc = company_code_from_me(me)
     try:
         html, inst, _, _ = await _render_contract(request, token, instance_id, cc, for_download=True)
-        pdf_bytes = html_to_pdf_bytes(html)
+        pdf_bytes = await cached_pdf(instance_id, html, html_to_pdf_bytes_async)
+    except PdfRenderBusy as e:
+        return HTMLResponse(str(e), status_code=503)
     except Exception as e:
         return HTMLResponse(f"Không tạo được PDF: {_err_msg(e)}", status_code=500)
     fname = download_filename(inst, "pdf")
@@ -874,12 +883,17 @@ async def _render_regulations(
     )
     ov = overrides_override if overrides_override is not None else (inst.get("overrides") or {})
     ctx = merge_reg_ctx_values(ctx, fields, ov)
-    html = await render_regulations_html(
-        request,
-        template_path=tpl,
-        ctx=ctx,
-        fields=fields,
-        for_download=for_download,
+    html = await cached_html(
+        instance_id,
+        tpl,
+        {"ctx": ctx, "fields": fields, "for_download": for_download, "base": str(request.base_url)},
+        lambda: render_regulations_html(
+            request,
+            template_path=tpl,
+            ctx=ctx,
+            fields=fields,
+            for_download=for_download,
+        ),
     )
     return html, inst, ctx, tpl
 
@@ -1067,7 +1081,9 @@ async def regulations_download_pdf(request: Request, instance_id: int):
     cc = company_code_from_me(me)
     try:
         html, inst, _, _ = await _render_regulations(request, token, instance_id, cc, for_download=True)
-        pdf_bytes = html_to_pdf_bytes(html)
+        pdf_bytes = await cached_pdf(instance_id, html, html_to_pdf_bytes_async)
+    except PdfRenderBusy as e:
+        return HTMLResponse(str(e), status_code=503)
     except Exception as e:
         return HTMLResponse(f"Không tạo được PDF: {_err_msg(e)}", status_code=500)
     from utils.docgen_regulations_render import download_filename as reg_download_filename
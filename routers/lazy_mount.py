@@ -0,0 +1,93 @@
+# routers/lazy_mount.py
+"""
+Mount router "lười" — chỉ import module router (và dependency nặng của nó) khi
+có request đầu tiên vào prefix, hoặc khi warmup sau startup.
+
+Dùng cho nhóm ít truy cập (biểu mẫu/docgen, billing, mobile mirror) để worker
+sẵn sàng nhanh hơn sau deploy. Bật bằng LAZY_ROUTERS=1 (xem main.py).
+"""
+from __future__ import annotations
+
+import logging
+from typing import Callable, Iterable, List, Tuple
+
+from fastapi import FastAPI
+from starlette._utils import get_route_path
+from starlette.routing import BaseRoute, Match
+from starlette.types import Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+
+class LazyRouterMount(BaseRoute):
+    """
+    Route giữ chỗ: match mọi path dưới các prefix đã khai báo. Lần đầu được gọi
+    sẽ chạy loader (include_router thật), thay chính nó bằng các route mới tại
+    đúng vị trí cũ rồi dispatch lại request qua router của app.
+    """
+
+    def __init__(
+        self,
+        app: FastAPI,
+        *,
+        name: str,
+        prefixes: Iterable[str],
+        loader: Callable[[FastAPI], None],
+    ) -> None:
+        self._app = app
+        self.name = name
+        self.prefixes: Tuple[str, ...] = tuple(p.rstrip("/") for p in prefixes)
+        self._loader = loader
+        self.loaded = False
+
+    def matches(self, scope: Scope) -> Tuple[Match, Scope]:
+        if scope["type"] not in ("http", "websocket"):
+            return Match.NONE, {}
+        path = get_route_path(scope)
+        for p in self.prefixes:
+            if path == p or path.startswith(p + "/"):
+                return Match.FULL, {}
+        return Match.NONE, {}
+
+    def load(self) -> None:
+        if self.loaded:
+            return
+        routes = self._app.router.routes
+        before = len(routes)
+        self._loader(self._app)
+        new_routes: List[BaseRoute] = routes[before:]
+        del routes[before:]
+        try:
+            idx = routes.index(self)
+        except ValueError:
+            idx = len(routes)
+        # giữ thứ tự route như khi include ngay lúc startup
+        routes[idx : idx + 1] = new_routes
+        self.loaded = True
+        logger.info("lazy router %s loaded (%s routes)", self.name, len(new_routes))
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.load()
+        await self._app.router.app(scope, receive, send)
+
+
+def mount_lazy(
+    app: FastAPI,
+    *,
+    name: str,
+    prefixes: Iterable[str],
+    loader: Callable[[FastAPI], None],
+) -> LazyRouterMount:
+    route = LazyRouterMount(app, name=name, prefixes=prefixes, loader=loader)
+    app.router.routes.append(route)
+    return route
+
+
+def load_all_lazy(app: FastAPI) -> None:
+    """Warmup: nạp mọi router lười còn lại (gọi từ lifespan sau khi worker đã nhận request)."""
+    for route in list(app.router.routes):
+        if isinstance(route, LazyRouterMount) and not route.loaded:
+            try:
+                route.load()
+            except Exception:
+                logger.exception("lazy router %s warmup failed", route.name)
@@ -1,16 +1,12 @@
 # routers/mobile/apis/v1/mirror.py
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Optional
 
-from fastapi import APIRouter, Header, HTTPException, Request
-from starlette.responses import JSONResponse, StreamingResponse
+from fastapi import APIRouter, Header, Request
 
-from routers.mobile.service_a_client import (
-    require_bearer,
-    request_json_with_status,
-    request_raw,
-)
+from routers.mobile import conditional_get, ingest_spool
+from routers.mobile.service_a_client import require_bearer, stream_proxy
 
 router = APIRouter(tags=["mobile-v1-mirror"])
 
@@ -64,72 +60,22 @@ async def mirror_all(
     upstream = _upstream_path(full_path)
 
     # ✅ Only require Bearer for non-open endpoints
-    bearer: Optional[str] = None
     if upstream not in OPEN_PATHS:
-        bearer = require_bearer(authorization)
-
-    headers = {"Authorization": bearer} if bearer else None
-
-    # Query params passthrough
-    params: List[Tuple[str, Any]] = list(request.query_params.multi_items())
-
-    # Read body once for both json + raw fallback
-    try:
-        raw_body: bytes = await request.body()
-    except Exception:
-        raw_body = b""
-
-    # Parse JSON body if content-type is JSON (only for methods with body)
-    json_body: Optional[Dict[str, Any]] = None
-    if request.method in {"POST", "PUT", "PATCH"}:
-        ct = (request.headers.get("content-type") or "").lower()
-        if "application/json" in ct:
-            try:
-                json_body = await request.json()
-            except Exception:
-                json_body = None
-
-    # 1) JSON-first passthrough (NO WRAP)
-    try:
-        status_code, data = await request_json_with_status(
-            request.method,
-            upstream,
-            headers=headers,
-            params=params,
-            json=json_body,
-        )
-        # Return raw JSON body exactly as A returned (status preserved)
-        return JSONResponse(content=data, status_code=status_code)
-
-    except HTTPException as he:
-        status = he.status_code
-        detail = he.detail
-
-        # If upstream returned JSON error (typical 4xx), pass through raw error body & status
-        if 400 <= status < 500:
-            # detail might be dict/list/str - JSONResponse handles it
-            return JSONResponse(content=detail, status_code=status)
-
-        # 5xx / file endpoints / content-type mismatch -> raw streaming fallback
-        raw = await request_raw(
-            request.method,
-            upstream,
-            headers=headers,
-            params=params,
-            content=raw_body if raw_body else None,
-            content_type=request.headers.get("content-type"),
-        )
-
-        # Forward headers (drop hop-by-hop)
-        forward_headers: Dict[str, str] = {}
-        for k, v in raw.headers.items():
-            lk = k.lower()
-            if lk in {"content-length", "transfer-encoding", "connection"}:
-                continue
-            forward_headers[k] = v
-
-        return StreamingResponse(
-            raw.iter_bytes(),
-            status_code=raw.status_code,
-            headers=forward_headers,
-        )
\ No newline at end of file
+        require_bearer(authorization)
+
+    # Device ingest (bank-SMS / heartbeat): batched and/or spooled locally while A is down
+    if request.method == "POST":
+        if upstream == ingest_spool.INGEST_PATH and (
+            ingest_spool.BANK_SMS_BATCH_ENABLED or ingest_spool.INGEST_SPOOL_ON_OUTAGE
+        ):
+            return await ingest_spool.handle_bank_sms_ingest(request)
+        if upstream == ingest_spool.HEARTBEAT_PATH and ingest_spool.INGEST_SPOOL_ON_OUTAGE:
+            return await ingest_spool.handle_heartbeat(request)
+
+    # Authenticated JSON GETs: ETag / If-None-Match -> 304, `since=<ETag>` delta lists
+    if request.method == "GET" and upstream not in OPEN_PATHS and conditional_get.MOBILE_ETAG_ENABLED:
+        return await conditional_get.conditional_get(request, upstream, authorization)
+
+    # Byte-level passthrough: body/headers/status exactly as A returned (JSON, xlsx, pdf...),
+    # 1 upstream attempt only (no JSON-then-raw replay on errors).
+    return await stream_proxy(request, upstream)
@@ -0,0 +1,268 @@
+# routers/mobile/conditional_get.py
+"""
+ETag / If-None-Match and `since` delta mode for authenticated mobile mirror GETs.
+
+- JSON 200 responses up to MOBILE_ETAG_MAX_BYTES are buffered: ETag = hash of the body
+  (W/"m-..."), matching If-None-Match -> 304 with no body. Larger/binary responses
+  stay on the byte-level stream path; a chunked body that passes the cap while being
+  read is streamed on (bytes already read first) without an ETag.
+- Lists whose items carry `id` + `updated_at` (body is a list, or body["data"] /
+  body["data"]["items"|"data"] / body["items"]) get a snapshot {id: item hash} cached
+  per (user scope, path, query, ETag) for MOBILE_DELTA_SNAPSHOT_TTL seconds.
+- `?since=<ETag from a previous response>`: the list is replaced by the items added or
+  changed since that snapshot; the body keeps its shape (a top-level list stays a list).
+  Delta metadata goes in headers X-Delta-Since / X-Delta-Removed (JSON list of ids) /
+  X-Delta-Changed / X-Delta-Total, and object bodies also get body["delta"] = {since,
+  etag, removed, changed, total}. Unknown/expired ETag, or more removed ids than fit in
+  MOBILE_DELTA_MAX_REMOVED_BYTES of header -> full body (header X-Delta: full).
+  `since` values that are not mirror ETags are forwarded to A untouched.
+- JSON bodies >= 1 KB are gzipped when the client accepts it (weak 3G links).
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+
+from routers.mobile.service_a_client import HOP_BY_HOP_HEADERS, _filter_headers, open_upstream, streaming_response
+from utils.auth import _jwt_payload_unverified, token_cache_scope
+from utils.ttl_cache import TTLCache
+
+MOBILE_ETAG_ENABLED = os.getenv("MOBILE_ETAG_ENABLED", "1").strip().lower() not in ("0", "false", "no", "off")
+MOBILE_ETAG_MAX_BYTES = int(os.getenv("MOBILE_ETAG_MAX_BYTES", str(4 * 1024 * 1024)))
+MOBILE_DELTA_SNAPSHOT_TTL = float(os.getenv("MOBILE_DELTA_SNAPSHOT_TTL", "900"))
+MOBILE_DELTA_SNAPSHOT_MAX = max(1, int(os.getenv("MOBILE_DELTA_SNAPSHOT_MAX", "500")))
+# X-Delta-Removed above this (JSON bytes) -> full list instead (proxies cap header size ~8 KB)
+MOBILE_DELTA_MAX_REMOVED_BYTES = max(64, int(os.getenv("MOBILE_DELTA_MAX_REMOVED_BYTES", "4096")))
+MOBILE_GZIP_MIN_BYTES = 1024
+
+_ETAG_PREFIX = "m-"
+# (scope, path, query, etag) -> {id: item hash}
+_snapshots = TTLCache(ttl_seconds=MOBILE_DELTA_SNAPSHOT_TTL, maxsize=MOBILE_DELTA_SNAPSHOT_MAX)
+# response headers recomputed here (body may be re-encoded / replaced)
+_DROP_RESPONSE_HEADERS = HOP_BY_HOP_HEADERS | {"content-length", "content-encoding", "etag"}
+
+
+def user_scope(authorization: Optional[str]) -> str:
+    """Company + user from the JWT (unverified: A verifies); fallback = token hash."""
+    token = (authorization or "").split(" ", 1)[-1].strip()
+    payload = _jwt_payload_unverified(token)
+    user = payload.get("sub") or payload.get("user_id") or payload.get("username")
+    if user:
+        return f"{token_cache_scope(token)}:{user}"
+    return "t:" + hashlib.sha1(token.encode("utf-8")).hexdigest()[:16]
+
+
+def make_etag(body: bytes) -> str:
+    return f'W/"{_ETAG_PREFIX}{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    return tag.strip('"')
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison (RFC 7232 §3.2), handles lists and '*'."""
+    if not if_none_match:
+        return False
+    want = _opaque(etag)
+    return any(t.strip() == "*" or _opaque(t) == want for t in if_none_match.split(","))
+
+
+def _is_mirror_etag(value: str) -> bool:
+    return _opaque(value).startswith(_ETAG_PREFIX)
+
+
+def find_list(body: Any) -> Optional[Tuple[Any, Any]]:
+    """(container, key) of the item list in the usual response shapes, or None."""
+    if isinstance(body, list):
+        return None, None
+    if not isinstance(body, dict):
+        return None
+    data = body.get("data")
+    if isinstance(data, list):
+        return body, "data"
+    if isinstance(data, dict):
+        for k in ("items", "data"):
+            if isinstance(data.get(k), list):
+                return data, k
+    if isinstance(body.get("items"), list):
+        return body, "items"
+    return None
+
+
+def _items(body: Any, loc: Tuple[Any, Any]) -> List[Any]:
+    container, key = loc
+    return body if container is None else container[key]
+
+
+def item_hashes(items: List[Any]) -> Optional[Dict[str, str]]:
+    """{id: hash} when every item is a dict with id + updated_at; else None (not delta-able)."""
+    out: Dict[str, str] = {}
+    for it in items:
+        if not isinstance(it, dict) or it.get("id") is None or "updated_at" not in it:
+            return None
+        raw = json.dumps(it, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+        out[str(it["id"])] = hashlib.sha1(raw).hexdigest()[:16]
+    return out
+
+
+def build_delta(
+    body: Any, loc: Tuple[Any, Any], old: Dict[str, str], new: Dict[str, str], since: str, etag: str
+) -> Optional[Tuple[Any, Dict[str, Any]]]:
+    """
+    (body with only changed items, delta metadata); a top-level list stays a list.
+    None (body untouched) when the removed ids do not fit in X-Delta-Removed.
+    """
+    removed = [i for i in old if i not in new]
+    if len(_removed_header(removed)) > MOBILE_DELTA_MAX_REMOVED_BYTES:
+        return None
+    items = _items(body, loc)
+    changed = [it for it in items if old.get(str(it["id"])) != new[str(it["id"])]]
+    meta = {
+        "since": since,
+        "etag": etag,
+        "removed": removed,
+        "changed": len(changed),
+        "total": len(items),
+    }
+    container, key = loc
+    if container is None:
+        return changed, meta
+    container[key] = changed
+    body["delta"] = meta
+    return body, meta
+
+
+def _removed_header(removed: List[str]) -> bytes:
+    return json.dumps(removed, separators=(",", ":")).encode("latin-1")
+
+
+def _delta_headers(meta: Dict[str, Any]) -> List[Tuple[bytes, bytes]]:
+    return [
+        (b"x-delta-since", meta["since"].encode("latin-1")),
+        (b"x-delta-removed", _removed_header(meta["removed"])),
+        (b"x-delta-changed", str(meta["changed"]).encode("latin-1")),
+        (b"x-delta-total", str(meta["total"]).encode("latin-1")),
+    ]
+
+
+async def _read_capped(chunks: AsyncIterator[bytes], limit: int) -> Tuple[List[bytes], bool]:
+    """Chunks until the body ends (True) or more than `limit` bytes were read (False)."""
+    head: List[bytes] = []
+    size = 0
+    async for chunk in chunks:
+        head.append(chunk)
+        size += len(chunk)
+        if size > limit:
+            return head, False
+    return head, True
+
+
+def _stream_rest(upstream: httpx.Response, head: List[bytes], rest: AsyncIterator[bytes]) -> StreamingResponse:
+    """Body over the cap: bytes already read, then the rest of A's stream (decoded)."""
+
+    async def body():
+        for chunk in head:
+            yield chunk
+        async for chunk in rest:
+            yield chunk
+
+    response = StreamingResponse(body(), status_code=upstream.status_code, background=BackgroundTask(upstream.aclose))
+    response.raw_headers = _filter_headers(
+        list(upstream.headers.raw), HOP_BY_HOP_HEADERS | {"content-length", "content-encoding"}
+    )
+    return response
+
+
+def _encode(request: Request, content: bytes, headers: List[Tuple[bytes, bytes]]) -> bytes:
+    if len(content) >= MOBILE_GZIP_MIN_BYTES and "gzip" in (request.headers.get("accept-encoding") or "").lower():
+        content = gzip.compress(content, compresslevel=5)
+        headers.append((b"content-encoding", b"gzip"))
+    headers.append((b"vary", b"Accept-Encoding"))
+    return content
+
+
+async def conditional_get(request: Request, path: str, authorization: Optional[str]) -> Response:
+    """GET through the mirror with ETag/304 + `since` delta; non-JSON falls back to streaming."""
+    params = [(k, v) for k, v in request.query_params.multi_items()]
+    since = next((v for k, v in params if k == "since" and _is_mirror_etag(v)), None)
+    if since is not None:
+        params = [(k, v) for k, v in params if not (k == "since" and v == since)]
+
+    # our ETags mean nothing to A: don't forward If-None-Match
+    upstream = await open_upstream(request, path, params=params, drop_headers={"if-none-match"})
+    if isinstance(upstream, JSONResponse):
+        return upstream
+
+    ctype = (upstream.headers.get("content-type") or "").lower()
+    declared = upstream.headers.get("content-length")
+    if (
+        upstream.status_code != 200
+        or not ctype.startswith("application/json")
+        or (declared is not None and declared.isdigit() and int(declared) > MOBILE_ETAG_MAX_BYTES)
+    ):
+        return streaming_response(upstream)
+
+    # declared length may be missing (chunked): stop at the cap (decoded bytes) and stream the rest
+    chunks = upstream.aiter_bytes()
+    try:
+        head, complete = await _read_capped(chunks, MOBILE_ETAG_MAX_BYTES)
+    except httpx.HTTPError as e:
+        await upstream.aclose()
+        return JSONResponse({"detail": f"Upstream Service A error: {str(e)}"}, status_code=502)
+    if not complete:
+        return _stream_rest(upstream, head, chunks)
+    await upstream.aclose()
+    content = b"".join(head)
+    etag = make_etag(content)
+
+    headers = _filter_headers(list(upstream.headers.raw), _DROP_RESPONSE_HEADERS)
+    headers = [(k, v) for k, v in headers if k.lower() != b"cache-control"]
+    headers += [(b"etag", etag.encode("latin-1")), (b"cache-control", b"private, no-cache")]
+
+    if etag_matches(request.headers.get("if-none-match"), etag) or (since is not None and _opaque(since) == _opaque(etag)):
+        resp = Response(status_code=304)
+        resp.raw_headers = [(k, v) for k, v in headers if k.lower() != b"content-type"]
+        return resp
+
+    try:
+        body = json.loads(content)
+    except ValueError:
+        body = None
+    loc = find_list(body) if body is not None else None
+    hashes = item_hashes(_items(body, loc)) if loc is not None else None
+
+    delta = "none"
+    if hashes is not None:
+        query = "&".join(f"{k}={v}" for k, v in sorted(params))
+        base = (user_scope(authorization), path, query)
+        _snapshots.set((*base, _opaque(etag)), hashes)
+        if since is not None:
+            old = _snapshots.get((*base, _opaque(since)))
+            built = build_delta(body, loc, old, hashes, since, etag) if old is not None else None
+            if built is None:
+                delta = "full"
+            else:
+                delta = "1"
+                body, meta = built
+                headers += _delta_headers(meta)
+                content = json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if since is not None:
+        headers.append((b"x-delta", b"full" if delta == "none" else delta.encode("latin-1")))
+
+    content = _encode(request, content, headers)
+    headers.append((b"content-length", str(len(content)).encode("latin-1")))
+    resp = Response(content=content, status_code=200)
+    resp.raw_headers = headers
+    return resp
@@ -0,0 +1,643 @@
+# routers/mobile/ingest_spool.py
+"""
+Local durable spool for public device ingest (bank-SMS forwarders + device heartbeat).
+
+Storage: 1 SQLite file (WAL, synchronous=FULL) shared by all uvicorn workers.
+
+Bank-SMS (/public/mobile/bank-sms/ingest):
+- BANK_SMS_BATCH_ENABLED=1: every single post is acked (202) once committed to the spool;
+  the flusher forwards queued messages to /ingest/bulk when BANK_SMS_BATCH_MAX are waiting
+  or the oldest has waited BANK_SMS_BATCH_WINDOW_MS.
+- Otherwise (INGEST_SPOOL_ON_OUTAGE=1): 1 direct call to A; on connection error / 502-504,
+  or while A is known to be down, or while older messages are still spooled (ordering),
+  the message is spooled and acked 202 — devices stop retrying, A is not hammered.
+- Ordering: exactly one flusher across workers (lease row in the same file) replays rows
+  in enqueue order and stops at the first message/batch A does not accept. The lease is
+  renewed before every call to A (its TTL outlasts one call); a flusher that lost it
+  stops before sending anything else, so an expired lease never means two replays. Outage-only
+  spooling replays on the single /ingest endpoint; /ingest/bulk is used only when
+  BANK_SMS_BATCH_ENABLED=1.
+- A 2xx from /ingest/bulk marks rows sent only when the body reports per-item results or
+  an accepted count equal to the batch size; anything else is re-sent one by one.
+- Idempotency: Idempotency-Key header (or a hash of device + body). A repeated key within
+  BANK_SMS_DEDUP_TTL is acked as duplicate and not queued again. Replays carry the key too
+  (Idempotency-Key header on /ingest, BANK_SMS_BULK_IDEM_FIELD in each bulk item) so A can
+  drop a message it already stored before a timeout.
+- Bulk rejected with 4xx -> messages are retried one by one on /ingest to isolate the
+  bad one, which is parked as "dead" (kept in the file, never dropped silently).
+
+Heartbeat (/public/mobile/device-heartbeat/ping): during an outage only the latest ping
+per device is kept and replayed after the SMS backlog is drained.
+
+Backpressure: above INGEST_SPOOL_MAX_QUEUED rows or INGEST_SPOOL_MAX_MB on disk new SMS
+get 503 + Retry-After (not acked -> the device keeps the message and retries later).
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+logger = logging.getLogger(__name__)
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+BANK_SMS_BATCH_ENABLED = _flag("BANK_SMS_BATCH_ENABLED", "0")
+BANK_SMS_BATCH_MAX = max(1, int(os.getenv("BANK_SMS_BATCH_MAX", "200")))
+BANK_SMS_BATCH_WINDOW_MS = max(10, int(os.getenv("BANK_SMS_BATCH_WINDOW_MS", "500")))
+BANK_SMS_DEDUP_TTL = float(os.getenv("BANK_SMS_DEDUP_TTL", "86400"))
+BANK_SMS_MAX_BODY_BYTES = int(os.getenv("BANK_SMS_MAX_BODY_BYTES", str(64 * 1024)))
+# key of the list in the /ingest/bulk body: {"items": [<single ingest body>, ...]}
+BANK_SMS_BULK_ITEMS_KEY = os.getenv("BANK_SMS_BULK_ITEMS_KEY", "items")
+# idempotency key added to each bulk item on replay ("" = don't add)
+BANK_SMS_BULK_IDEM_FIELD = os.getenv("BANK_SMS_BULK_IDEM_FIELD", "idempotency_key").strip()
+# per-phase timeout of 1 replay call; the flusher lease outlasts a whole call
+BANK_SMS_POST_TIMEOUT = max(1.0, float(os.getenv("BANK_SMS_POST_TIMEOUT", "15")))
+BANK_SMS_SPOOL_PATH = os.getenv("BANK_SMS_SPOOL_PATH") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "var", "mobile_spool", "bank_sms.sqlite3"
+)
+
+INGEST_SPOOL_ON_OUTAGE = _flag("INGEST_SPOOL_ON_OUTAGE", "1")
+INGEST_SPOOL_MAX_QUEUED = max(1, int(os.getenv("INGEST_SPOOL_MAX_QUEUED", "100000")))
+INGEST_SPOOL_MAX_MB = float(os.getenv("INGEST_SPOOL_MAX_MB", "256"))
+INGEST_OUTAGE_BACKOFF_MAX = float(os.getenv("INGEST_OUTAGE_BACKOFF_MAX", "60"))
+
+INGEST_PATH = "/public/mobile/bank-sms/ingest"
+INGEST_BULK_PATH = "/public/mobile/bank-sms/ingest/bulk"
+HEARTBEAT_PATH = "/public/mobile/device-heartbeat/ping"
+FLUSHER_LEASE = "bank_sms_flusher"
+
+_DEVICE_FIELDS = ("device_id", "deviceId", "device_uid", "android_id")
+_RETRYABLE_4XX = {408, 425, 429}
+# A is down / overloaded: spool instead of passing the error to the device
+_OUTAGE_STATUSES = {502, 503, 504}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sms_queue (
+    seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+    idem_key   TEXT    NOT NULL UNIQUE,
+    device     TEXT    NOT NULL,
+    body       TEXT    NOT NULL,
+    created_at REAL    NOT NULL,
+    state      TEXT    NOT NULL DEFAULT 'queued',
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    done_at    REAL
+);
+CREATE INDEX IF NOT EXISTS ix_sms_queue_state_seq ON sms_queue (state, seq);
+CREATE TABLE IF NOT EXISTS heartbeat_latest (
+    device     TEXT PRIMARY KEY,
+    body       TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name  TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    until REAL NOT NULL
+);
+"""
+
+# post(path, payload, headers=None) -> (status | None on connection error, body)
+PostFn = Callable[..., Awaitable[Tuple[Optional[int], Any]]]
+HoldFn = Callable[[], Awaitable[None]]
+
+
+class SpoolFull(RuntimeError):
+    """Spool reached INGEST_SPOOL_MAX_QUEUED / INGEST_SPOOL_MAX_MB."""
+
+
+class LeaseLost(RuntimeError):
+    """Another worker holds the flusher lease now; stop replaying (it resumes from the queue)."""
+
+
+class SmsSpool:
+    """SQLite-backed queue; all methods are blocking (call via asyncio.to_thread)."""
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=10.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def disk_bytes(self) -> int:
+        total = 0
+        for suffix in ("", "-wal"):
+            try:
+                total += os.path.getsize(self.path + suffix)
+            except OSError:
+                pass
+        return total
+
+    def enqueue(self, idem_key: str, device: str, body: str, *, check_cap: bool = False) -> bool:
+        """True if queued, False if the key was already seen (duplicate). SpoolFull when capped."""
+        with self._lock:
+            if check_cap:
+                dup = self._db.execute("SELECT 1 FROM sms_queue WHERE idem_key = ?", (idem_key,)).fetchone()
+                if dup:
+                    return False
+                (n,) = self._db.execute("SELECT COUNT(*) FROM sms_queue WHERE state = 'queued'").fetchone()
+                if n >= INGEST_SPOOL_MAX_QUEUED or self.disk_bytes() >= INGEST_SPOOL_MAX_MB * 1024 * 1024:
+                    raise SpoolFull(f"{n} queued")
+            cur = self._db.execute(
+                "INSERT OR IGNORE INTO sms_queue (idem_key, device, body, created_at) VALUES (?, ?, ?, ?)",
+                (idem_key, device, body, time.time()),
+            )
+            return cur.rowcount == 1
+
+    def has_queued(self) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM sms_queue WHERE state = 'queued' LIMIT 1").fetchone() is not None
+
+    def pending(self) -> Tuple[int, Optional[float]]:
+        with self._lock:
+            n, oldest = self._db.execute(
+                "SELECT COUNT(*), MIN(created_at) FROM sms_queue WHERE state = 'queued'"
+            ).fetchone()
+        return int(n), oldest
+
+    def next_batch(self, limit: int) -> List[Tuple[int, str, str]]:
+        """(seq, idempotency key as the device sent it, body) in enqueue order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, device, idem_key, body FROM sms_queue WHERE state = 'queued' ORDER BY seq LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [
+            (seq, key[len(device) + 1 :] if key.startswith(f"{device}:") else key, body)
+            for seq, device, key, body in rows
+        ]
+
+    def mark(self, seqs: List[int], state: str, error: Optional[str] = None) -> None:
+        if not seqs:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "UPDATE sms_queue SET state = ?, last_error = ?, done_at = ?, attempts = attempts + 1 WHERE seq = ?",
+                    [(state, error, now, s) for s in seqs],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def record_failure(self, seqs: List[int], error: str) -> None:
+        if not seqs:
+            return
+        with self._lock:
+            self._db.execute(
+                f"UPDATE sms_queue SET attempts = attempts + 1, last_error = ? WHERE seq IN ({','.join('?' * len(seqs))})",
+                (error, *seqs),
+            )
+
+    def purge_sent(self, older_than: float) -> int:
+        """Sent rows are kept BANK_SMS_DEDUP_TTL only to answer duplicates."""
+        with self._lock:
+            return self._db.execute(
+                "DELETE FROM sms_queue WHERE state = 'sent' AND done_at < ?", (older_than,)
+            ).rowcount
+
+    def put_heartbeat(self, device: str, body: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO heartbeat_latest (device, body, created_at) VALUES (?, ?, ?)",
+                (device, body, time.time()),
+            )
+
+    def heartbeats(self, limit: int) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            return self._db.execute(
+                "SELECT device, body, created_at FROM heartbeat_latest ORDER BY created_at LIMIT ?", (limit,)
+            ).fetchall()
+
+    def drop_heartbeat(self, device: str, created_at: float) -> None:
+        # a newer ping stored meanwhile (different created_at) is kept
+        with self._lock:
+            self._db.execute("DELETE FROM heartbeat_latest WHERE device = ? AND created_at = ?", (device, created_at))
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT owner, until FROM leases WHERE name = ?", (name,)).fetchone()
+                if row is None or row[0] == owner or row[1] < now:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO leases (name, owner, until) VALUES (?, ?, ?)", (name, owner, now + ttl)
+                    )
+                    ok = True
+                else:
+                    ok = False
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return ok
+
+
+class _Outage:
+    """Per-worker view of A's health: after a failure, skip A until `until` (exp. backoff)."""
+
+    def __init__(self) -> None:
+        self.until = 0.0
+        self.backoff = 0.0
+
+    def failed(self) -> None:
+        base = BANK_SMS_BATCH_WINDOW_MS / 1000.0
+        self.backoff = min(max(self.backoff * 2, base, 1.0), INGEST_OUTAGE_BACKOFF_MAX)
+        self.until = time.time() + self.backoff
+
+    def ok(self) -> None:
+        self.backoff = 0.0
+        self.until = 0.0
+
+    def active(self) -> bool:
+        return time.time() < self.until
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.until - time.time()) if self.active() else int(self.backoff or 30))
+
+
+outage = _Outage()
+
+_spool: Optional[SmsSpool] = None
+_spool_lock = threading.Lock()
+_flusher: Optional[asyncio.Task] = None
+_wake: Optional[asyncio.Event] = None
+_owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def get_spool() -> SmsSpool:
+    global _spool
+    with _spool_lock:
+        if _spool is None:
+            _spool = SmsSpool(BANK_SMS_SPOOL_PATH)
+        return _spool
+
+
+def _device_of(request: Request, payload: Dict[str, Any]) -> str:
+    for f in _DEVICE_FIELDS:
+        v = payload.get(f)
+        if v not in (None, ""):
+            return str(v)[:128]
+    v = request.headers.get("x-device-id")
+    if v:
+        return v[:128]
+    return request.client.host if request.client else "unknown"
+
+
+def idempotency_key(request: Request, device: str, body: bytes) -> str:
+    key = request.headers.get("idempotency-key") or request.headers.get("x-idempotency-key")
+    if key:
+        return f"{device}:{key.strip()[:200]}"
+    return f"{device}:sha256:{hashlib.sha256(body).hexdigest()}"
+
+
+async def _post_json(path: str, payload: Any, headers: Optional[Dict[str, str]] = None) -> Tuple[Optional[int], Any]:
+    """1 call to Service A via the mirror's shared client; (None, error) on connection errors."""
+    import httpx
+
+    from routers.mobile.service_a_client import _proxy
+
+    try:
+        r = await _proxy().post(path, json=payload, headers=headers, timeout=BANK_SMS_POST_TIMEOUT)
+    except httpx.RequestError as e:
+        return None, str(e) or e.__class__.__name__
+    try:
+        body = r.json()
+    except Exception:
+        body = r.text[:400]
+    return r.status_code, body
+
+
+async def _forward_buffered(request: Request, path: str, body: bytes) -> Optional[Response]:
+    """1 direct call with the already-read body; None on connection error (caller spools)."""
+    import httpx
+
+    from routers.mobile.service_a_client import HOP_BY_HOP_HEADERS, _DROP_REQUEST_HEADERS, _filter_headers, _proxy
+
+    headers = [(k, v) for k, v in _filter_headers(list(request.headers.raw), _DROP_REQUEST_HEADERS) if k.lower() != b"content-length"]
+    try:
+        r = await _proxy().request(
+            request.method, path, params=list(request.query_params.multi_items()), headers=headers, content=body
+        )
+    except httpx.RequestError as e:
+        logger.warning("ingest %s upstream error: %s", path, e)
+        return None
+    resp = Response(content=r.content, status_code=r.status_code)
+    resp.raw_headers = [
+        (k, v) for k, v in _filter_headers(list(r.headers.raw), HOP_BY_HOP_HEADERS | {"content-length", "content-encoding"})
+    ] + [(b"content-length", str(len(r.content)).encode("latin-1"))]
+    return resp
+
+
+def _accepted(data: Dict[str, Any]) -> JSONResponse:
+    return JSONResponse({"code": 202, "message": "Accepted", "data": data}, status_code=202)
+
+
+def _wake_flusher() -> None:
+    ensure_flusher()
+    if _wake is not None:
+        _wake.set()
+
+
+async def _spool_sms(key: str, device: str, body: bytes, reason: str) -> JSONResponse:
+    try:
+        queued = await asyncio.to_thread(get_spool().enqueue, key, device, body.decode("utf-8"), check_cap=True)
+    except SpoolFull as e:
+        logger.error("bank-sms spool full (%s) — rejecting new SMS", e)
+        return JSONResponse(
+            {"detail": "Ingest spool is full, retry later"},
+            status_code=503,
+            headers={"Retry-After": str(outage.retry_after())},
+        )
+    _wake_flusher()
+    return _accepted({"queued": queued, "duplicate": not queued, "idempotency_key": key, "reason": reason})
+
+
+def _parse_object(body: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        payload = json.loads(body)
+    except Exception:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+async def handle_bank_sms_ingest(request: Request) -> Response:
+    """Single bank-SMS post: batched, spooled during outages, or forwarded directly."""
+    body = await request.body()
+    if len(body) > BANK_SMS_MAX_BODY_BYTES:
+        return JSONResponse({"detail": "Body too large"}, status_code=413)
+    payload = _parse_object(body)
+    if payload is None:
+        if BANK_SMS_BATCH_ENABLED:
+            return JSONResponse({"detail": "Body must be a JSON object"}, status_code=400)
+        # not spoolable -> let A answer (single attempt, no spool)
+        return await _forward_buffered(request, INGEST_PATH, body) or JSONResponse(
+            {"detail": "Upstream Service A unavailable"}, status_code=502
+        )
+
+    device = _device_of(request, payload)
+    key = idempotency_key(request, device, body)
+    if BANK_SMS_BATCH_ENABLED:
+        return await _spool_sms(key, device, body, "batched")
+    if outage.active():
+        return await _spool_sms(key, device, body, "outage")
+    if await asyncio.to_thread(get_spool().has_queued):
+        # older messages still waiting for replay: this one must not overtake them
+        return await _spool_sms(key, device, body, "ordering")
+
+    resp = await _forward_buffered(request, INGEST_PATH, body)
+    if resp is None or resp.status_code in _OUTAGE_STATUSES:
+        outage.failed()
+        return await _spool_sms(key, device, body, "outage")
+    outage.ok()
+    return resp
+
+
+async def handle_heartbeat(request: Request) -> Response:
+    """Heartbeat ping: direct call; during an outage keep only the latest ping per device."""
+    body = await request.body()
+    payload = _parse_object(body) if len(body) <= BANK_SMS_MAX_BODY_BYTES else None
+    if payload is None:
+        return await _forward_buffered(request, HEARTBEAT_PATH, body) or JSONResponse(
+            {"detail": "Upstream Service A unavailable"}, status_code=502
+        )
+    if not outage.active():
+        resp = await _forward_buffered(request, HEARTBEAT_PATH, body)
+        if resp is not None and resp.status_code not in _OUTAGE_STATUSES:
+            outage.ok()
+            return resp
+        outage.failed()
+    device = _device_of(request, payload)
+    await asyncio.to_thread(get_spool().put_heartbeat, device, body.decode("utf-8"))
+    _wake_flusher()
+    return _accepted({"queued": True, "reason": "outage"})
+
+
+def _item_ok(item: Any) -> bool:
+    if not isinstance(item, dict):
+        return False
+    if item.get("duplicate") is True:
+        return True
+    for k in ("ok", "accepted"):
+        if isinstance(item.get(k), bool):
+            return item[k]
+    status = item.get("status_code", item.get("status"))
+    if isinstance(status, int) and not isinstance(status, bool):
+        return 200 <= status < 300
+    return str(status or "").lower() in ("ok", "accepted", "created", "inserted", "duplicate")
+
+
+def _bulk_item_results(resp: Any, n: int) -> Optional[List[bool]]:
+    """
+    Per-item outcome of a 2xx /ingest/bulk, or None when the body does not say.
+    Understood: a list of n results (top level, "results" or the items key) or an
+    "accepted"/"accepted_count" (+ "duplicates") total equal to n.
+    """
+    body = resp.get("data") if isinstance(resp, dict) and isinstance(resp.get("data"), (dict, list)) else resp
+    if isinstance(body, list):
+        return [_item_ok(x) for x in body] if len(body) == n else None
+    if not isinstance(body, dict):
+        return None
+    for k in ("results", BANK_SMS_BULK_ITEMS_KEY):
+        items = body.get(k)
+        if isinstance(items, list) and len(items) == n:
+            return [_item_ok(x) for x in items]
+    counts = [body.get(k) for k in ("accepted", "accepted_count", "duplicates")]
+    counts = [c for c in counts if isinstance(c, int) and not isinstance(c, bool)]
+    if counts and sum(counts) == n:
+        return [True] * n
+    return None
+
+
+def _lease_keeper(spool: SmsSpool, owner: str, ttl: float) -> HoldFn:
+    """Renew the flusher lease before each call to A; LeaseLost once another worker took it."""
+
+    async def hold() -> None:
+        if not await asyncio.to_thread(spool.acquire_lease, FLUSHER_LEASE, owner, ttl):
+            raise LeaseLost(FLUSHER_LEASE)
+
+    return hold
+
+
+async def _no_hold() -> None:
+    return None
+
+
+def _bulk_item(key: str, body: str) -> Any:
+    item = json.loads(body)
+    if BANK_SMS_BULK_IDEM_FIELD and isinstance(item, dict):
+        item.setdefault(BANK_SMS_BULK_IDEM_FIELD, key)
+    return item
+
+
+async def _deliver_singly(
+    spool: SmsSpool, rows: List[Tuple[int, str, str]], post: PostFn, hold: HoldFn = _no_hold
+) -> bool:
+    """Send rows on /ingest one by one; bad ones are parked. False = stop (upstream not accepting now)."""
+    for seq, key, body in rows:
+        await hold()
+        status, resp = await post(INGEST_PATH, json.loads(body), headers={"Idempotency-Key": key})
+        if status is not None and 200 <= status < 300:
+            await asyncio.to_thread(spool.mark, [seq], "sent")
+        elif status is not None and 400 <= status < 500 and status not in _RETRYABLE_4XX:
+            logger.warning("bank-sms seq=%s rejected HTTP %s: %s", seq, status, resp)
+            await asyncio.to_thread(spool.mark, [seq], "dead", json.dumps(resp, default=str)[:1000])
+        else:
+            await asyncio.to_thread(spool.record_failure, [seq], f"HTTP {status}: {resp}"[:1000])
+            return False
+    return True
+
+
+async def flush_once(
+    spool: SmsSpool, post: PostFn = _post_json, *, force: bool = False, hold: HoldFn = _no_hold
+) -> Optional[bool]:
+    """
+    Send at most 1 batch. None = nothing due yet, True = delivered (or isolated),
+    False = upstream failed (rows stay queued, in order). hold() runs before every call
+    to A and raises LeaseLost to stop.
+    """
+    n, oldest = await asyncio.to_thread(spool.pending)
+    if n == 0:
+        return None
+    due = (
+        force
+        or not BANK_SMS_BATCH_ENABLED
+        or n >= BANK_SMS_BATCH_MAX
+        or (time.time() - (oldest or 0)) * 1000 >= BANK_SMS_BATCH_WINDOW_MS
+    )
+    if not due:
+        return None
+    rows = await asyncio.to_thread(spool.next_batch, BANK_SMS_BATCH_MAX)
+    if not BANK_SMS_BATCH_ENABLED:
+        # outage replay: same endpoint (and validation) the device would have hit
+        return await _deliver_singly(spool, rows, post, hold)
+    seqs = [seq for seq, _, _ in rows]
+    await hold()
+    status, resp = await post(INGEST_BULK_PATH, {BANK_SMS_BULK_ITEMS_KEY: [_bulk_item(k, b) for _, k, b in rows]})
+    if status is not None and 200 <= status < 300:
+        oks = _bulk_item_results(resp, len(rows))
+        if oks is None:
+            logger.warning("bank-sms bulk of %s: no per-item result in response — sending one by one", len(rows))
+            return await _deliver_singly(spool, rows, post, hold)
+        await asyncio.to_thread(spool.mark, [seq for seq, ok in zip(seqs, oks) if ok], "sent")
+        rest = [row for row, ok in zip(rows, oks) if not ok]
+        if rest:
+            logger.warning("bank-sms bulk: %s of %s not accepted — sending one by one", len(rest), len(rows))
+            return await _deliver_singly(spool, rest, post, hold)
+        return True
+    if status is not None and 400 <= status < 500 and status not in _RETRYABLE_4XX:
+        logger.warning("bank-sms bulk of %s rejected HTTP %s — retrying one by one", len(rows), status)
+        return await _deliver_singly(spool, rows, post, hold)
+    logger.warning("bank-sms bulk of %s failed (%s): %s", len(rows), status, resp)
+    await asyncio.to_thread(spool.record_failure, seqs, f"HTTP {status}: {resp}"[:1000])
+    return False
+
+
+async def flush_heartbeats(
+    spool: SmsSpool, post: PostFn = _post_json, *, limit: int = 200, hold: HoldFn = _no_hold
+) -> Optional[bool]:
+    """Replay the latest spooled ping per device. None = nothing spooled, False = A still down."""
+    rows = await asyncio.to_thread(spool.heartbeats, limit)
+    if not rows:
+        return None
+    for device, body, created_at in rows:
+        await hold()
+        status, resp = await post(HEARTBEAT_PATH, json.loads(body))
+        if status is None or status >= 500 or status in _RETRYABLE_4XX:
+            return False
+        if status >= 400:
+            logger.warning("heartbeat replay device=%s rejected HTTP %s: %s", device, status, resp)
+        await asyncio.to_thread(spool.drop_heartbeat, device, created_at)
+    return True
+
+
+async def _flusher_loop() -> None:
+    spool = get_spool()
+    window = BANK_SMS_BATCH_WINDOW_MS / 1000.0
+    # renewed before each call to A, so it only has to outlast one call (connect + write + read)
+    lease_ttl = max(30.0, window * 10, 4 * BANK_SMS_POST_TIMEOUT)
+    hold = _lease_keeper(spool, _owner, lease_ttl)
+    last_purge = 0.0
+    while True:
+        try:
+            await asyncio.wait_for(_wake.wait(), timeout=max(window, outage.until - time.time()))
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+        if outage.active():
+            continue
+        try:
+            if not await asyncio.to_thread(spool.acquire_lease, FLUSHER_LEASE, _owner, lease_ttl):
+                continue
+            ok: Optional[bool] = True
+            while ok:
+                ok = await flush_once(spool, hold=hold)
+            if ok is None:
+                # SMS backlog drained -> heartbeats (lower priority)
+                ok = await flush_heartbeats(spool, hold=hold)
+            if ok is False:
+                outage.failed()
+            elif ok is True:
+                outage.ok()
+            now = time.time()
+            if now - last_purge > 300:
+                last_purge = now
+                await asyncio.to_thread(spool.purge_sent, now - BANK_SMS_DEDUP_TTL)
+        except asyncio.CancelledError:
+            raise
+        except LeaseLost:
+            logger.info("ingest spool flusher lease taken by another worker — stopping replay here")
+        except Exception as e:
+            logger.exception("ingest spool flusher error: %s", e)
+            await asyncio.sleep(window)
+
+
+def ensure_flusher() -> None:
+    """Start the flusher on the running loop (idempotent)."""
+    global _flusher, _wake
+    if _flusher is not None and not _flusher.done():
+        return
+    _wake = asyncio.Event()
+    _flusher = asyncio.get_running_loop().create_task(_flusher_loop())
+
+
+def resume_pending_flush() -> None:
+    """Lifespan hook: a spool left from the previous run is replayed without waiting for a new post."""
+    if (BANK_SMS_BATCH_ENABLED or INGEST_SPOOL_ON_OUTAGE) and os.path.exists(BANK_SMS_SPOOL_PATH):
+        ensure_flusher()
+
+
+async def stop_flusher() -> None:
+    global _flusher
+    task, _flusher = _flusher, None
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
@@ -6,7 +6,9 @@ import os
 from typing import Optional, Any, Dict, List, Tuple
 
 import httpx
-from fastapi import HTTPException
+from fastapi import HTTPException, Request
+from starlette.background import BackgroundTask
+from starlette.responses import JSONResponse, StreamingResponse
 
 
 SERVICE_A_BASE_URL = os.getenv("SERVICE_A_BASE_URL", "http://127.0.0.1:8824")
@@ -14,6 +16,28 @@ SERVICE_A_BASE_URL = os.getenv("SERVICE_A_BASE_URL", "http://127.0.0.1:8824")
 # Mobile APIs mostly JSON; shared timeout.
 DEFAULT_TIMEOUT = float(os.getenv("API_HTTP_TIMEOUT", os.getenv("AUTH_HTTP_TIMEOUT", "8.0")))
 
+# Streaming proxy (mirror): read timeout = max wait between 2 chunks (xlsx/pdf exports start slowly)
+MOBILE_MIRROR_READ_TIMEOUT = float(os.getenv("MOBILE_MIRROR_READ_TIMEOUT", "60"))
+MOBILE_MIRROR_MAX_CONNECTIONS = max(1, int(os.getenv("MOBILE_MIRROR_MAX_CONNECTIONS", "100")))
+
+# RFC 7230 §6.1 — headers that only apply to a single connection, never forwarded
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "proxy-connection",
+    "te",
+    "trailer",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+})
+# Request headers that belong to the B <-> app hop (not to A)
+_DROP_REQUEST_HEADERS = HOP_BY_HOP_HEADERS | {"host", "cookie", "expect"}
+
+_proxy_client: Optional[httpx.AsyncClient] = None
+
 
 def require_bearer(authorization: Optional[str]) -> str:
     if not authorization:
@@ -138,3 +162,105 @@ async def request_raw(
         raise HTTPException(status_code=r.status_code, detail=detail)
 
     return r
+
+
+def _proxy() -> httpx.AsyncClient:
+    """Shared client for the mirror: keep-alive pool to A instead of 1 TCP/TLS handshake per call."""
+    global _proxy_client
+    if _proxy_client is None or _proxy_client.is_closed:
+        _proxy_client = httpx.AsyncClient(
+            base_url=SERVICE_A_BASE_URL,
+            timeout=httpx.Timeout(DEFAULT_TIMEOUT, read=MOBILE_MIRROR_READ_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=MOBILE_MIRROR_MAX_CONNECTIONS,
+                max_keepalive_connections=MOBILE_MIRROR_MAX_CONNECTIONS,
+            ),
+            follow_redirects=False,
+        )
+    return _proxy_client
+
+
+async def aclose_proxy_client() -> None:
+    global _proxy_client
+    if _proxy_client is not None:
+        await _proxy_client.aclose()
+        _proxy_client = None
+
+
+def _filter_headers(raw: List[Tuple[bytes, bytes]], drop: frozenset | set) -> List[Tuple[bytes, bytes]]:
+    """Drop hop-by-hop headers + any header named in Connection (keeps duplicates like Set-Cookie)."""
+    extra = set()
+    for k, v in raw:
+        if k.lower() == b"connection":
+            extra.update(t.strip().lower() for t in v.decode("latin-1").split(",") if t.strip())
+    out: List[Tuple[bytes, bytes]] = []
+    for k, v in raw:
+        name = k.decode("latin-1").lower()
+        if name not in drop and name not in extra:
+            out.append((k, v))
+    return out
+
+
+def upstream_request_headers(request: Request, *, drop: frozenset | set = frozenset()) -> List[Tuple[bytes, bytes]]:
+    """End-to-end request headers for A (+ X-Forwarded-For/Proto)."""
+    headers = _filter_headers(list(request.headers.raw), _DROP_REQUEST_HEADERS | set(drop))
+    client_host = request.client.host if request.client else None
+    if client_host:
+        prior = request.headers.get("x-forwarded-for")
+        headers.append((b"x-forwarded-for", f"{prior}, {client_host}".encode("latin-1") if prior else client_host.encode("latin-1")))
+    if not any(k.lower() == b"x-forwarded-proto" for k, _ in headers):
+        headers.append((b"x-forwarded-proto", request.url.scheme.encode("latin-1")))
+    return headers
+
+
+async def open_upstream(
+    request: Request,
+    path: str,
+    *,
+    params: Optional[List[Tuple[str, Any]]] = None,
+    drop_headers: frozenset | set = frozenset(),
+) -> httpx.Response | JSONResponse:
+    """Send the request to A (body streamed); returns the un-read upstream response or a 502."""
+    has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+    client = _proxy()
+    upstream_req = client.build_request(
+        request.method,
+        path,
+        params=params if params is not None else list(request.query_params.multi_items()),
+        headers=upstream_request_headers(request, drop=drop_headers),
+        content=request.stream() if has_body else None,
+    )
+    try:
+        return await client.send(upstream_req, stream=True)
+    except httpx.RequestError as e:
+        return JSONResponse({"detail": f"Upstream Service A error: {str(e)}"}, status_code=502)
+
+
+def streaming_response(upstream: httpx.Response) -> StreamingResponse:
+    """Raw bytes of A's response with its status code and end-to-end headers."""
+    response = StreamingResponse(
+        upstream.aiter_raw(),
+        status_code=upstream.status_code,
+        background=BackgroundTask(upstream.aclose),
+    )
+    response.raw_headers = _filter_headers(list(upstream.headers.raw), HOP_BY_HOP_HEADERS)
+    return response
+
+
+async def stream_proxy(
+    request: Request,
+    path: str,
+    *,
+    params: Optional[List[Tuple[str, Any]]] = None,
+) -> StreamingResponse | JSONResponse:
+    """
+    Byte-level reverse proxy to Service A (1 attempt, no decode/re-encode).
+
+    - Request body streamed to A as it arrives; response bytes (incl. Content-Encoding)
+      streamed back untouched with A's status code and end-to-end headers.
+    - Connection errors -> 502 {"detail": ...} (same shape as request_json_with_status).
+    """
+    upstream = await open_upstream(request, path, params=params)
+    if isinstance(upstream, JSONResponse):
+        return upstream
+    return streaming_response(upstream)
@@ -4,6 +4,7 @@ from __future__ import annotations
 import os
 import json
 import base64
+import asyncio
 from typing import Optional
 from urllib.parse import urlencode, quote
 
@@ -26,14 +27,16 @@ from fastapi.responses import (
 )
 
 from utils.templates import templates
-from utils.auth import get_access_token, fetch_me
-from utils.excel_templates import build_projects_lots_template
+from utils.auth import get_access_token, fetch_me, token_cache_scope
+from utils.bid_ticket_issue_client import invalidate_issued_tokens
+from utils.excel_templates import build_projects_lots_template, invalidate_project_code_index
 from utils.excel_import import handle_import_preview, dumps_preview_payload  # chỉ dùng preview
 from utils.project_existing_validate import (
-    build_existing_project_preview,
+    build_existing_project_preview_cached,
     fetch_all_lots_for_project,
 )
 from utils.project_auction_type import enrich_project_option_row, project_auction_type_meta
+from utils.ttl_cache import TTLCache
 
 import json as pyjson  # cho decode JWT payload
 
@@ -71,6 +74,15 @@ EP_BID_STEP_POLICY  = "/api/v1/projects/{project_id}/bid_step_policy"  # <-- NEW
 EP_PRODUCT_TYPES      = "/api/v1/projects/product_types"                 # NEW
 EP_PRODUCT_TYPE_ITEMS = "/api/v1/projects/product_types/{product_type}"  # NEW
 
+# Endpoint gộp (tuỳ chọn) trả cả 3 blob config trong 1 call:
+#   {"auction": {...}, "settings": {"bid_ticket": {...}}, "bid_step_policy": {...}}
+# Để trống -> gọi song song 3 endpoint riêng.
+EP_CONFIG_BUNDLE = os.getenv("PROJECT_CONFIG_BUNDLE_EP", "").strip()
+
+# Cache ngắn hạn cho 3 blob config trên trang chi tiết (0 = tắt).
+PROJECT_CFG_CACHE_TTL = float(os.getenv("PROJECT_CFG_CACHE_TTL", "15"))
+_project_cfg_cache = TTLCache(ttl_seconds=PROJECT_CFG_CACHE_TTL, maxsize=512)
+
 # ==============================
 # helpers http
 # ==============================
@@ -161,6 +173,74 @@ def _company_from_jwt(token: str | None) -> str | None:
         return None
 
 
+def _project_cache_key(token: str | None, project_id: int) -> tuple[str, int]:
+    # scope theo công ty (JWT) để không lộ dữ liệu giữa tenant
+    return token_cache_scope(token), int(project_id)
+
+
+def _invalidate_project_cfg(project_id: int) -> None:
+    pid = int(project_id)
+    _project_cfg_cache.invalidate_where(lambda k: k[1] == pid)
+
+
+async def _load_project_configs(
+    client: httpx.AsyncClient,
+    token: str | None,
+    project_id: int,
+    *,
+    fresh: bool = False,
+) -> tuple[dict | None, dict | None, dict | None]:
+    """
+    Trả (auction_cfg, bid_ticket_cfg, bid_step_policy) cho trang chi tiết.
+    - Cache TTL ngắn theo (company, project_id); xoá sau khi A ghi config thành công.
+    - Cache nằm trong từng worker: redirect sau khi lưu (?saved=1) có thể rơi vào worker
+      khác chưa xoá -> fresh=True bỏ qua cache, gọi A rồi ghi đè bản mới.
+    - Có EP_CONFIG_BUNDLE -> 1 call; lỗi/thiếu -> 3 call song song.
+    - Blob nào lỗi thì None (giữ hành vi cũ), và không cache kết quả thiếu.
+    """
+    key = _project_cache_key(token, project_id)
+    cached = None if fresh else _project_cfg_cache.get(key)
+    if cached is not None:
+        return cached
+
+    headers = {"Authorization": f"Bearer {token}"}
+    result: tuple[dict | None, dict | None, dict | None] | None = None
+
+    if EP_CONFIG_BUNDLE:
+        try:
+            st, js = await _get_json(client, EP_CONFIG_BUNDLE.format(project_id=project_id), headers)
+        except Exception:
+            st, js = 0, None
+        if st == 200 and isinstance(js, dict):
+            result = (
+                js.get("auction") or {},
+                ((js.get("settings") or {}).get("bid_ticket") or {}),
+                js.get("bid_step_policy") or {},
+            )
+
+    if result is None:
+        (cfg_st, cfg), (bt_st, bt), (bsp_st, bsp) = await asyncio.gather(
+            _get_json(client, EP_AUCTION_CONFIG.format(project_id=project_id), headers),
+            _get_json(client, EP_BID_TICKET_CONFIG.format(project_id=project_id), headers),
+            _get_json(client, EP_BID_STEP_POLICY.format(project_id=project_id), headers),
+        )
+        auction_cfg = (cfg.get("auction") or {}) if cfg_st == 200 and isinstance(cfg, dict) else None
+        # API A trả: {"settings": {"bid_ticket": {"show_price_step": true}}}
+        bid_ticket_cfg = (
+            ((bt.get("settings") or {}).get("bid_ticket") or {})
+            if bt_st == 200 and isinstance(bt, dict)
+            else None
+        )
+        bid_step_policy = (
+            (bsp.get("bid_step_policy") or {}) if bsp_st == 200 and isinstance(bsp, dict) else None
+        )
+        result = (auction_cfg, bid_ticket_cfg, bid_step_policy)
+
+    if all(x is not None for x in result):
+        _project_cfg_cache.set(key, result)
+    return result
+
+
 def _auth_headers(request: Request) -> dict:
     # Nếu bạn xác thực bằng cookie/bearer, bê nguyên header Authorization sang Service A
     h: dict[str, str] = {}
@@ -366,6 +446,9 @@ async def import_apply(
 
             if r.status_code == 200:
                 created_codes.append(code)
+                # A đã tạo project_code mới -> index mã kế tiếp của template hết hiệu lực
+                # (xoá trước khi tạo -> request template song song nạp lại index cũ)
+                invalidate_project_code_index(company_code)
             elif r.status_code == 409:
                 errors.append(f"Dự án {code}: đã tồn tại, không cho phép ghi đè.")
                 # project lỗi -> bỏ luôn lots của project này
@@ -577,6 +660,8 @@ async def create_submit(
 
     async with httpx.AsyncClient(base_url=SERVICE_A_BASE_URL, timeout=12.0) as client:
         st, _ = await _post_json(client, EP_CREATE_PROJ, {"Authorization": f"Bearer {token}"}, payload)
+    if st == 200:
+        invalidate_project_code_index(_company_from_jwt(token))
 
     to = "/projects?msg=created" if st == 200 else "/projects?err=create_failed"
     return RedirectResponse(url=to, status_code=303)
@@ -1157,6 +1242,8 @@ async def api_assign_group_deposit_lot(
             json=payload,
             headers={"Authorization": f"Bearer {token}"},
         )
+    if r.status_code < 400:
+        invalidate_issued_tokens(project_id)
     try:
         body = r.json()
     except Exception:
@@ -1246,8 +1333,10 @@ async def update_project_auction_config(
             status_code=303,
         )
 
+    # xoá cache sau khi A đã ghi (xoá trước -> request song song nạp lại bản cũ)
+    _invalidate_project_cfg(project_id)
     return RedirectResponse(
-        url=f"/projects/{project_id}?msg=auction_config_updated",
+        url=f"/projects/{project_id}?msg=auction_config_updated&saved=1",
         status_code=303,
     )
 
@@ -1284,8 +1373,10 @@ async def update_project_bid_ticket_config(
             status_code=303,
         )
 
+    # xoá cache sau khi A đã ghi (xoá trước -> request song song nạp lại bản cũ)
+    _invalidate_project_cfg(project_id)
     return RedirectResponse(
-        url=f"/projects/{project_id}?msg=bid_ticket_config_updated",
+        url=f"/projects/{project_id}?msg=bid_ticket_config_updated&saved=1",
         status_code=303,
     )
 
@@ -1696,6 +1787,7 @@ async def update_project_bid_step_policy_b(
                 status_code=502,
             )
 
+        _invalidate_project_cfg(project_id)
         return JSONResponse(r.json() or {}, status_code=200)
 
     except Exception as e:
@@ -1742,6 +1834,7 @@ async def add_project_bid_step_round_rule_b(
                 status_code=502,
             )
 
+        _invalidate_project_cfg(project_id)
         return JSONResponse(r.json() or {}, status_code=200)
 
     except Exception as e:
@@ -1788,6 +1881,7 @@ async def update_project_bid_step_round_rule_b(
                 status_code=502,
             )
 
+        _invalidate_project_cfg(project_id)
         return JSONResponse(r.json() or {}, status_code=200)
 
     except Exception as e:
@@ -1824,6 +1918,7 @@ async def delete_last_project_bid_step_round_rule_b(
                 status_code=502,
             )
 
+        _invalidate_project_cfg(project_id)
         return JSONResponse(r.json() or {}, status_code=200)
 
     except Exception as e:
@@ -1861,6 +1956,7 @@ async def delete_project_bid_step_round_rule_b(
                 status_code=502,
             )
 
+        _invalidate_project_cfg(project_id)
         return JSONResponse(r.json() or {}, status_code=200)
 
     except Exception as e:
@@ -1944,7 +2040,12 @@ async def project_validate_preview(request: Request, project_id: int = Path(...)
             status_code=404 if not load_err else 400,
         )
 
-    preview = build_existing_project_preview(project, sa_lots)
+    # verify tăng dần: chỉ lô đổi (theo field verify) mới chạy lại rules
+    preview = build_existing_project_preview_cached(
+        project,
+        sa_lots,
+        cache_key=_project_cache_key(token, project_id),
+    )
     if load_err:
         # vẫn show preview nếu đã partial lots; đính kèm lỗi load
         pass
@@ -1988,72 +2089,62 @@ async def project_detail(request: Request, project_id: int = Path(...)):
 
     try:
         async with httpx.AsyncClient(base_url=SERVICE_A_BASE_URL, timeout=12.0) as client:
-            # 1) Lấy project
-            st, data = await _get_json(
-                client,
-                EP_DETAIL.format(project_id=project_id),
-                {"Authorization": f"Bearer {token}"},
-            )
-            if st == 200 and isinstance(data, dict):
-                project = data
-            else:
-                load_err = f"Không tải được dự án (HTTP {st})."
-
-            # 1b) Lấy auction_config (extras.auction)
-            if project:
-                cfg_st, cfg = await _get_json(
-                    client,
-                    EP_AUCTION_CONFIG.format(project_id=project_id),
-                    {"Authorization": f"Bearer {token}"},
-                )
-                if cfg_st == 200 and isinstance(cfg, dict):
-                    auction_cfg = cfg.get("auction") or {}
-                else:
-                    auction_cfg = None
-
-            # 1c) Lấy bid_ticket_config (extras.settings.bid_ticket)
-            if project:
-                bt_st, bt = await _get_json(
-                    client,
-                    EP_BID_TICKET_CONFIG.format(project_id=project_id),
-                    {"Authorization": f"Bearer {token}"},
+            # 1b-1d) config chỉ phụ thuộc project_id -> chạy song song với detail
+            cfg_task = asyncio.create_task(
+                _load_project_configs(
+                    client, token, project_id, fresh=request.query_params.get("saved") == "1"
                 )
-                if bt_st == 200 and isinstance(bt, dict):
-                    # API A trả: {"settings": {"bid_ticket": {"show_price_step": true}}}
-                    bid_ticket_cfg = ((bt.get("settings") or {}).get("bid_ticket") or {})
-                else:
-                    bid_ticket_cfg = None
-
-            # 1d) Lấy bid_step_policy (extras.bid_step_policy)
-            if project:
-                bsp_st, bsp = await _get_json(
+            )
+            try:
+                # 1) Lấy project
+                st, data = await _get_json(
                     client,
-                    EP_BID_STEP_POLICY.format(project_id=project_id),
+                    EP_DETAIL.format(project_id=project_id),
                     {"Authorization": f"Bearer {token}"},
                 )
-                if bsp_st == 200 and isinstance(bsp, dict):
-                    bid_step_policy = bsp.get("bid_step_policy") or {}
-                else:
-                    bid_step_policy = None
-
-            # 2) Nếu có project_code thì lấy danh sách lô theo project_code
-            if project and project.get("project_code"):
-                # ✅ refactor: gọi helper nhưng phải y hệt call cũ (Authorization Bearer)
-                lst_st, lst = await sa_list_lots_by_project_code(
-                    client,
-                    token=token,
-                    project_code=project["project_code"],
-                    size=1000,
-                )
-                if lst_st == 200 and isinstance(lst, dict):
-                    lots_page = {
-                        "data": lst.get("data", []),
-                        "total": lst.get("total", 0),
-                    }
+                if st == 200 and isinstance(data, dict):
+                    project = data
                 else:
-                    # không chặn trang — chỉ ghi nhận lỗi phần lots
-                    if not load_err:
-                        load_err = f"Không tải được danh sách lô (HTTP {lst_st})."
+                    load_err = f"Không tải được dự án (HTTP {st})."
+
+                if project:
+                    # 2) lots theo project_code (cần detail) — chạy song song với config còn đang chờ
+                    lots_coro = None
+                    if project.get("project_code"):
+                        # ✅ refactor: gọi helper nhưng phải y hệt call cũ (Authorization Bearer)
+                        lots_coro = sa_list_lots_by_project_code(
+                            client,
+                            token=token,
+                            project_code=project["project_code"],
+                            size=1000,
+                        )
+
+                    if lots_coro is not None:
+                        cfg_res, lots_res = await asyncio.gather(cfg_task, lots_coro, return_exceptions=True)
+                    else:
+                        cfg_res, lots_res = (await asyncio.gather(cfg_task, return_exceptions=True))[0], None
+
+                    if isinstance(cfg_res, BaseException):
+                        load_err = load_err or str(cfg_res)
+                    else:
+                        auction_cfg, bid_ticket_cfg, bid_step_policy = cfg_res
+
+                    if isinstance(lots_res, BaseException):
+                        load_err = load_err or str(lots_res)
+                    elif lots_res is not None:
+                        lst_st, lst = lots_res
+                        if lst_st == 200 and isinstance(lst, dict):
+                            lots_page = {
+                                "data": lst.get("data", []),
+                                "total": lst.get("total", 0),
+                            }
+                        else:
+                            # không chặn trang — chỉ ghi nhận lỗi phần lots
+                            if not load_err:
+                                load_err = f"Không tải được danh sách lô (HTTP {lst_st})."
+            finally:
+                if not cfg_task.done():
+                    cfg_task.cancel()
 
     except Exception as e:
         load_err = str(e)
@@ -6,6 +6,8 @@ from typing import Any, Dict, List, Optional
 
 import httpx
 
+from utils.render_cache import invalidate_rendered
+
 SERVICE_A_BASE_URL = os.getenv("SERVICE_A_BASE_URL", "http://127.0.0.1:8824")
 
 
@@ -123,7 +125,10 @@ async def create_instance(token: Optional[str], body: Dict[str, Any]) -> Dict[st
 
 
 async def update_instance(token: Optional[str], instance_id: int, body: Dict[str, Any]) -> Dict[str, Any]:
-    return await _req("PUT", f"/api/v1/docgen/instances/{instance_id}", token, json_body=body)
+    try:
+        return await _req("PUT", f"/api/v1/docgen/instances/{instance_id}", token, json_body=body)
+    finally:
+        invalidate_rendered(instance_id)
 
 
 async def get_render_context(token: Optional[str], instance_id: int) -> Dict[str, Any]:
@@ -131,11 +136,17 @@ async def get_render_context(token: Optional[str], instance_id: int) -> Dict[str
 
 
 async def finalize_instance(token: Optional[str], instance_id: int) -> Dict[str, Any]:
-    return await _req("POST", f"/api/v1/docgen/instances/{instance_id}/finalize", token)
+    try:
+        return await _req("POST", f"/api/v1/docgen/instances/{instance_id}/finalize", token)
+    finally:
+        invalidate_rendered(instance_id)
 
 
 async def reopen_instance(token: Optional[str], instance_id: int) -> Dict[str, Any]:
-    return await _req("POST", f"/api/v1/docgen/instances/{instance_id}/reopen", token)
+    try:
+        return await _req("POST", f"/api/v1/docgen/instances/{instance_id}/reopen", token)
+    finally:
+        invalidate_rendered(instance_id)
 
 
 async def fetch_projects(token: Optional[str]) -> List[Dict[str, Any]]:
@@ -0,0 +1,135 @@
+# services/session_progress.py — Dataset diễn biến phiên dùng chung (in diễn biến + biên bản)
+"""
+Memo dataset build_session_progress_data theo (phạm vi công ty đã verify, session_id).
+
+- Phạm vi lấy từ /auth/me đã verify (utils.auth.verified_cache_scope) do caller truyền;
+  không có phạm vi -> không dùng cache/snapshot, luôn gọi Service A bằng token caller.
+- Mỗi lần dùng vẫn GET session + kết quả phiên (song song, rẻ) để lấy "revision";
+  revision đổi (trạng thái, vòng, updated_at, kết quả lô...) -> dựng lại.
+- Phiếu của vòng đang chạy không nằm trong revision (ghi qua worker khác / thẳng lên A)
+  -> TTL ngắn (SESSION_PROGRESS_CACHE_TTL) là giới hạn trễ tối đa.
+- Các request đồng thời cùng phiên chỉ dựng 1 lần (chờ chung 1 task).
+- Ghi qua Web B lên /sessions/{id}/... gọi invalidate_session_progress* để xoá ngay.
+- Phiên đã đóng: dataset được đóng băng ra đĩa (services.session_snapshot), lần sau
+  đọc thẳng snapshot, không gọi Service A.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from services.session_snapshot import invalidate_session_snapshots, load_snapshot, save_snapshot
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+SESSION_PROGRESS_CACHE_TTL = float(os.getenv("SESSION_PROGRESS_CACHE_TTL", "30"))
+_progress_cache = TTLCache(ttl_seconds=SESSION_PROGRESS_CACHE_TTL, maxsize=64)
+_inflight: Dict[Tuple[Hashable, str], "asyncio.Future[Dict[str, Any]]"] = {}
+
+SNAPSHOT_KIND = "session_progress"
+
+_SESSION_PATH_RE = re.compile(r"/sessions/(\d+)(?:/|$)")
+
+
+def _session_revision(session_js: Tuple[int, Any], results_js: Tuple[int, Any]) -> str:
+    """Dấu vết phiên: hash bản ghi session + danh sách kết quả lô (rỗng nếu 1 trong 2 lỗi)."""
+    st, js = session_js
+    st_res, res = results_js
+    if st != 200 or not isinstance(js, dict) or st_res != 200:
+        return ""
+    data = js.get("data") if isinstance(js.get("data"), dict) else js
+    raw = json.dumps([data, res], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+async def get_session_progress(
+    token: str,
+    session_id: int,
+    *,
+    scope: Optional[str],
+    refresh: bool = False,
+) -> Dict[str, Any]:
+    """
+    Trả dataset diễn biến phiên (cùng format build_session_progress_data).
+    scope: verified_cache_scope(request, token); None -> dựng thẳng, không cache.
+    """
+    from routers.auction_documents_print import (
+        build_session_progress_data,
+        fetch_session_for_print,
+        fetch_session_results_for_print,
+    )
+
+    if scope and not refresh:
+        frozen = await load_snapshot(scope, session_id, SNAPSHOT_KIND)
+        if frozen is not None:
+            return frozen
+
+    session_js, results_js = await asyncio.gather(
+        fetch_session_for_print(token, session_id),
+        fetch_session_results_for_print(token, session_id),
+    )
+    rev = _session_revision(session_js, results_js) if scope else ""
+    key = (scope, int(session_id))
+
+    if rev and not refresh:
+        hit = _progress_cache.get(key)
+        if hit is not None and hit[0] == rev:
+            return hit[1]
+
+    flight_key = (key, rev)
+    fut = _inflight.get(flight_key) if rev else None
+    if fut is not None:
+        return await asyncio.shield(fut)
+
+    async def _build() -> Dict[str, Any]:
+        data = await build_session_progress_data(
+            token, session_id, session_js=session_js, results_js=results_js
+        )
+        if rev and not data.get("error"):
+            _progress_cache.set(key, (rev, data))
+        if scope:
+            await save_snapshot(scope, session_id, SNAPSHOT_KIND, data)
+        return data
+
+    if not rev:
+        return await _build()
+
+    task = asyncio.ensure_future(_build())
+    _inflight[flight_key] = task
+    task.add_done_callback(lambda _t: _inflight.pop(flight_key, None))
+    return await asyncio.shield(task)
+
+
+def invalidate_session_progress(session_id: Optional[int] = None, *, scope: Optional[str] = None) -> int:
+    """
+    Xoá dataset của 1 phiên (kèm snapshot trên đĩa); scope: chỉ công ty đó, mặc định mọi
+    công ty. session_id None = xoá cache trong RAM (snapshot phiên đã đóng giữ nguyên vì
+    không bị ghi ngoài phiên).
+    """
+    if session_id is None:
+        if scope:
+            return _progress_cache.invalidate_where(lambda k: k[0] == scope)
+        n = len(_progress_cache)
+        _progress_cache.clear()
+        return n
+    sid = int(session_id)
+    invalidate_session_snapshots(sid, scope=scope)
+    return _progress_cache.invalidate_where(lambda k: k[1] == sid and (scope is None or k[0] == scope))
+
+
+def invalidate_session_progress_for_path(path: str) -> int:
+    """
+    Gọi sau khi ghi lên Service A: path có /sessions/{id} thì xoá phiên đó.
+    Path không gắn phiên (kết quả theo dự án, phiếu theo round-lot...) -> không xoá gì:
+    revision (kết quả phiên) + TTL ngắn đã bắt thay đổi.
+    """
+    m = _SESSION_PATH_RE.search(path or "")
+    if m:
+        return invalidate_session_progress(int(m.group(1)))
+    return 0
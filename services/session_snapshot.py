@@ -0,0 +1,157 @@
+# services/session_snapshot.py — Snapshot bất biến (file nén) cho phiên đã đóng
+"""
+Phiên đã đóng (status thuộc SESSION_SNAPSHOT_STATUSES) thì vòng/kết quả/phiếu không
+còn đổi -> đóng băng dataset in đã dựng xong ra file .json.gz cục bộ. Các lần in lại
+(kết quả vòng, DS ký trúng, diễn biến phiên, biên bản) đọc thẳng từ snapshot, không
+gọi Service A.
+
+- Phạm vi theo công ty ĐÃ VERIFY (utils.auth.verified_cache_scope, caller truyền vào);
+  không có phạm vi -> không đọc/ghi snapshot (snapshot trả ra trước khi gọi Service A).
+- Ghi nguyên tử (file tạm + os.replace); đọc lỗi/hỏng -> coi như không có.
+- Xoá: admin gọi invalidate (router in tài liệu) hoặc tự động khi Web B ghi lên phiên
+  (mở lại/unlock...) qua services.session_progress.invalidate_session_progress*.
+"""
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SESSION_SNAPSHOT_ENABLED = os.getenv("SESSION_SNAPSHOT_ENABLED", "1").strip().lower() not in ("0", "false", "no", "off")
+SESSION_SNAPSHOT_DIR = os.getenv("SESSION_SNAPSHOT_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "var", "session_snapshots"
+)
+SESSION_SNAPSHOT_STATUSES = frozenset(
+    s.strip().upper()
+    for s in os.getenv("SESSION_SNAPSHOT_STATUSES", "CLOSED,DONE,FINALIZED,COMPLETED,ENDED").split(",")
+    if s.strip()
+)
+
+_SNAPSHOT_VERSION = 1
+_SAFE_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def is_frozen_session(sess: Optional[Dict[str, Any]]) -> bool:
+    if not isinstance(sess, dict):
+        return False
+    return str(sess.get("status") or "").strip().upper() in SESSION_SNAPSHOT_STATUSES
+
+
+def _scope_dir(scope: Optional[str]) -> Optional[str]:
+    if not scope:
+        return None
+    return os.path.join(SESSION_SNAPSHOT_DIR, _SAFE_RE.sub("_", scope))
+
+
+def _snapshot_path(scope: Optional[str], session_id: int, kind: str) -> Optional[str]:
+    base = _scope_dir(scope)
+    if base is None:
+        return None
+    return os.path.join(base, str(int(session_id)), f"{_SAFE_RE.sub('_', kind)}.json.gz")
+
+
+def _read(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            doc = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("session snapshot %s unreadable: %s", path, e)
+        return None
+    if not isinstance(doc, dict) or doc.get("v") != _SNAPSHOT_VERSION:
+        return None
+    data = doc.get("data")
+    return data if isinstance(data, dict) else None
+
+
+def _write(path: str, kind: str, session_id: int, data: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    doc = {
+        "v": _SNAPSHOT_VERSION,
+        "kind": kind,
+        "session_id": int(session_id),
+        "frozen_at": int(time.time()),
+        "data": data,
+    }
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+        json.dump(doc, f, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
+
+
+async def load_snapshot(scope: Optional[str], session_id: int, kind: str) -> Optional[Dict[str, Any]]:
+    if not SESSION_SNAPSHOT_ENABLED:
+        return None
+    path = _snapshot_path(scope, session_id, kind)
+    if path is None or not os.path.exists(path):
+        return None
+    return await asyncio.to_thread(_read, path)
+
+
+async def save_snapshot(scope: Optional[str], session_id: int, kind: str, data: Dict[str, Any]) -> bool:
+    """Chỉ lưu khi phiên đã đóng và dataset không có lỗi."""
+    if not SESSION_SNAPSHOT_ENABLED or data.get("error") or not is_frozen_session(data.get("session")):
+        return False
+    path = _snapshot_path(scope, session_id, kind)
+    if path is None:
+        return False
+    try:
+        await asyncio.to_thread(_write, path, kind, session_id, data)
+    except Exception as e:
+        logger.warning("session snapshot %s write failed: %s", path, e)
+        return False
+    return True
+
+
+async def snapshot_or_build(
+    scope: Optional[str],
+    session_id: int,
+    kind: str,
+    build: Callable[[], Awaitable[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    """
+    Đọc snapshot nếu có; không có thì dựng (build) và đóng băng nếu phiên đã đóng.
+    scope = verified_cache_scope(request, token); None -> luôn build (gọi A bằng token caller).
+    """
+    hit = await load_snapshot(scope, session_id, kind)
+    if hit is not None:
+        return hit
+    data = await build()
+    await save_snapshot(scope, session_id, kind, data)
+    return data
+
+
+def invalidate_session_snapshots(session_id: Optional[int] = None, *, scope: Optional[str] = None) -> int:
+    """
+    Xoá snapshot của 1 phiên; None = mọi phiên. scope: chỉ công ty đó (mặc định mọi công ty —
+    dùng khi Web B vừa ghi lên phiên). Trả số thư mục phiên đã xoá.
+    """
+    if not os.path.isdir(SESSION_SNAPSHOT_DIR):
+        return 0
+    if scope:
+        scopes = [_SAFE_RE.sub("_", scope)]
+    else:
+        scopes = [d for d in os.listdir(SESSION_SNAPSHOT_DIR) if os.path.isdir(os.path.join(SESSION_SNAPSHOT_DIR, d))]
+    n = 0
+    for sc in scopes:
+        base = os.path.join(SESSION_SNAPSHOT_DIR, sc)
+        if not os.path.isdir(base):
+            continue
+        if session_id is None:
+            n += len(os.listdir(base))
+            shutil.rmtree(base, ignore_errors=True)
+            continue
+        d = os.path.join(base, str(int(session_id)))
+        if os.path.isdir(d):
+            shutil.rmtree(d, ignore_errors=True)
+            n += 1
+    return n
@@ -0,0 +1,66 @@
+"""Unit tests — import sao kê theo chunk, cộng kết quả và resume chunk lỗi."""
+from __future__ import annotations
+
+import asyncio
+import os
+
+from routers.bank_import import bulk_apply as ba
+
+
+def test_chunks_merge_and_resume_only_failed(tmp_path, monkeypatch):
+    monkeypatch.setattr(ba, "BANK_IMPORT_JOB_DIR", str(tmp_path))
+    monkeypatch.setattr(ba, "BANK_IMPORT_CHUNK_SIZE", 2)
+    sent = []
+    fail = {"on": True}
+
+    async def fake_post(client, token, *, company_code, items):
+        first = items[0]["src_line"]
+        sent.append(first)
+        if fail["on"] and first == 3:
+            return 504, {"detail": "timeout"}
+        return 200, {"data": {"inserted": len(items) - 1, "duplicates": 1, "errors": [f"e{first}"]}}
+
+    monkeypatch.setattr(ba, "_post_chunk", fake_post)
+    items = [{"src_line": i, "amount": i * 1000.0} for i in range(1, 6)]
+
+    out = asyncio.run(ba.apply_in_chunks(None, "t", company_code="ACME", account_id=7, stage_id="s1", items=items))
+    assert sorted(sent) == [1, 3, 5]
+    assert out["chunks_ok"] == 2 and [f["chunk"] for f in out["failed_chunks"]] == [2]
+    assert out["result"] == {"inserted": 1, "duplicates": 2, "errors": ["e1", "e5"]}
+
+    fail["on"] = False
+    sent.clear()
+    out2 = asyncio.run(ba.apply_in_chunks(None, "t", company_code="ACME", account_id=7, stage_id="s1", items=items))
+    assert sent == [3]  # chỉ gửi lại chunk lỗi
+    assert out2["job_id"] == out["job_id"] and out2["chunks_resumed"] == 2
+    assert not out2["failed_chunks"]
+    assert out2["result"] == {"inserted": 2, "duplicates": 3, "errors": ["e1", "e3", "e5"]}
+
+
+def test_expired_job_files_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(ba, "BANK_IMPORT_JOB_DIR", str(tmp_path))
+    old = tmp_path / "old.json"
+    old.write_text("{}")
+    os.utime(old, (1, 1))
+
+    ba._write_job("new", "{}")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["new.json"]
+
+
+def test_confirmed_only_rows_with_per_item_outcome(tmp_path, monkeypatch):
+    monkeypatch.setattr(ba, "BANK_IMPORT_JOB_DIR", str(tmp_path))
+    monkeypatch.setattr(ba, "BANK_IMPORT_CHUNK_SIZE", 2)
+    bodies = {
+        1: {"data": {"results": [{"status": "inserted"}, {"status": "error"}]}},
+        3: {"data": {"inserted": 1, "duplicates": 0, "errors": [{"src_line": 3, "detail": "bad"}]}},
+        5: {"data": {"inserted": 1}},  # 2xx nhưng không nói rõ từng dòng
+        7: {"data": {"inserted": 1, "duplicates": 1, "errors": []}},
+    }
+
+    async def fake_post(client, token, *, company_code, items):
+        return 200, bodies[items[0]["src_line"]]
+
+    monkeypatch.setattr(ba, "_post_chunk", fake_post)
+    items = [{"src_line": i} for i in range(1, 9)]
+    out = asyncio.run(ba.apply_in_chunks(None, "t", company_code="ACME", account_id=7, stage_id="s1", items=items))
+    assert out["confirmed"] == [0, 3, 6, 7]
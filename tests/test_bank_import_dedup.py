@@ -0,0 +1,66 @@
+"""Unit tests — chỉ mục dedup sao kê: đếm theo bội số, tải theo ngày, ghi nhận sau apply."""
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+
+from routers.bank_import import dedup_index as di
+
+ACC = {"company_code": "ACME", "bank_code": "WOORI", "account_number": "123"}
+
+
+def _row(t, amount, bal, ref=None):
+    return {"txn_time": t, "amount": amount, "balance_after": bal, "refer_code": ref}
+
+
+def test_mark_known_counts_multiplicity_and_records(monkeypatch):
+    di._indexes.clear()
+    calls = []
+    existing = [_row("2025-03-01T09:00:00+07:00", 1000, 5000)]
+
+    async def fake_fetch(client, token, *, company_code, bank_code, account_number, day_from, day_to):
+        calls.append((day_from, day_to))
+        out = {}
+        for t in existing:
+            day, fp = di.txn_fingerprint(t["txn_time"], t["amount"], t["balance_after"])
+            out.setdefault(day, Counter())[fp] += 1
+        return out
+
+    monkeypatch.setattr(di, "_fetch_days", fake_fetch)
+    rows = [
+        _row("2025-03-01T09:00:00+07:00", "1000", 5000, "R1"),
+        _row("2025-03-01 09:00:00", 1000.0, 5000, "R2"),  # bản thứ 2 giống hệt -> mới
+        _row("2025-03-02T10:00:00+07:00", 2000, 7000, "R3"),
+    ]
+    known = asyncio.run(di.mark_known_rows(None, "t", account_id=1, account=ACC, rows=rows))
+    assert known == 1
+    assert [r["known"] for r in rows] == [True, False, False]
+    assert calls == [("2025-03-01", "2025-03-02")]
+
+    di.record_applied("t", 1, [r for r in rows if not r["known"]])
+    again = [dict(r) for r in rows]
+    assert asyncio.run(di.mark_known_rows(None, "t", account_id=1, account=ACC, rows=again)) == 3
+    assert len(calls) == 1  # còn trong cửa sổ TTL -> không tải lại
+
+    di.forget_account("t", 1)
+    asyncio.run(di.mark_known_rows(None, "t", account_id=1, account=ACC, rows=[dict(rows[2])]))
+    assert len(calls) == 2
+
+
+def test_fetch_failure_marks_nothing(monkeypatch):
+    di._indexes.clear()
+
+    async def fake_fetch(*a, **kw):
+        return None
+
+    monkeypatch.setattr(di, "_fetch_days", fake_fetch)
+    rows = [_row("2025-03-01T09:00:00+07:00", 1000, 5000)]
+    assert asyncio.run(di.mark_known_rows(None, "t", account_id=2, account=ACC, rows=rows)) == 0
+    assert rows[0]["known"] is False
+
+
+def test_client_known_flag_is_ignored(monkeypatch):
+    rows = [dict(_row("2025-03-01T09:00:00+07:00", 1, 1), known=True)]
+    monkeypatch.setattr(di, "BANK_DEDUP_ENABLED", False)
+    assert asyncio.run(di.mark_known_rows(None, "t", account_id=1, account=ACC, rows=rows)) == 0
+    assert "known" not in rows[0]
@@ -0,0 +1,55 @@
+"""Unit tests — nhận dạng định dạng sao kê và chọn parser theo chữ ký header."""
+from __future__ import annotations
+
+import io
+
+import pytest
+
+pytest.importorskip("pandas")
+openpyxl = pytest.importorskip("openpyxl")
+
+from routers.bank_import import readers
+from routers.bank_import.registry import sniff_and_parse
+
+HEADER = ["Transaction time and date", "Currency", "Amount withdrawn", "Amount deposited", "Account balance", "Remarks"]
+ROWS = [
+    ["13.10.2025 16:31:40", "VND", "0", "1,500,000", "2,500,000", "CK A"],
+    ["14.10.2025 09:00:00", "VND", "200,000", "0", "2,300,000", "Rut B"],
+]
+
+
+def _xlsx() -> bytes:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Woori Bank statement"])
+    ws.append(HEADER)
+    for r in ROWS:
+        ws.append(r)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def _csv() -> bytes:
+    lines = ["Woori Bank statement"] + [",".join(f'"{c}"' for c in r) for r in [HEADER] + ROWS]
+    return "\n".join(lines).encode("utf-8")
+
+
+def _html() -> bytes:
+    trs = "".join("<tr>" + "".join(f"<td>{c}</td>" for c in r) + "</tr>" for r in [HEADER] + ROWS)
+    return f"<html><body><table>{trs}</table></body></html>".encode("utf-8")
+
+
+def test_detect_format_by_content_not_extension():
+    assert readers.detect_format(_xlsx(), "a.xls") == readers.FMT_XLSX
+    assert readers.detect_format(_html(), "a.xls") == readers.FMT_HTML
+    assert readers.detect_format(_csv(), "a.xls") == readers.FMT_XLS  # không có magic -> theo đuôi
+    assert readers.detect_format(_csv(), "sao-ke.csv") == readers.FMT_CSV
+
+
+@pytest.mark.parametrize("data,name", [(_xlsx(), "x.xlsx"), (_csv(), "x.csv"), (_html(), "x.xls")])
+def test_same_rows_for_every_format(data, name):
+    res = sniff_and_parse(data, name)
+    assert res["ok"] and not res["row_errors"]
+    assert [r["amount"] for r in res["rows"]] == [1500000.0, -200000.0]
+    assert res["rows"][0]["txn_time"] == "2025-10-13T16:31:40+07:00"
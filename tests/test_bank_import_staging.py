@@ -0,0 +1,45 @@
+"""Unit tests — stage kết quả parse sao kê: phạm vi công ty, phân trang, tổng hợp."""
+from __future__ import annotations
+
+import asyncio
+
+from routers.bank_import import staging as st
+
+
+def test_stage_load_page_and_drop(tmp_path, monkeypatch):
+    monkeypatch.setattr(st, "BANK_IMPORT_STAGE_DIR", str(tmp_path))
+    st._memo.clear()
+    rows = [
+        {"txn_time": f"2025-03-0{i % 9 + 1}T09:00:00+07:00", "amount": (-1) ** i * 1000, "raw": {"x": i}, "known": i == 0}
+        for i in range(5)
+    ]
+    doc = asyncio.run(st.stage_parse_result("tok-a", account_id=7, filename="s.xls", result={"rows": rows, "row_errors": [1]}))
+    assert "raw" not in doc["rows"][0]
+    assert doc["summary"]["rows"] == 5 and doc["summary"]["known"] == 1 and doc["summary"]["new"] == 4
+    assert doc["summary"]["credit"] == 3000 and doc["summary"]["debit"] == 2000
+    assert doc["summary"]["first_time"].startswith("2025-03-01")
+
+    st._memo.clear()  # worker khác: đọc từ file
+    loaded = asyncio.run(st.load_staged("tok-a", doc["id"]))
+    assert loaded["account_id"] == 7 and len(loaded["rows"]) == 5
+    assert asyncio.run(st.load_staged("tok-b", doc["id"])) is None  # khác phạm vi
+    assert asyncio.run(st.load_staged("tok-a", "../etc")) is None
+
+    pg = st.page_of(loaded, 3, 2)
+    assert (pg["page"], pg["pages"], pg["start"], len(pg["rows"])) == (3, 3, 4, 1)
+    assert st.page_of(loaded, 99, 2)["page"] == 3
+
+    asyncio.run(st.drop_staged(doc["id"]))
+    assert asyncio.run(st.load_staged("tok-a", doc["id"])) is None
+
+
+def test_apply_rows_survive_other_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(st, "BANK_IMPORT_STAGE_DIR", str(tmp_path))
+    st._memo.clear()
+    doc = asyncio.run(st.stage_parse_result("tok-a", account_id=7, filename="s.xls", result={"rows": [{"amount": 1}] * 3}))
+    doc["apply_rows"], doc["skipped_known"] = [1, 3], 1
+    asyncio.run(st.save_staged(doc))
+
+    st._memo.clear()  # lần "Gửi" lại rơi vào worker khác
+    loaded = asyncio.run(st.load_staged("tok-a", doc["id"]))
+    assert loaded["apply_rows"] == [1, 3] and loaded["skipped_known"] == 1
@@ -0,0 +1,81 @@
+"""Unit tests — phát hành QR phiếu theo chunk song song."""
+from __future__ import annotations
+
+import asyncio
+
+from utils import bid_ticket_issue_client as bic
+
+
+def test_attach_qr_concurrent_chunks_keep_order(monkeypatch):
+    monkeypatch.setattr(bic, "BULK_ISSUE_CHUNK_SIZE", 3)
+    monkeypatch.setattr(bic, "BULK_ISSUE_CONCURRENCY", 2)
+    bic.invalidate_issued_tokens()
+    state = {"active": 0, "peak": 0}
+
+    async def fake_chunk(client, *, headers, items, company_code, chunk_no, chunk_total):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.001 * (chunk_total - chunk_no))  # chunk sau về trước
+        state["active"] -= 1
+        if chunk_no == 2:
+            raise RuntimeError("boom")
+        return [{"qr_token": f"tok-{it['customer_id']}"} for it in items]
+
+    async def fake_qr(tokens, *, fmt="png", box_size=7):
+        return [f"qr:{t}" if t else None for t in tokens]
+
+    monkeypatch.setattr(bic, "_bulk_issue_one_chunk", fake_chunk)
+    monkeypatch.setattr(bic, "qr_batch", fake_qr)
+    tickets = [{"project_id": 1, "lot_id": 1, "customer_id": i} for i in range(10)]
+
+    out = asyncio.run(bic.attach_qr_to_tickets("t", tickets))
+    assert [t["customer_id"] for t in out] == list(range(10))
+    assert state["peak"] == 2
+    for t in out:
+        if 3 <= t["customer_id"] < 6:  # chunk 2 lỗi -> không có QR, chunk khác vẫn có
+            assert "qr_token" not in t
+        else:
+            assert t["qr_token"] == f"tok-{t['customer_id']}"
+            field = "qr_svg" if bic.BID_TICKET_QR_FORMAT == "svg" else "qr_data_uri"
+            assert t[field] == f"qr:tok-{t['customer_id']}"
+
+
+def test_reprint_reuses_issued_tokens(monkeypatch):
+    bic.invalidate_issued_tokens()
+    sent = []
+
+    async def fake_chunk(client, *, headers, items, company_code, chunk_no, chunk_total):
+        sent.append([it["customer_id"] for it in items])
+        return [{"qr_token": f"tok-{it['customer_id']}-{len(sent)}"} for it in items]
+
+    async def fake_qr(tokens, *, fmt="png", box_size=7):
+        return [f"qr:{t}" if t else None for t in tokens]
+
+    monkeypatch.setattr(bic, "_bulk_issue_one_chunk", fake_chunk)
+    monkeypatch.setattr(bic, "qr_batch", fake_qr)
+    first = [{"project_id": 1, "lot_id": 1, "customer_id": i, "session_id": 9} for i in range(3)]
+    out1 = asyncio.run(bic.attach_qr_to_tickets("t", first))
+
+    again = first + [{"project_id": 1, "lot_id": 1, "customer_id": 3, "session_id": 9}]
+    out2 = asyncio.run(bic.attach_qr_to_tickets("t", again))
+    assert sent == [[0, 1, 2], [3]]  # chỉ phiếu mới được gửi phát hành
+    assert [t["qr_token"] for t in out2[:3]] == [t["qr_token"] for t in out1]
+    assert out2[3]["qr_token"] == "tok-3-2"
+
+    bic.invalidate_issued_tokens(project_id=1)
+    asyncio.run(bic.attach_qr_to_tickets("t", first))
+    assert sent[-1] == [0, 1, 2]
+
+
+def test_invalidate_by_customer_session_and_path():
+    bic.invalidate_issued_tokens()
+    for cid, sid, rl in ((1, 9, 100), (2, 9, 101), (1, 10, None)):
+        item = {"project_id": 5, "lot_id": 1, "customer_id": cid, "session_id": sid,
+                "round_lot_id": rl, "source": "SESSION"}
+        bic._issued_index.set(bic._issued_key("s", "CC", item), ("tok", "qr"))
+
+    assert bic.invalidate_issued_tokens_for_path("/api/v1/auction-sessions/round-lots/101/decide") == 1
+    assert bic.invalidate_issued_tokens(5, customer_id=1, session_id=10) == 1
+    assert bic.invalidate_issued_tokens_for_path("/api/v1/projects/5") == 0
+    assert bic.invalidate_issued_tokens_for_path("/api/v1/auction-sessions/sessions/9/status") == 1
+    assert len(bic._issued_index) == 0
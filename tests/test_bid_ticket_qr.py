@@ -0,0 +1,71 @@
+"""Unit tests — QR phiếu: cache, encode theo lô, SVG khớp ma trận QR."""
+from __future__ import annotations
+
+import asyncio
+import re
+
+import pytest
+
+from utils import bid_ticket_qr as bq
+
+pytest.importorskip("qrcode")
+
+
+def _svg_cells(svg: str) -> set:
+    d = re.search(r' d="M0 \.5([^"]*)"', svg).group(1)
+    cells, x, y = set(), 0, 0
+    for dx, dy, run in re.findall(r"m(-?\d+) (-?\d+)h(\d+)", d):
+        x, y = x + int(dx), y + int(dy)
+        cells.update((x + i, y) for i in range(int(run)))
+        x += int(run)
+    return cells
+
+
+def test_svg_path_matches_matrix():
+    svg = bq.qr_svg("TOKEN-abc-123")
+    matrix = bq._make_qr("TOKEN-abc-123", 7).get_matrix()
+    expected = {(x, y) for y, row in enumerate(matrix) for x, v in enumerate(row) if v}
+    assert _svg_cells(svg) == expected
+
+
+def test_batch_keeps_order_dedupes_and_caches(monkeypatch):
+    monkeypatch.setattr(bq, "QR_POOL_WORKERS", 0)
+    bq._qr_cache.clear()
+    calls = []
+    real = bq._encode_many
+
+    def spy(texts, box_size, fmt):
+        calls.append(list(texts))
+        return real(texts, box_size, fmt)
+
+    monkeypatch.setattr(bq, "_encode_many", spy)
+    out = asyncio.run(bq.qr_batch(["a", None, "b", "a"]))
+    assert out[1] is None and out[0] == out[3] and out[0] != out[2]
+    assert calls == [["a", "b"]]
+
+    again = asyncio.run(bq.qr_batch(["b", "a"]))
+    assert again == [out[2], out[0]] and len(calls) == 1
+    assert bq.qr_png_data_uri("a") == out[0]
+
+
+def test_broken_pool_is_reset(monkeypatch):
+    from concurrent.futures.process import BrokenProcessPool
+
+    class Broken:
+        shut = False
+
+        def submit(self, *a, **k):
+            raise BrokenProcessPool("worker died")
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            self.shut = True
+
+    broken = Broken()
+    monkeypatch.setattr(bq, "QR_POOL_WORKERS", 1)
+    monkeypatch.setattr(bq, "QR_POOL_MIN_BATCH", 1)
+    monkeypatch.setattr(bq, "_qr_pool", broken)
+    bq._qr_cache.clear()
+
+    out = asyncio.run(bq.qr_batch(["x1", "x2"]))
+    assert all(out)  # fallback thread vẫn encode được
+    assert broken.shut and bq._qr_pool is None  # lô sau tạo pool mới
@@ -0,0 +1,45 @@
+"""Unit tests — template import dự án: skeleton vá project_code, index mã kế tiếp."""
+from __future__ import annotations
+
+import asyncio
+import io
+
+from openpyxl import load_workbook
+
+from utils import excel_templates as et
+
+
+def _codes(content: bytes):
+    wb = load_workbook(io.BytesIO(content))
+    return wb["projects"]["A2"].value, wb["lots"]["A2"].value, wb["lots"]["A1"].value
+
+
+def test_patched_workbook_opens_and_escapes():
+    assert _codes(et.render_projects_lots_template("ABC1")) == ("ABC1", "ABC1", "project_code")
+
+    tricky = 'A&B<1>"x\'Đ'
+    assert _codes(et.render_projects_lots_template(tricky))[:2] == (tricky, tricky)
+    # skeleton không bị vá lại: lần sau vẫn ra đúng mã mới
+    assert _codes(et.render_projects_lots_template("ABC2"))[:2] == ("ABC2", "ABC2")
+
+
+def test_next_code_index_cached_until_invalidated(monkeypatch):
+    used = {1, 2}
+    calls = []
+
+    async def fake_fetch(access, company_code):
+        calls.append(company_code)
+        return set(used)
+
+    monkeypatch.setattr(et, "_fetch_used_code_numbers", fake_fetch)
+    et.invalidate_project_code_index()
+
+    assert asyncio.run(et._next_project_code("tok", "abc")) == "ABC3"
+    used.add(3)
+    # còn trong TTL -> dùng index cũ, không gọi A
+    assert asyncio.run(et._next_project_code("tok", "abc")) == "ABC3"
+    assert len(calls) == 1
+
+    et.invalidate_project_code_index("abc")
+    assert asyncio.run(et._next_project_code("tok", "abc")) == "ABC4"
+    assert len(calls) == 2
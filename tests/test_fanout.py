@@ -0,0 +1,58 @@
+"""Unit tests — bounded_gather (fan-out có trần concurrency)."""
+from __future__ import annotations
+
+import asyncio
+
+from utils.fanout import bounded_gather
+
+
+def test_order_cap_and_error_isolation():
+    active = 0
+    peak = 0
+
+    async def work(i):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        try:
+            await asyncio.sleep(0.01)
+            if i == 3:
+                raise RuntimeError("boom")
+            if i == 5:
+                await asyncio.sleep(1)
+            return i * 10
+        finally:
+            active -= 1
+
+    out = asyncio.run(
+        bounded_gather(range(20), work, concurrency=4, timeout=0.2, default=-1)
+    )
+    assert peak <= 4
+    assert out[3] == -1
+    assert out[5] == -1
+    assert [x for i, x in enumerate(out) if i not in (3, 5)] == [i * 10 for i in range(20) if i not in (3, 5)]
+
+
+def test_shared_semaphore_caps_across_calls():
+    active = 0
+    peak = 0
+
+    async def work(i):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return i
+
+    async def main():
+        sem = asyncio.Semaphore(3)
+        a, b = await asyncio.gather(
+            bounded_gather(range(10), work, semaphore=sem),
+            bounded_gather(range(10), work, semaphore=sem),
+        )
+        return a, b
+
+    a, b = asyncio.run(main())
+    assert a == list(range(10)) and b == list(range(10))
+    assert peak <= 3
@@ -0,0 +1,187 @@
+"""Unit tests — spool ingest thiết bị: hàng đợi SQLite bền, idempotency, flush theo lô, sự cố A."""
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+from routers.mobile import ingest_spool as bsb
+
+
+def _sms(device, n):
+    return json.dumps({"device_id": device, "body": f"GD +{n}000 VND"})
+
+
+def test_enqueue_dedup_and_ordered_bulk(tmp_path, monkeypatch):
+    monkeypatch.setattr(bsb, "BANK_SMS_BATCH_ENABLED", True)
+    monkeypatch.setattr(bsb, "BANK_SMS_BATCH_MAX", 3)
+    spool = bsb.SmsSpool(str(tmp_path / "q.sqlite3"))
+    for i in range(5):
+        assert spool.enqueue(f"d1:{i}", "d1", _sms("d1", i))
+    assert spool.enqueue("d1:0", "d1", _sms("d1", 0)) is False  # trùng key
+
+    posted = []
+
+    async def post(path, payload, headers=None):
+        posted.append((path, [it["body"] for it in payload["items"]]))
+        return 200, {"ok": True, "accepted": len(payload["items"])}
+
+    assert asyncio.run(bsb.flush_once(spool, post)) is True  # đủ lô 3
+    assert asyncio.run(bsb.flush_once(spool, post)) is None  # 2 còn lại chưa tới cửa sổ
+    assert asyncio.run(bsb.flush_once(spool, post, force=True)) is True
+    assert posted == [
+        (bsb.INGEST_BULK_PATH, ["GD +0000 VND", "GD +1000 VND", "GD +2000 VND"]),
+        (bsb.INGEST_BULK_PATH, ["GD +3000 VND", "GD +4000 VND"]),
+    ]
+    assert spool.pending() == (0, None)
+    assert spool.enqueue("d1:4", "d1", _sms("d1", 4)) is False  # đã gửi vẫn nhớ key
+
+
+def test_upstream_down_keeps_order_and_4xx_isolates(tmp_path, monkeypatch):
+    monkeypatch.setattr(bsb, "BANK_SMS_BATCH_ENABLED", True)
+    spool = bsb.SmsSpool(str(tmp_path / "q.sqlite3"))
+    for i in range(3):
+        spool.enqueue(f"k{i}", "d1", _sms("d1", i))
+
+    async def down(path, payload, headers=None):
+        return None, "connection refused"
+
+    assert asyncio.run(bsb.flush_once(spool, down, force=True)) is False
+    assert spool.pending()[0] == 3
+
+    single = []
+
+    async def picky(path, payload, headers=None):
+        if path == bsb.INGEST_BULK_PATH:
+            return 422, {"detail": "bad item"}
+        single.append(payload["body"])
+        return (422, {"detail": "bad"}) if payload["body"] == "GD +1000 VND" else (200, {})
+
+    assert asyncio.run(bsb.flush_once(spool, picky, force=True)) is True
+    assert single == ["GD +0000 VND", "GD +1000 VND", "GD +2000 VND"]
+    assert spool.pending()[0] == 0
+    dead = spool._db.execute("SELECT idem_key FROM sms_queue WHERE state = 'dead'").fetchall()
+    assert dead == [("k1",)]
+
+
+def test_lease_single_flusher(tmp_path):
+    path = str(tmp_path / "q.sqlite3")
+    a, b = bsb.SmsSpool(path), bsb.SmsSpool(path)
+    assert a.acquire_lease("f", "w1", 30) is True
+    assert b.acquire_lease("f", "w2", 30) is False
+    assert a.acquire_lease("f", "w1", 30) is True
+
+
+def test_outage_spools_without_calling_a_and_replays_in_order(tmp_path, monkeypatch):
+    import httpx
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from routers.mobile import service_a_client as sac
+    from routers.mobile.apis.v1.mirror import router
+
+    monkeypatch.setattr(bsb, "BANK_SMS_BATCH_ENABLED", False)
+    monkeypatch.setattr(bsb, "INGEST_SPOOL_ON_OUTAGE", True)
+    monkeypatch.setattr(bsb, "_spool", bsb.SmsSpool(str(tmp_path / "q.sqlite3")))
+    monkeypatch.setattr(bsb, "outage", bsb._Outage())
+    monkeypatch.setattr(bsb, "ensure_flusher", lambda: None)
+    calls = []
+
+    def handler(req):
+        calls.append(req.url.path)
+        return httpx.Response(503, json={"detail": "down"})
+
+    monkeypatch.setattr(sac, "_proxy_client", httpx.AsyncClient(base_url="http://a.test", transport=httpx.MockTransport(handler)))
+    app = FastAPI()
+    app.include_router(router, prefix="/apis/mobile/v1")
+    tc = TestClient(app)
+
+    for i in range(3):
+        r = tc.post("/apis/mobile/v1" + bsb.INGEST_PATH, json={"device_id": "d1", "body": f"m{i}"})
+        assert r.status_code == 202 and r.json()["data"]["queued"] is True
+    for i in range(2):
+        r = tc.post("/apis/mobile/v1" + bsb.HEARTBEAT_PATH, json={"device_id": "d1", "n": i})
+        assert r.status_code == 202
+    assert calls == [bsb.INGEST_PATH]  # chỉ lần đầu chạm A, sau đó A đang "down" -> spool luôn
+
+    spool = bsb._spool
+    assert spool.pending()[0] == 3 and len(spool.heartbeats(10)) == 1  # ping gộp theo thiết bị
+
+    posted = []
+
+    async def up(path, payload, headers=None):
+        posted.append((path, payload))
+        return 200, {}
+
+    assert asyncio.run(bsb.flush_once(spool, up, force=True)) is True
+    assert asyncio.run(bsb.flush_heartbeats(spool, up)) is True
+    # không bật gom lô -> phát lại từng tin qua /ingest (không qua /ingest/bulk)
+    assert posted[:3] == [(bsb.INGEST_PATH, {"device_id": "d1", "body": f"m{i}"}) for i in range(3)]
+    assert posted[3] == (bsb.HEARTBEAT_PATH, {"device_id": "d1", "n": 1})
+    assert spool.heartbeats(10) == []
+
+
+def test_spool_cap_rejects_with_retry_after(tmp_path, monkeypatch):
+    monkeypatch.setattr(bsb, "INGEST_SPOOL_MAX_QUEUED", 2)
+    monkeypatch.setattr(bsb, "_spool", bsb.SmsSpool(str(tmp_path / "q.sqlite3")))
+    monkeypatch.setattr(bsb, "ensure_flusher", lambda: None)
+    codes = [asyncio.run(bsb._spool_sms(f"k{i}", "d", b"{}", "outage")).status_code for i in range(3)]
+    assert codes == [202, 202, 503]
+    # key đã có vẫn được ack là trùng, không bị chặn bởi cap
+    assert asyncio.run(bsb._spool_sms("k0", "d", b"{}", "outage")).status_code == 202
+
+
+def test_bulk_2xx_marks_sent_only_per_accepted_item(tmp_path, monkeypatch):
+    monkeypatch.setattr(bsb, "BANK_SMS_BATCH_ENABLED", True)
+    spool = bsb.SmsSpool(str(tmp_path / "q.sqlite3"))
+    for i in range(3):
+        spool.enqueue(f"k{i}", "d1", _sms("d1", i))
+    single = []
+
+    async def post(path, payload, headers=None):
+        if path == bsb.INGEST_BULK_PATH:
+            return 200, {"data": {"results": [{"status": 201}, {"status": 500}, {"duplicate": True}]}}
+        single.append(payload["body"])
+        return 200, {}
+
+    assert asyncio.run(bsb.flush_once(spool, post, force=True)) is True
+    assert single == ["GD +1000 VND"]  # chỉ tin A chưa nhận được gửi lại
+    assert spool.pending()[0] == 0
+
+    for i in range(3, 5):
+        spool.enqueue(f"k{i}", "d1", _sms("d1", i))
+    single.clear()
+
+    async def vague(path, payload, headers=None):
+        if path == bsb.INGEST_BULK_PATH:
+            return 200, {"ok": True}
+        single.append(payload["body"])
+        return 200, {}
+
+    assert asyncio.run(bsb.flush_once(spool, vague, force=True)) is True
+    assert single == ["GD +3000 VND", "GD +4000 VND"]
+
+
+def test_expired_lease_hands_over_without_duplicates(tmp_path, monkeypatch):
+    monkeypatch.setattr(bsb, "BANK_SMS_BATCH_ENABLED", False)
+    path = str(tmp_path / "q.sqlite3")
+    a, b = bsb.SmsSpool(path), bsb.SmsSpool(path)
+    for i in range(3):
+        a.enqueue(f"d1:k{i}", "d1", _sms("d1", i))
+    assert a.acquire_lease(bsb.FLUSHER_LEASE, "w1", 30)
+    posted = []
+
+    async def slow(path, payload, headers=None):
+        posted.append(headers["Idempotency-Key"])
+        if len(posted) == 1:
+            # lần gửi đầu của w1 kéo quá TTL: lease hết hạn, w2 chiếm lease
+            a._db.execute("UPDATE leases SET until = 0")
+            assert b.acquire_lease(bsb.FLUSHER_LEASE, "w2", 30)
+        return 200, {}
+
+    with pytest.raises(bsb.LeaseLost):  # w1 dừng trước tin thứ 2
+        asyncio.run(bsb.flush_once(a, slow, hold=bsb._lease_keeper(a, "w1", 30)))
+    assert asyncio.run(bsb.flush_once(b, slow, hold=bsb._lease_keeper(b, "w2", 30))) is True
+    assert posted == ["k0", "k1", "k2"]  # mỗi tin 1 lần, đúng thứ tự, kèm key gốc
+    assert b.pending()[0] == 0
@@ -0,0 +1,108 @@
+"""Unit tests — LiveHub: 1 poller / key dùng chung, chỉ đẩy khi đổi, dừng khi hết subscriber."""
+from __future__ import annotations
+
+import asyncio
+import json
+
+from utils import live_hub
+from utils.live_hub import LiveHub
+
+
+def _data(frame: bytes):
+    text = frame.decode("utf-8")
+    name = next(line[7:] for line in text.splitlines() if line.startswith("event: "))
+    body = "".join(line[6:] for line in text.splitlines() if line.startswith("data: "))
+    return name, json.loads(body)
+
+
+def test_shared_poller_pushes_only_on_change_and_stops(monkeypatch):
+    monkeypatch.setattr(live_hub, "LIVE_HUB_IDLE_GRACE", 0.05)
+
+    async def main():
+        calls = []
+        values = iter([{"v": 1}, {"v": 1}, {"v": 2}] + [{"v": 2}] * 1000)
+
+        async def fetch(token):
+            calls.append(token)
+            return 200, next(values)
+
+        hub = LiveHub("t")
+        a = hub._frames("k", fetch, 0.01, "tok-a")
+        b = hub._frames("k", fetch, 0.01, "tok-b")
+        assert (await a.__anext__()).startswith(b"retry:")
+        assert (await b.__anext__()).startswith(b"retry:")
+        assert hub.stats() == {"topics": 1, "subscribers": 2}
+
+        got_a = [_data(await a.__anext__()), _data(await a.__anext__())]
+        got_b = _data(await b.__anext__())
+        assert got_a == [("snapshot", {"v": 1}), ("snapshot", {"v": 2})]
+        # b chậm: chỉ giữ bản mới nhất
+        assert got_b == ("snapshot", {"v": 2})
+        # 1 poller cho 2 màn hình, dùng token của subscriber vào sau
+        assert len(calls) >= 3 and set(calls) == {"tok-b"}
+
+        await a.aclose()
+        await b.aclose()
+        await asyncio.sleep(0.1)
+        assert hub.stats() == {"topics": 0, "subscribers": 0}
+        n = len(calls)
+        await asyncio.sleep(0.05)
+        assert len(calls) == n
+
+    asyncio.run(main())
+
+
+def test_auth_error_only_reaches_that_token(monkeypatch):
+    monkeypatch.setattr(live_hub, "LIVE_HUB_IDLE_GRACE", 0)
+
+    async def main():
+        calls = []
+
+        async def fetch(token):
+            calls.append(token)
+            if token == "bad":
+                return 401, {"detail": "expired"}
+            return 200, {"v": 1}
+
+        hub = LiveHub("t")
+        good = hub._frames("k", fetch, 0.01, "good")
+        bad = hub._frames("k", fetch, 0.01, "bad")
+        await good.__anext__()
+        await bad.__anext__()
+
+        # token hỏng: chỉ màn hình của nó nhận lỗi rồi stream đóng
+        assert _data(await bad.__anext__()) == ("upstream_error", {"status": 401, "body": {"detail": "expired"}})
+        try:
+            await bad.__anext__()
+            raise AssertionError("stream should end")
+        except StopAsyncIteration:
+            pass
+        # màn hình còn lại thử ngay bằng token của nó, không thấy lỗi
+        assert _data(await good.__anext__()) == ("snapshot", {"v": 1})
+        assert calls[:2] == ["bad", "good"]
+
+        # vào sau: nhận bản mới nhất (không phải lỗi của token khác)
+        late = hub._frames("k", fetch, 0.01, "good")
+        await late.__anext__()
+        assert _data(await late.__anext__()) == ("snapshot", {"v": 1})
+
+        await late.aclose()
+        await good.aclose()
+        assert hub.stats()["topics"] == 0
+
+    asyncio.run(main())
+
+
+def test_subscriber_scope_is_per_verified_user_or_token():
+    from types import SimpleNamespace
+
+    from utils.auth import ACCESS_COOKIE_ENV
+
+    def req(me, cookie):
+        return SimpleNamespace(state=SimpleNamespace(auth_me=me), cookies={ACCESS_COOKIE_ENV: cookie})
+
+    me = {"company_code": "abc", "id": 7}
+    assert live_hub.subscriber_scope(req(me, "tok"), "tok") == "ABC:7"
+    # Bearer khác cookie đã verify -> không dùng chung topic của công ty
+    other = live_hub.subscriber_scope(req(me, "tok"), "forged")
+    assert other.startswith("t:") and other != live_hub.subscriber_scope(req(me, "tok"), "forged2")
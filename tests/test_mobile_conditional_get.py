@@ -0,0 +1,129 @@
+"""Unit tests — mirror mobile: ETag/304 và chế độ delta `since` cho list có updated_at."""
+from __future__ import annotations
+
+import json
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers.mobile import conditional_get as cg
+from routers.mobile import service_a_client as sac
+from routers.mobile.apis.v1.mirror import router
+
+AUTH = {"Authorization": "Bearer t"}
+URL = "/apis/mobile/v1/api/v1/lots"
+
+
+def _client(monkeypatch, state):
+    calls = []
+
+    def handler(req):
+        calls.append(req)
+        return httpx.Response(200, json={"code": 200, "data": {"items": state["items"], "total": len(state["items"])}})
+
+    monkeypatch.setattr(sac, "_proxy_client", httpx.AsyncClient(base_url="http://a.test", transport=httpx.MockTransport(handler)))
+    cg._snapshots.clear()
+    app = FastAPI()
+    app.include_router(router, prefix="/apis/mobile/v1")
+    return TestClient(app), calls
+
+
+def test_etag_304(monkeypatch):
+    state = {"items": [{"id": 1, "updated_at": "t1", "name": "A"}]}
+    tc, calls = _client(monkeypatch, state)
+    r1 = tc.get(URL, headers=AUTH)
+    etag = r1.headers["etag"]
+    assert r1.status_code == 200 and etag.startswith('W/"m-')
+    r2 = tc.get(URL, headers={**AUTH, "If-None-Match": etag})
+    assert r2.status_code == 304 and r2.content == b""
+    assert "if-none-match" not in calls[-1].headers  # ETag của mirror không gửi sang A
+    state["items"][0]["name"] = "B"
+    assert tc.get(URL, headers={**AUTH, "If-None-Match": etag}).status_code == 200
+
+
+def test_since_delta_and_unknown_since(monkeypatch):
+    state = {"items": [{"id": i, "updated_at": "t1", "name": f"n{i}"} for i in range(1, 4)]}
+    tc, calls = _client(monkeypatch, state)
+    etag = tc.get(URL + "?status=open", headers=AUTH).headers["etag"]
+
+    state["items"] = [
+        {"id": 1, "updated_at": "t1", "name": "n1"},
+        {"id": 2, "updated_at": "t2", "name": "n2*"},
+        {"id": 4, "updated_at": "t2", "name": "n4"},
+    ]
+    r = tc.get(URL, params={"status": "open", "since": etag}, headers=AUTH)
+    body = r.json()
+    assert r.headers["x-delta"] == "1"
+    assert [it["id"] for it in body["data"]["items"]] == [2, 4]
+    assert body["delta"]["removed"] == ["3"] and body["delta"]["total"] == 3
+    assert body["delta"]["etag"] == r.headers["etag"]
+    assert calls[-1].url.params.get("since") is None  # since của mirror không gửi sang A
+
+    r = tc.get(URL, params={"status": "open", "since": 'W/"m-unknown"'}, headers=AUTH)
+    assert r.headers["x-delta"] == "full" and len(r.json()["data"]["items"]) == 3
+
+    # since không phải ETag mirror -> tham số của A, giữ nguyên
+    tc.get(URL, params={"since": "2025-01-01"}, headers=AUTH)
+    assert calls[-1].url.params.get("since") == "2025-01-01"
+
+
+def test_gzip_when_accepted(monkeypatch):
+    state = {"items": [{"id": i, "updated_at": "t", "name": "x" * 50} for i in range(100)]}
+    tc, _ = _client(monkeypatch, state)
+    r = tc.get(URL, headers={**AUTH, "Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert int(r.headers["content-length"]) < len(json.dumps(state).encode())
+    assert len(r.json()["data"]["items"]) == 100
+
+
+def test_top_level_list_delta_keeps_shape(monkeypatch):
+    state = {"items": [{"id": i, "updated_at": "t1"} for i in range(1, 3)]}
+
+    def handler(req):
+        return httpx.Response(200, json=state["items"])
+
+    monkeypatch.setattr(sac, "_proxy_client", httpx.AsyncClient(base_url="http://a.test", transport=httpx.MockTransport(handler)))
+    cg._snapshots.clear()
+    app = FastAPI()
+    app.include_router(router, prefix="/apis/mobile/v1")
+    tc = TestClient(app)
+
+    etag = tc.get(URL, headers=AUTH).headers["etag"]
+    state["items"] = [{"id": 1, "updated_at": "t2"}]
+    r = tc.get(URL, params={"since": etag}, headers=AUTH)
+    assert r.headers["x-delta"] == "1"
+    assert r.json() == [{"id": 1, "updated_at": "t2"}]
+    assert json.loads(r.headers["x-delta-removed"]) == ["2"]
+    assert r.headers["x-delta-total"] == "1" and r.headers["x-delta-since"] == etag
+
+
+def test_chunked_body_over_cap_is_streamed(monkeypatch):
+    body = json.dumps([{"id": i, "updated_at": "t", "pad": "x" * 100} for i in range(50)]).encode()
+
+    async def chunks():
+        for i in range(0, len(body), 500):
+            yield body[i : i + 500]
+
+    def handler(req):
+        return httpx.Response(200, headers={"content-type": "application/json"}, content=chunks())
+
+    monkeypatch.setattr(cg, "MOBILE_ETAG_MAX_BYTES", 1000)
+    monkeypatch.setattr(sac, "_proxy_client", httpx.AsyncClient(base_url="http://a.test", transport=httpx.MockTransport(handler)))
+    app = FastAPI()
+    app.include_router(router, prefix="/apis/mobile/v1")
+    r = TestClient(app).get(URL, headers=AUTH)
+    assert r.status_code == 200 and "etag" not in r.headers
+    assert r.content == body
+
+
+def test_too_many_removed_falls_back_to_full(monkeypatch):
+    monkeypatch.setattr(cg, "MOBILE_DELTA_MAX_REMOVED_BYTES", 64)
+    state = {"items": [{"id": i, "updated_at": "t1"} for i in range(1, 40)]}
+    tc, _ = _client(monkeypatch, state)
+
+    etag = tc.get(URL, headers=AUTH).headers["etag"]
+    state["items"] = state["items"][:1]
+    r = tc.get(URL, params={"since": etag}, headers=AUTH)
+    assert r.headers["x-delta"] == "full" and "x-delta-removed" not in r.headers
+    assert r.json()["data"]["items"] == [{"id": 1, "updated_at": "t1"}] and "delta" not in r.json()
@@ -0,0 +1,84 @@
+"""Unit tests — mirror mobile: proxy stream nguyên byte, lọc hop-by-hop, gọi A đúng 1 lần."""
+from __future__ import annotations
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers.mobile import service_a_client as sac
+from routers.mobile.apis.v1.mirror import router
+
+
+class _Body(httpx.AsyncByteStream):
+    """Body chưa đọc (như transport thật) — Response(content=bytes) bị httpx đọc sẵn."""
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+
+    async def __aiter__(self):
+        for i in range(0, len(self.data), 4096):
+            yield self.data[i : i + 4096]
+
+
+def _resp(status, body=b"", headers=()):
+    return httpx.Response(status, stream=_Body(body), headers=list(headers))
+
+
+def _app(monkeypatch, handler):
+    calls = []
+
+    def wrapped(req: httpx.Request) -> httpx.Response:
+        calls.append(req)
+        return handler(req)
+
+    client = httpx.AsyncClient(base_url="http://a.test", transport=httpx.MockTransport(wrapped))
+    monkeypatch.setattr(sac, "_proxy_client", client)
+    app = FastAPI()
+    app.include_router(router, prefix="/apis/mobile/v1")
+    return TestClient(app), calls
+
+
+def test_binary_body_and_headers_pass_through(monkeypatch):
+    xlsx = b"PK\x03\x04" + bytes(range(256)) * 50
+
+    def handler(req):
+        assert req.read() == b"\x00\x01raw"
+        return _resp(
+            200,
+            xlsx,
+            headers=[
+                ("content-type", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+                ("set-cookie", "a=1"),
+                ("set-cookie", "b=2"),
+                ("connection", "x-internal"),
+                ("x-internal", "1"),
+                ("keep-alive", "timeout=5"),
+            ],
+        )
+
+    tc, calls = _app(monkeypatch, handler)
+    r = tc.post(
+        "/apis/mobile/v1/api/v1/reports/export?x=1&x=2",
+        content=b"\x00\x01raw",
+        headers={"Authorization": "Bearer t", "Content-Type": "application/octet-stream", "Cookie": "sid=b"},
+    )
+    assert r.status_code == 200 and r.content == xlsx
+    assert r.headers.get_list("set-cookie") == ["a=1", "b=2"]
+    assert "x-internal" not in r.headers and "keep-alive" not in r.headers
+    sent = calls[0]
+    assert sent.url.path == "/api/v1/reports/export" and sent.url.query == b"x=1&x=2"
+    assert sent.headers["authorization"] == "Bearer t" and "cookie" not in sent.headers
+
+
+def test_upstream_5xx_single_attempt_and_non_json_kept(monkeypatch):
+    tc, calls = _app(monkeypatch, lambda req: _resp(503, b"maintenance", [("content-type", "text/plain")]))
+    r = tc.get("/apis/mobile/v1/api/v1/projects", headers={"Authorization": "Bearer t"})
+    assert r.status_code == 503 and r.text == "maintenance"
+    assert len(calls) == 1
+
+
+def test_auth_required_except_open_paths(monkeypatch):
+    tc, calls = _app(monkeypatch, lambda req: _resp(200, b'{"ok":1}', [("content-type", "application/json")]))
+    assert tc.get("/apis/mobile/v1/api/v1/projects").status_code == 401
+    assert tc.post("/apis/mobile/v1/auth/login", json={"u": 1}).json() == {"ok": 1}
+    assert len(calls) == 1
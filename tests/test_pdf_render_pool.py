@@ -0,0 +1,74 @@
+"""Unit tests — pool render PDF: trần pending, timeout (drain rồi mới kill), pool hỏng."""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from utils import pdf_render_pool as prp
+
+
+def _sleep_pid(seconds: float) -> int:
+    time.sleep(seconds)
+    return os.getpid()
+
+
+def _crash() -> None:
+    os._exit(1)
+
+
+@pytest.fixture
+def pool_env(monkeypatch):
+    prp.stop_pdf_pool()
+    monkeypatch.setattr(prp, "PDF_RENDER_WORKERS", 2)
+    monkeypatch.setattr(prp, "PDF_RENDER_MAX_PENDING", 8)
+    yield
+    prp.stop_pdf_pool()
+
+
+def test_busy_cap(monkeypatch):
+    monkeypatch.setattr(prp, "PDF_RENDER_WORKERS", 0)
+    monkeypatch.setattr(prp, "PDF_RENDER_MAX_PENDING", 1)
+
+    async def main():
+        first = asyncio.ensure_future(prp._run(_sleep_pid, 0.2, timeout=5))
+        await asyncio.sleep(0.05)
+        with pytest.raises(prp.PdfRenderBusy):
+            await prp._run(_sleep_pid, 0, timeout=5)
+        await first
+        assert prp._pending == 0
+        await prp._run(_sleep_pid, 0, timeout=5)
+
+    asyncio.run(main())
+
+
+def test_timeout_lets_other_jobs_finish_then_recycles(pool_env):
+    async def main():
+        await prp.start_pdf_pool()
+        old = prp._get_pool()
+        stuck = asyncio.ensure_future(prp._run(_sleep_pid, 30, timeout=0.5))
+        other = asyncio.ensure_future(prp._run(_sleep_pid, 1.5, timeout=10))
+
+        with pytest.raises(RuntimeError):
+            await stuck
+        # job mới sang pool mới; pool cũ còn chạy nốt job kia
+        assert prp._pool is None and old in prp._retiring
+        assert await prp._run(_sleep_pid, 0, timeout=30) > 0
+        assert prp._get_pool() is not old
+
+        assert await other > 0
+        assert old not in prp._retiring and old not in prp._active
+
+    asyncio.run(main())
+
+
+def test_broken_pool_is_rebuilt(pool_env):
+    async def main():
+        with pytest.raises(RuntimeError):
+            await prp._run(_crash, timeout=30)
+        assert prp._pool is None
+        assert await prp._run(_sleep_pid, 0, timeout=30) > 0
+
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""Unit tests — validate tăng dần cho dự án đã tạo (IncrementalProjectValidator)."""
+from __future__ import annotations
+
+import random
+
+from utils.project_existing_validate import (
+    IncrementalProjectValidator,
+    build_existing_project_preview,
+    build_existing_project_preview_cached,
+)
+from utils.project_import_verifier import ProjectImportVerifier
+
+
+def _sa_lot(i, sp, dp):
+    return {
+        "id": 1000 + i,
+        "lot_code": f"L{i}",
+        "name": f"Lô {i}",
+        "starting_price": sp,
+        "deposit_amount": dp,
+        "status": "ACTIVE",
+    }
+
+
+def _lots_in(sa_lots, code="P1"):
+    return [
+        {
+            "row": i,
+            "project_code": code,
+            "lot_code": lot["lot_code"],
+            "name": lot["name"],
+            "description": None,
+            "starting_price": lot["starting_price"],
+            "deposit_amount": lot["deposit_amount"],
+            "bid_step_vnd": None,
+            "area": None,
+            "lot_id": lot["id"],
+            "status_lot": lot["status"],
+        }
+        for i, lot in enumerate(sa_lots, start=1)
+    ]
+
+
+def _random_amounts(rng):
+    sp = rng.choice([100_000_000, 200_000_000, 500_000, 5_000_000_000, "1.5", "", None])
+    dp = rng.choice([20_000_000, 40_000_000, 100_000_000, 600_000, "", None, "x"])
+    return sp, dp
+
+
+def test_incremental_matches_full_verifier_across_edits():
+    rng = random.Random(7)
+    sa_lots = [_sa_lot(i, *_random_amounts(rng)) for i in range(60)]
+    inc = IncrementalProjectValidator()
+
+    for _ in range(25):
+        got = inc.run(_lots_in(sa_lots), "P1")
+        want = ProjectImportVerifier(_lots_in(sa_lots)).run()
+        assert got == want
+
+        op = rng.random()
+        if op < 0.5:
+            sa_lots[rng.randrange(len(sa_lots))].update(
+                dict(zip(("starting_price", "deposit_amount"), _random_amounts(rng)))
+            )
+        elif op < 0.75 and len(sa_lots) > 1:
+            sa_lots.pop(rng.randrange(len(sa_lots)))
+        else:
+            sa_lots.append(_sa_lot(len(sa_lots) + 100, *_random_amounts(rng)))
+
+
+def test_only_changed_lots_are_rechecked():
+    sa_lots = [_sa_lot(i, 100_000_000, 20_000_000) for i in range(50)]
+    inc = IncrementalProjectValidator()
+
+    inc.run(_lots_in(sa_lots), "P1")
+    assert inc.last_checked == 50
+
+    inc.run(_lots_in(sa_lots), "P1")
+    assert inc.last_checked == 0
+
+    sa_lots[3]["deposit_amount"] = 30_000_000
+    r = inc.run(_lots_in(sa_lots), "P1")
+    assert inc.last_checked == 1
+    assert r == ProjectImportVerifier(_lots_in(sa_lots)).run()
+
+
+def test_returned_payload_top_level_is_a_copy():
+    sa_lots = [_sa_lot(i, 100_000_000, 20_000_000) for i in range(5)]
+    inc = IncrementalProjectValidator()
+    first = inc.run(_lots_in(sa_lots), "P1")
+    first["lots"].pop()
+    first["errorCount"] = 99
+    assert inc.run(_lots_in(sa_lots), "P1") == ProjectImportVerifier(_lots_in(sa_lots)).run()
+
+
+def test_cached_preview_same_shape_as_full():
+    project = {"id": 9, "project_code": "P1", "name": "Dự án"}
+    sa_lots = [_sa_lot(i, 100_000_000, 20_000_000 if i % 3 else 25_000_000) for i in range(12)]
+    full = build_existing_project_preview(project, sa_lots)
+    cached = build_existing_project_preview_cached(project, sa_lots, cache_key=("T", 9))
+    assert cached == full
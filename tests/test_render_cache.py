@@ -0,0 +1,98 @@
+"""Unit tests — cache HTML/PDF tài liệu đã render."""
+from __future__ import annotations
+
+import asyncio
+import os
+
+from jinja2 import Environment, FileSystemLoader
+
+from utils import render_cache as rc
+
+
+def test_html_pdf_cache_and_invalidate(monkeypatch, tmp_path):
+    monkeypatch.setattr(rc, "RENDER_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(rc, "_total_bytes", None)
+    mtime = {"v": 1.0}
+    monkeypatch.setattr(rc, "_template_fingerprint", lambda _tpl: repr(mtime["v"]))
+    renders = []
+    pdfs = []
+
+    def render():
+        renders.append(1)
+        return "<p>hợp đồng</p>"
+
+    async def to_pdf(html):
+        pdfs.append(html)
+        return b"%PDF-" + html.encode()
+
+    async def run():
+        payload = {"fields": {"a": 1}}
+        assert await rc.cached_html(5, "x.html", payload, render) == "<p>hợp đồng</p>"
+        await rc.cached_html(5, "x.html", payload, render)
+        assert len(renders) == 1
+
+        await rc.cached_html(5, "x.html", {"fields": {"a": 2}}, render)
+        assert len(renders) == 2
+
+        mtime["v"] = 2.0  # sửa template -> key mới
+        await rc.cached_html(5, "x.html", payload, render)
+        assert len(renders) == 3
+
+        pdf = await rc.cached_pdf(5, "<p>x</p>", to_pdf)
+        assert await rc.cached_pdf(5, "<p>x</p>", to_pdf) == pdf
+        assert len(pdfs) == 1
+
+        rc.invalidate_rendered(5)
+        await rc.cached_pdf(5, "<p>x</p>", to_pdf)
+        assert len(pdfs) == 2
+
+    asyncio.run(run())
+
+
+def test_size_bound_evicts_least_recent(monkeypatch, tmp_path):
+    monkeypatch.setattr(rc, "RENDER_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(rc, "_total_bytes", None)
+    monkeypatch.setattr(rc, "RENDER_CACHE_MAX_MB", 2500 / (1024 * 1024))
+
+    async def to_pdf(html):
+        return b"x" * 1000
+
+    async def run():
+        for i in range(5):
+            await rc.cached_pdf(i, f"doc-{i}", to_pdf)
+
+    asyncio.run(run())
+    total = sum(p.stat().st_size for p in tmp_path.rglob("*.pdf"))
+    assert total <= 2500
+    assert (tmp_path / "4").exists()
+
+
+def test_fingerprint_tracks_included_and_extended_templates(tmp_path):
+    (tmp_path / "base.html").write_text("<body>{% block b %}{% endblock %}</body>")
+    (tmp_path / "part.html").write_text("<p>partial</p>")
+    (tmp_path / "doc.html").write_text(
+        '{% extends "base.html" %}{% block b %}{% include "part.html" %}{% endblock %}'
+    )
+    env = Environment(loader=FileSystemLoader(str(tmp_path)))
+
+    def bump(name, t):
+        os.utime(tmp_path / name, (t, t))
+
+    for name in ("base.html", "part.html", "doc.html"):
+        bump(name, 1000)
+    fp = rc._template_fingerprint("doc.html", env)
+    assert rc._template_fingerprint("doc.html", env) == fp
+
+    bump("part.html", 2000)
+    fp2 = rc._template_fingerprint("doc.html", env)
+    assert fp2 != fp
+
+    bump("base.html", 3000)
+    assert rc._template_fingerprint("doc.html", env) != fp2
+
+    # include tên động -> theo mtime mới nhất của cả thư mục
+    (tmp_path / "dyn.html").write_text("{% include name %}")
+    bump("dyn.html", 1000)
+    fp3 = rc._template_fingerprint("dyn.html", env)
+    bump("part.html", 4000)
+    assert rc._template_fingerprint("dyn.html", env) != fp3
@@ -0,0 +1,99 @@
+"""Unit tests — memo dataset diễn biến phiên (services.session_progress)."""
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import routers.auction_documents_print as adp
+from services import session_progress as sp
+from utils.auth import verified_cache_scope
+
+
+def _patch_a(monkeypatch, session, results, builds):
+    async def fake_fetch(token, session_id):
+        return 200, {"data": dict(session)}
+
+    async def fake_results(token, session_id):
+        return 200, {"data": [dict(r) for r in results]}
+
+    async def fake_build(token, session_id, *, session_js=None, results_js=None):
+        builds.append(session_id)
+        await asyncio.sleep(0.01)
+        return {"session_id": session_id, "session": session_js[1]["data"], "results": results_js[1], "error": None}
+
+    monkeypatch.setattr(adp, "fetch_session_for_print", fake_fetch)
+    monkeypatch.setattr(adp, "fetch_session_results_for_print", fake_results)
+    monkeypatch.setattr(adp, "build_session_progress_data", fake_build)
+
+
+def test_memo_by_revision_dedupe_and_invalidate(monkeypatch):
+    sp.invalidate_session_progress()
+    session = {"id": 7, "status": "RUNNING", "current_round_no": 1}
+    results = [{"lot_id": 1, "winner_name": ""}]
+    builds = []
+    _patch_a(monkeypatch, session, results, builds)
+
+    async def run():
+        get = lambda: sp.get_session_progress("t", 7, scope="ABC")  # noqa: E731
+        a, b = await asyncio.gather(get(), get())
+        assert a is b
+        assert len(builds) == 1
+
+        await get()
+        assert len(builds) == 1
+
+        session["current_round_no"] = 2
+        out = await get()
+        assert out["session"]["current_round_no"] == 2
+        assert len(builds) == 2
+
+        # kết quả ghi ngoài Web B (worker khác / thẳng lên A) -> revision đổi
+        results[0]["winner_name"] = "Nguyễn Văn A"
+        await get()
+        assert len(builds) == 3
+
+        assert sp.invalidate_session_progress_for_path("/api/v1/auction-results/projects/3/lots/A1") == 0
+        await get()
+        assert len(builds) == 3
+
+        sp.invalidate_session_progress_for_path("/api/v1/auction-sessions/sessions/7/rounds/2/close")
+        await get()
+        assert len(builds) == 4
+
+    asyncio.run(run())
+
+
+def test_unverified_scope_never_served_from_cache(monkeypatch):
+    sp.invalidate_session_progress()
+    builds = []
+    _patch_a(monkeypatch, {"id": 8, "status": "RUNNING"}, [], builds)
+
+    async def run():
+        await sp.get_session_progress("t", 8, scope="ABC")
+        await sp.get_session_progress("forged", 8, scope=None)
+        await sp.get_session_progress("forged", 8, scope=None)
+        assert len(builds) == 3
+
+    asyncio.run(run())
+
+
+def test_verified_cache_scope_requires_verified_cookie():
+    def req(me, cookie):
+        return SimpleNamespace(state=SimpleNamespace(auth_me=me), cookies={"access_token": cookie} if cookie else {})
+
+    me = {"user": {"id": 5, "company_code": "abc"}}
+    assert verified_cache_scope(req(me, "tok"), "tok") == "ABC"
+    assert verified_cache_scope(req(me, "tok"), "tok", per_user=True) == "ABC:5"
+    # Bearer header khác cookie đã verify -> không có scope
+    assert verified_cache_scope(req(me, "tok"), "other") is None
+    assert verified_cache_scope(req(None, "tok"), "tok") is None
+    assert verified_cache_scope(req({"id": 5}, "tok"), "tok") is None
+
+
+def test_invalidate_scope_matches_writer_scope():
+    from utils.auth import me_cache_scope
+
+    # công ty lồng trong user / tên companyCode: bên xoá phải ra đúng scope bên ghi
+    for me in ({"user": {"id": 5, "companyCode": "abc"}}, {"companyCode": "abc", "company": "x"}):
+        r = SimpleNamespace(state=SimpleNamespace(auth_me=me), cookies={"access_token": "tok"})
+        assert me_cache_scope(me) == verified_cache_scope(r, "tok") == "ABC"
@@ -0,0 +1,49 @@
+"""Unit tests — snapshot dataset in cho phiên đã đóng."""
+from __future__ import annotations
+
+import asyncio
+
+from services import session_snapshot as snap
+
+
+def test_frozen_session_snapshot_roundtrip(monkeypatch, tmp_path):
+    monkeypatch.setattr(snap, "SESSION_SNAPSHOT_DIR", str(tmp_path))
+    calls = []
+
+    def builder(status):
+        async def _build():
+            calls.append(status)
+            return {"session": {"id": 9, "status": status}, "rows": [{"lot_code": "A1"}], "error": None}
+
+        return _build
+
+    async def run():
+        # phiên đang chạy: không đóng băng
+        await snap.snapshot_or_build("ABC", 9, "round_results_1", builder("OPEN"))
+        await snap.snapshot_or_build("ABC", 9, "round_results_1", builder("OPEN"))
+        assert len(calls) == 2
+
+        out = await snap.snapshot_or_build("ABC", 9, "round_results_1", builder("CLOSED"))
+        again = await snap.snapshot_or_build("ABC", 9, "round_results_1", builder("CLOSED"))
+        assert len(calls) == 3
+        assert again == out
+
+        # công ty khác không đọc được snapshot
+        await snap.snapshot_or_build("XYZ", 9, "round_results_1", builder("CLOSED"))
+        assert len(calls) == 4
+
+        # không có phạm vi đã verify -> không đọc/ghi snapshot
+        await snap.snapshot_or_build(None, 9, "round_results_1", builder("CLOSED"))
+        await snap.snapshot_or_build(None, 9, "round_results_1", builder("CLOSED"))
+        assert len(calls) == 6
+
+        # xoá theo công ty không đụng công ty khác
+        assert snap.invalidate_session_snapshots(9, scope="XYZ") == 1
+        await snap.snapshot_or_build("ABC", 9, "round_results_1", builder("CLOSED"))
+        assert len(calls) == 6
+
+        assert snap.invalidate_session_snapshots(9) == 1
+        await snap.snapshot_or_build("ABC", 9, "round_results_1", builder("CLOSED"))
+        assert len(calls) == 7
+
+    asyncio.run(run())
@@ -0,0 +1,52 @@
+"""Startup budget — `import main` không kéo thư viện nặng và nằm trong ngân sách thời gian."""
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Ngân sách cumulative của `main` theo `python -X importtime` (µs → ms), chỉnh bằng env khi CI chậm.
+IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "4000"))
+
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "xhtml2pdf", "reportlab", "qrcode", "PIL")
+
+
+def _run(code: str, **env: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        env={**os.environ, **env},
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+
+def _main_cumulative_ms(stderr: str) -> float:
+    for line in reversed(stderr.splitlines()):
+        m = re.match(r"import time:\s+\d+ \|\s+(\d+) \| main$", line)
+        if m:
+            return int(m.group(1)) / 1000.0
+    raise AssertionError("không thấy dòng importtime của main")
+
+
+@pytest.mark.parametrize("lazy", ["0", "1"])
+def test_import_main_skips_heavy_libraries(lazy):
+    probe = "import sys, main; print(','.join(m for m in %r if m in sys.modules))" % (HEAVY_MODULES,)
+    r = _run(probe, LAZY_ROUTERS=lazy)
+    assert r.returncode == 0, r.stderr[-2000:]
+    assert r.stdout.strip() == ""
+
+
+def test_import_main_within_budget():
+    r = _run("import main")
+    assert r.returncode == 0, r.stderr[-2000:]
+    assert _main_cumulative_ms(r.stderr) < IMPORT_BUDGET_MS
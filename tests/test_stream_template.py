@@ -0,0 +1,15 @@
+"""Unit tests — stream trang in lớn theo khối."""
+from __future__ import annotations
+
+from jinja2 import Environment
+
+from utils.templates import _iter_template_chunks
+
+
+def test_iter_template_chunks_bounded_and_complete():
+    tpl = Environment().from_string("{% for i in rows %}<tr><td>{{ i }} ế</td></tr>{% endfor %}")
+    rows = list(range(5000))
+    chunks = list(_iter_template_chunks(tpl, {"rows": rows}, 4096))
+    assert len(chunks) > 10
+    assert all(len(c.decode("utf-8")) < 4096 + 64 for c in chunks)
+    assert b"".join(chunks).decode("utf-8") == tpl.render(rows=rows)
@@ -0,0 +1,29 @@
+"""Unit tests — bảng resolve mẫu giấy tờ theo công ty."""
+from __future__ import annotations
+
+import os
+
+from utils.document_templates import registry as reg
+
+
+def test_resolve_memoized_and_rebuilt_when_dir_changes(tmp_path, monkeypatch):
+    docs = tmp_path / "pages" / "documents"
+    (docs / "default").mkdir(parents=True)
+    (docs / "acme").mkdir()
+    monkeypatch.setattr(reg, "_TEMPLATES_ROOT", str(tmp_path))
+    monkeypatch.setattr(reg, "TEMPLATE_RESOLVE_CHECK_SECONDS", 0)
+    reg.invalidate_template_resolution()
+
+    calls = []
+    real = reg._resolve_uncached
+    monkeypatch.setattr(reg, "_resolve_uncached", lambda cc, k: calls.append(cc) or real(cc, k))
+
+    assert reg.resolve_template("ACME", reg.DocKind.BID_SHEET) == "pages/documents/default/bid_sheet.html"
+    reg.resolve_template("acme", reg.DocKind.BID_SHEET)
+    assert calls == ["acme"]
+
+    (docs / "acme" / "bid_sheet.html").write_text("x")
+    st = os.stat(docs / "acme")
+    os.utime(docs / "acme", ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert reg.resolve_template("acme", reg.DocKind.BID_SHEET) == "pages/documents/acme/bid_sheet.html"
+    reg.invalidate_template_resolution()
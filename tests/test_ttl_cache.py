@@ -0,0 +1,38 @@
+"""Unit tests — TTLCache (cache in-process cho blob Service A)."""
+from __future__ import annotations
+
+import time
+
+from utils.ttl_cache import TTLCache
+
+
+def test_get_set_and_expiry():
+    c = TTLCache(ttl_seconds=0.05)
+    c.set("k", {"a": 1})
+    assert c.get("k") == {"a": 1}
+    time.sleep(0.06)
+    assert c.get("k") is None
+
+
+def test_lru_bound():
+    c = TTLCache(ttl_seconds=60, maxsize=2)
+    c.set(1, "a")
+    c.set(2, "b")
+    c.get(1)
+    c.set(3, "c")
+    assert c.get(2) is None
+    assert c.get(1) == "a"
+    assert c.get(3) == "c"
+
+
+def test_invalidate_where_and_disabled():
+    c = TTLCache(ttl_seconds=60)
+    c.set(("C1", 1), "x")
+    c.set(("C2", 1), "y")
+    c.set(("C1", 2), "z")
+    assert c.invalidate_where(lambda k: k[1] == 1) == 2
+    assert len(c) == 1
+
+    off = TTLCache(ttl_seconds=0)
+    off.set("k", "v")
+    assert off.get("k") is None
@@ -0,0 +1,78 @@
+"""Unit tests — xuất ZIP stream tài liệu hàng loạt."""
+from __future__ import annotations
+
+import asyncio
+import io
+import zipfile
+
+from utils import zip_stream as zs
+
+
+def test_stream_zip_order_independent_and_errors(monkeypatch):
+    async def fake_render(job, as_pdf):
+        await asyncio.sleep(0.001 * (int(job.name[1:]) % 5))
+        if job.name == "L7":
+            raise RuntimeError("boom")
+        return f"<p>{job.context['i']}</p>".encode()
+
+    monkeypatch.setattr(zs, "_render_one", fake_render)
+    jobs = [zs.DocumentJob(name=f"L{i}", template="x.html", context={"i": i}) for i in range(40)]
+    jobs.append(zs.DocumentJob(name="L1", template="x.html", context={"i": "dup"}))
+
+    async def run():
+        buf = io.BytesIO()
+        async for chunk in zs.stream_documents_zip(jobs, concurrency=3):
+            buf.write(chunk)
+        return buf
+
+    z = zipfile.ZipFile(asyncio.run(run()))
+    names = set(z.namelist())
+    assert len(names) == 41  # 39 ok + bản trùng tên + _loi.txt
+    assert "L7.html" not in names and "L1-2.html" in names
+    assert b"L7" in z.read("_loi.txt")
+    assert z.testzip() is None
+
+
+def test_safe_filename_strips_vietnamese():
+    assert zs.safe_filename("L-01", "Nguyễn Văn Đức") == "L-01_Nguyen-Van-Duc"
+
+
+def test_winner_export_groups_by_customer_id(monkeypatch):
+    from routers import auction_session_winner_prints as wp
+
+    data = {
+        "session": {"id": 9},
+        "items": [
+            {"customer_id": 1, "customer": {"id": 1, "full_name": "Nguyễn A"}, "lot_code": "L1"},
+            {"customer_id": 2, "customer": {"id": 2, "full_name": "Nguyễn A"}, "lot_code": "L2"},
+            {"customer_id": 1, "customer": {"id": 1, "full_name": "Nguyễn A"}, "lot_code": "L3"},
+            {"customer": {"full_name": "Không id"}, "lot_code": "L4"},
+        ],
+    }
+    captured = []
+
+    async def fake_get(request, path, params=None):
+        return data
+
+    async def fake_tpl(request, data):
+        return "x.html"
+
+    async def fake_stream(jobs, as_pdf=False):
+        captured.extend(jobs)
+        yield b""
+
+    monkeypatch.setattr(wp, "_svc_get", fake_get)
+    monkeypatch.setattr(wp, "_winner_confirm_template", fake_tpl)
+    monkeypatch.setattr(wp, "stream_documents_zip", fake_stream)
+
+    async def run():
+        resp = await wp.export_session_winner_confirms_zip(None, session_id=9, format="html")
+        async for _ in resp.body_iterator:
+            pass
+
+    asyncio.run(run())
+    lots = sorted([i["lot_code"] for i in j.context["items"]] for j in captured)
+    assert lots == [["L1", "L3"], ["L2"]]
+    for j in captured:
+        raw = j.context["raw"]
+        assert raw["items"] == j.context["items"] and raw["customer"] == j.context["customer"]
@@ -1,5 +1,6 @@
 # utils/auth.py
 import base64
+import hashlib
 import json
 import os
 from typing import Any, Dict, Optional
@@ -68,6 +69,64 @@ def _jwt_payload_unverified(token: str) -> Dict[str, Any]:
         return {}
 
 
+def token_cache_scope(token: Optional[str]) -> str:
+    """
+    Scope cho cache dữ liệu Service A theo tenant: company_code trong JWT,
+    fallback hash token (không lộ dữ liệu giữa công ty/người dùng).
+    """
+    payload = _jwt_payload_unverified(token or "")
+    cc = str(payload.get("company_code") or payload.get("companyCode") or "").strip()
+    if cc:
+        return cc.upper()
+    return "t:" + hashlib.sha1((token or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _me_field(me: Dict[str, Any], *names: str) -> str:
+    """Field đầu tiên có giá trị trong /auth/me (gốc, me.user, me.profile)."""
+    nested = me.get("user") if isinstance(me.get("user"), dict) else {}
+    profile = me.get("profile") if isinstance(me.get("profile"), dict) else {}
+    for src in (me, nested, profile):
+        for name in names:
+            v = src.get(name)
+            if v is not None and str(v).strip():
+                return str(v).strip()
+    return ""
+
+
+def verified_cache_scope(request, token: Optional[str] = None, *, per_user: bool = False) -> Optional[str]:
+    """
+    Scope cache theo danh tính ĐÃ VERIFY — dùng cho cache trả dữ liệu trước khi gọi Service A
+    (token_cache_scope chỉ đọc JWT, không verify chữ ký: giả company_code là đọc được cache công ty khác).
+
+    - Lấy từ request.state.auth_me (auth_guard gọi /auth/me bằng cookie access_token).
+    - token (nếu truyền) phải đúng là cookie đã verify; header Bearer khác cookie -> None.
+    - per_user=True: thêm user (dữ liệu phụ thuộc quyền từng người).
+    - Không xác định được -> None: caller bỏ qua cache, gọi A bằng token của request.
+    """
+    me = getattr(getattr(request, "state", None), "auth_me", None)
+    if not isinstance(me, dict) or not me:
+        return None
+    if token is not None:
+        # auth_guard chỉ verify cookie ACCESS_COOKIE_NAME
+        cookie = request.cookies.get(ACCESS_COOKIE_ENV)
+        if not cookie or cookie != token:
+            return None
+    return me_cache_scope(me, per_user=per_user)
+
+
+def me_cache_scope(me: Optional[Dict[str, Any]], *, per_user: bool = False) -> Optional[str]:
+    """Scope từ 1 payload /auth/me đã verify — cùng cách đọc với verified_cache_scope."""
+    if not isinstance(me, dict) or not me:
+        return None
+    cc = _me_field(me, "company_code", "companyCode", "company").upper()
+    if not cc:
+        return None
+    if not per_user:
+        return cc
+    user = _me_field(me, "id", "user_id", "username", "sub")
+    return f"{cc}:{user}" if user else None
+
+
 def set_ui_profile_cookies(
     resp,
     *,
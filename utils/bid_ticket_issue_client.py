@@ -1,8 +1,10 @@
 # utils/bid_ticket_issue_client.py
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
+import re
 from typing import Any, Dict, List, Optional, Tuple
 
 import httpx
@@ -10,13 +12,33 @@ import httpx
 logger = logging.getLogger(__name__)
 
 from utils.bid_sheet_print import normalize_tickets_for_print
-from utils.bid_ticket_qr import qr_png_data_uri
+from utils.auth import token_cache_scope
+from utils.bid_ticket_qr import qr_batch
+from utils.ttl_cache import TTLCache
 
 SERVICE_A_BASE_URL = os.getenv("SERVICE_A_BASE_URL", "http://127.0.0.1:8824")
 
 # Service A bulk issue giới hạn 500 item/request — chunk để in tới ~10k phiếu.
 BULK_ISSUE_CHUNK_SIZE = max(1, min(500, int(os.getenv("BID_TICKET_ISSUE_CHUNK_SIZE", "500"))))
 BULK_ISSUE_CHUNK_TIMEOUT = float(os.getenv("BID_TICKET_ISSUE_CHUNK_TIMEOUT", "90"))
+# số chunk gửi song song tới Service A (1 = tuần tự như trước)
+BULK_ISSUE_CONCURRENCY = max(1, int(os.getenv("BID_TICKET_ISSUE_CONCURRENCY", "4")))
+# svg (mặc định): <svg> vector inline ~1-2 KB/phiếu -> in cả dự án ~10k phiếu không ra trang
+# HTML hàng trăm MB | png: <img src=data URI> base64 (dự phòng cho template cũ chỉ đọc qr_data_uri)
+BID_TICKET_QR_FORMAT = (os.getenv("BID_TICKET_QR_FORMAT", "svg").strip().lower() or "svg")
+if BID_TICKET_QR_FORMAT not in ("png", "svg"):
+    BID_TICKET_QR_FORMAT = "png"
+
+# In lại (kẹt máy in, in bổ sung) trong khoảng TTL: dùng lại token + ảnh QR đã phát hành,
+# chỉ gửi Service A những phiếu chưa có.
+# Cache nằm trong từng worker: invalidate_issued_tokens chỉ xoá ở worker nhận request sửa
+# (huỷ khách, gán lại lô...). Worker khác vẫn có thể in token cũ tới khi hết TTL -> giữ TTL
+# ngắn (đủ cho 1 đợt in lại liền tay), không dùng làm nguồn đúng cho dữ liệu đã đổi.
+BID_TICKET_ISSUED_CACHE_TTL = float(os.getenv("BID_TICKET_ISSUED_CACHE_TTL", "120"))
+_issued_index = TTLCache(
+    ttl_seconds=BID_TICKET_ISSUED_CACHE_TTL,
+    maxsize=int(os.getenv("BID_TICKET_ISSUED_CACHE_SIZE", "50000")),
+)
 
 
 def _issue_source_for_print_ctx(print_ctx: Optional[Dict[str, Any]]) -> str:
@@ -87,6 +109,58 @@ def _build_issue_items(
     return items, ticket_indices
 
 
+def _issued_key(scope: str, company_code: Optional[str], item: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (
+        scope,
+        (company_code or "").upper(),
+        item["project_id"],
+        item["lot_id"],
+        item["customer_id"],
+        item["session_id"],
+        item["round_lot_id"],
+        item["source"],
+    )
+
+
+def invalidate_issued_tokens(
+    project_id: Optional[int] = None,
+    *,
+    customer_id: Optional[int] = None,
+    session_id: Optional[int] = None,
+    round_lot_id: Optional[int] = None,
+) -> int:
+    """
+    Quên token đã phát hành khớp mọi điều kiện truyền vào (không truyền gì = tất cả) —
+    lần in sau phát hành lại. Gọi sau khi huỷ/loại khách, gán lại lô, sửa phiên/vòng.
+    Chỉ xoá cache của worker hiện tại; worker khác tự hết hạn sau BID_TICKET_ISSUED_CACHE_TTL.
+    """
+    conds = [
+        (i, int(v))
+        for i, v in ((2, project_id), (4, customer_id), (5, session_id), (6, round_lot_id))
+        if v is not None
+    ]
+    if not conds:
+        n = len(_issued_index)
+        _issued_index.clear()
+        return n
+    return _issued_index.invalidate_where(lambda k: all(k[i] == v for i, v in conds))
+
+
+_SESSION_PATH_RE = re.compile(r"/sessions/(\d+)(?:/|$)")
+_ROUND_LOT_PATH_RE = re.compile(r"/round-lots/(\d+)(?:/|$)")
+
+
+def invalidate_issued_tokens_for_path(path: str) -> int:
+    """Ghi lên .../sessions/{id}/... hoặc .../round-lots/{id}/... -> quên token của phiên / vòng-lô đó."""
+    m = _SESSION_PATH_RE.search(path or "")
+    if m:
+        return invalidate_issued_tokens(session_id=int(m.group(1)))
+    m = _ROUND_LOT_PATH_RE.search(path or "")
+    if m:
+        return invalidate_issued_tokens(round_lot_id=int(m.group(1)))
+    return 0
+
+
 async def _bulk_issue_one_chunk(
     client: httpx.AsyncClient,
     *,
@@ -138,8 +212,13 @@ async def attach_qr_to_tickets(
     default_session_id: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
     """
-    Gọi Service A bulk issue; gắn qr_token + qr_data_uri vào từng ticket (in-place copy).
-    Tự chunk 500 item/lần (giới hạn API A) — hỗ trợ in tới ~10k phiếu.
+    Gọi Service A bulk issue; gắn qr_token + qr_svg (hoặc qr_data_uri khi
+    BID_TICKET_QR_FORMAT=png) vào từng ticket (in-place copy).
+    Tự chunk 500 item/lần (giới hạn API A) — hỗ trợ in tới ~10k phiếu; tối đa
+    BID_TICKET_ISSUE_CONCURRENCY chunk chạy song song, QR của chunk nào về trước
+    thì encode trước. Kết quả vẫn theo đúng thứ tự ticket.
+    Phiếu đã phát hành trong BID_TICKET_ISSUED_CACHE_TTL (cùng dự án/lô/khách/phiên/
+    vòng-lô/nguồn) dùng lại token + QR cũ, không gọi lại Service A.
     """
     if not tickets:
         return tickets
@@ -160,60 +239,100 @@ async def attach_qr_to_tickets(
     headers = {"Authorization": f"Bearer {access_token}"}
     company_code = _company_code_for_issue(tickets, print_ctx)
 
-    issued_by_ticket_idx: Dict[int, Dict[str, Any]] = {}
-    chunk_total = (len(items) + BULK_ISSUE_CHUNK_SIZE - 1) // BULK_ISSUE_CHUNK_SIZE
+    tokens: List[Optional[str]] = [None] * len(tickets)
+    qr_values: List[Optional[str]] = [None] * len(tickets)
+    qr_field = "qr_svg" if BID_TICKET_QR_FORMAT == "svg" else "qr_data_uri"
+
+    scope = token_cache_scope(access_token)
+    keys = [_issued_key(scope, company_code, it) for it in items]
+    reused = 0
+    pending: List[int] = []
+    for pos, (key, ticket_idx) in enumerate(zip(keys, ticket_indices)):
+        hit = _issued_index.get(key)
+        if hit is not None:
+            tokens[ticket_idx], qr_values[ticket_idx] = hit
+            reused += 1
+        else:
+            pending.append(pos)
+    items = [items[p] for p in pending]
+    ticket_indices = [ticket_indices[p] for p in pending]
+    keys = [keys[p] for p in pending]
 
-    try:
-        async with httpx.AsyncClient(
-            base_url=SERVICE_A_BASE_URL,
-            timeout=BULK_ISSUE_CHUNK_TIMEOUT,
-        ) as client:
-            for chunk_no, start in enumerate(range(0, len(items), BULK_ISSUE_CHUNK_SIZE), start=1):
-                chunk_items = items[start : start + BULK_ISSUE_CHUNK_SIZE]
-                chunk_ticket_indices = ticket_indices[start : start + BULK_ISSUE_CHUNK_SIZE]
-
-                try:
-                    issued_list = await _bulk_issue_one_chunk(
-                        client,
-                        headers=headers,
-                        items=chunk_items,
-                        company_code=company_code,
-                        chunk_no=chunk_no,
-                        chunk_total=chunk_total,
-                    )
-                except Exception as exc:
-                    logger.exception(
-                        "bid_ticket issue bulk chunk %s/%s error: %s",
-                        chunk_no,
-                        chunk_total,
-                        exc,
-                    )
-                    continue
-
-                for i, ticket_idx in enumerate(chunk_ticket_indices):
-                    if i < len(issued_list):
-                        issued_by_ticket_idx[ticket_idx] = issued_list[i]
-    except Exception as exc:
-        logger.exception("bid_ticket issue bulk client error: %s", exc)
-        return tickets
+    chunk_total = (len(items) + BULK_ISSUE_CHUNK_SIZE - 1) // BULK_ISSUE_CHUNK_SIZE
+    window = asyncio.Semaphore(BULK_ISSUE_CONCURRENCY)
+
+    async def run_chunk(client: httpx.AsyncClient, chunk_no: int, start: int) -> None:
+        chunk_items = items[start : start + BULK_ISSUE_CHUNK_SIZE]
+        chunk_ticket_indices = ticket_indices[start : start + BULK_ISSUE_CHUNK_SIZE]
+        chunk_keys = keys[start : start + BULK_ISSUE_CHUNK_SIZE]
+
+        async with window:
+            try:
+                issued_list = await _bulk_issue_one_chunk(
+                    client,
+                    headers=headers,
+                    items=chunk_items,
+                    company_code=company_code,
+                    chunk_no=chunk_no,
+                    chunk_total=chunk_total,
+                )
+            except Exception as exc:
+                logger.exception(
+                    "bid_ticket issue bulk chunk %s/%s error: %s",
+                    chunk_no,
+                    chunk_total,
+                    exc,
+                )
+                return
+
+        # encode QR của chunk này ngoài window — chunk sau đã được gửi đi trong lúc encode
+        chunk_tokens: List[Optional[str]] = []
+        for i in range(len(chunk_ticket_indices)):
+            iss = issued_list[i] if i < len(issued_list) else {}
+            token = (iss or {}).get("qr_token") or (iss or {}).get("jti")
+            chunk_tokens.append(str(token) if token else None)
+        try:
+            chunk_qr = await qr_batch(chunk_tokens, fmt=BID_TICKET_QR_FORMAT)
+        except Exception as exc:
+            logger.exception("bid_ticket QR encode chunk %s/%s error: %s", chunk_no, chunk_total, exc)
+            chunk_qr = [None] * len(chunk_tokens)
+        for ticket_idx, key, token, qr_value in zip(chunk_ticket_indices, chunk_keys, chunk_tokens, chunk_qr):
+            tokens[ticket_idx] = token
+            qr_values[ticket_idx] = qr_value
+            if token and qr_value:
+                _issued_index.set(key, (token, qr_value))
+
+    if items:
+        try:
+            async with httpx.AsyncClient(
+                base_url=SERVICE_A_BASE_URL,
+                timeout=BULK_ISSUE_CHUNK_TIMEOUT,
+                limits=httpx.Limits(max_connections=BULK_ISSUE_CONCURRENCY),
+            ) as client:
+                await asyncio.gather(
+                    *[
+                        run_chunk(client, chunk_no, start)
+                        for chunk_no, start in enumerate(range(0, len(items), BULK_ISSUE_CHUNK_SIZE), start=1)
+                    ]
+                )
+        except Exception as exc:
+            logger.exception("bid_ticket issue bulk client error: %s", exc)
 
     out: List[Dict[str, Any]] = []
-    for idx, t in enumerate(tickets):
+    for t, token, qr_value in zip(tickets, tokens, qr_values):
         t2 = dict(t)
-        iss = issued_by_ticket_idx.get(idx)
-        if iss:
-            token = iss.get("qr_token") or iss.get("jti")
-            if token:
-                t2["qr_token"] = token
-                t2["qr_data_uri"] = qr_png_data_uri(str(token))
+        if token:
+            t2["qr_token"] = token
+            t2[qr_field] = qr_value
         out.append(t2)
 
-    if chunk_total > 1:
-        qr_count = sum(1 for x in out if x.get("qr_data_uri"))
+    if chunk_total > 1 or reused:
+        qr_count = sum(1 for x in out if x.get(qr_field))
         logger.info(
-            "bid_ticket QR attach: tickets=%s issued=%s chunks=%s",
+            "bid_ticket QR attach: tickets=%s issued=%s reused=%s chunks=%s",
             len(tickets),
             qr_count,
+            reused,
             chunk_total,
         )
 
@@ -1,40 +1,236 @@
 # utils/bid_ticket_qr.py
+"""
+QR in trên phiếu / đơn.
+
+- qr_png_data_uri / qr_svg: 1 mã, có LRU cache theo (định dạng, token, box_size).
+- qr_batch: nhiều mã (in cả dự án ~10k phiếu) — mã đã cache trả ngay, phần còn lại
+  encode trong process pool (QR_POOL_WORKERS, 0 = thread) để không chặn event loop.
+  Pool hỏng (worker chết) -> bỏ, lô sau tạo pool mới; stop_qr_pool() khi shutdown.
+- Định dạng "svg": 1 <path> vector inline (không PIL, không base64), nét ở mọi cỡ in.
+"""
 from __future__ import annotations
 
+import asyncio
 import base64
 import io
-from typing import Optional
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Sequence
 
-try:
-    import qrcode
-    from qrcode.constants import ERROR_CORRECT_M
-except ImportError:  # pragma: no cover
-    qrcode = None
-    ERROR_CORRECT_M = None
+from utils.ttl_cache import TTLCache
 
+logger = logging.getLogger(__name__)
 
-def qr_png_data_uri(token: str, box_size: int = 7) -> Optional[str]:
-    """
-    Sinh data URI PNG cho QR in trên phiếu.
-    box_size=7: đủ sắc nét khi in ~34mm.
-    """
-    text = (token or "").strip()
-    if not text:
-        return None
+QR_CACHE_SIZE = max(1, int(os.getenv("QR_CACHE_SIZE", "20000")))
+QR_CACHE_TTL = float(os.getenv("QR_CACHE_TTL", "21600"))
+QR_POOL_WORKERS = max(0, int(os.getenv("QR_POOL_WORKERS", "2")))
+# batch nhỏ hơn ngưỡng này encode trong thread (tránh chi phí IPC)
+QR_POOL_MIN_BATCH = max(1, int(os.getenv("QR_POOL_MIN_BATCH", "64")))
+QR_POOL_CHUNK = max(1, int(os.getenv("QR_POOL_CHUNK", "250")))
+
+_qr_cache = TTLCache(ttl_seconds=QR_CACHE_TTL, maxsize=QR_CACHE_SIZE)
+_qr_pool: Optional[ProcessPoolExecutor] = None
+
+_qrcode_mod = None
+_qrcode_checked = False
+
+
+def _qrcode():
+    """Import qrcode (+PIL) lần đầu cần dùng — không kéo vào lúc khởi động worker."""
+    global _qrcode_mod, _qrcode_checked
+    if not _qrcode_checked:
+        try:
+            import qrcode
+            import qrcode.constants
+        except ImportError:  # pragma: no cover
+            qrcode = None
+        _qrcode_mod = qrcode
+        _qrcode_checked = True
+    return _qrcode_mod
+
+
+def _make_qr(text: str, box_size: int):
+    qrcode = _qrcode()
     if qrcode is None:
         return None
-
     qr = qrcode.QRCode(
         version=None,
-        error_correction=ERROR_CORRECT_M,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
         box_size=box_size,
         border=2,
     )
     qr.add_data(text)
     qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
+    return qr
+
 
+def _encode_png(text: str, box_size: int) -> Optional[str]:
+    qr = _make_qr(text, box_size)
+    if qr is None:
+        return None
+    img = qr.make_image(fill_color="black", back_color="white")
     buf = io.BytesIO()
     img.save(buf, format="PNG")
     b64 = base64.b64encode(buf.getvalue()).decode("ascii")
     return f"data:image/png;base64,{b64}"
+
+
+def _encode_svg(text: str, box_size: int) -> Optional[str]:
+    """
+    SVG 1 path: mỗi đoạn module đen liên tiếp trên 1 hàng là 1 nét ngang (toạ độ tương đối).
+    width/height = n * box_size px để giữ đúng cỡ như PNG cùng box_size.
+    """
+    qr = _make_qr(text, box_size)
+    if qr is None:
+        return None
+    matrix = qr.get_matrix()
+    n = len(matrix)
+    parts: List[str] = []
+    cx = cy = 0
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < n:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < n and row[x]:
+                x += 1
+            parts.append(f"m{start - cx} {y - cy}h{x - start}")
+            cx, cy = x, y
+    px = n * box_size
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{px}" height="{px}" '
+        f'viewBox="0 0 {n} {n}" shape-rendering="crispEdges">'
+        f'<rect width="{n}" height="{n}" fill="#fff"/>'
+        f'<path stroke="#000" d="M0 .5{"".join(parts)}"/></svg>'
+    )
+
+
+_ENCODERS = {"png": _encode_png, "svg": _encode_svg}
+
+
+def _encode_many(texts: Sequence[str], box_size: int, fmt: str) -> List[Optional[str]]:
+    """Chạy trong process pool (hoặc thread) — encode 1 lô token."""
+    enc = _ENCODERS[fmt]
+    out: List[Optional[str]] = []
+    for t in texts:
+        try:
+            out.append(enc(t, box_size))
+        except Exception:
+            out.append(None)
+    return out
+
+
+def _cached(fmt: str, token: str, box_size: int) -> Optional[str]:
+    text = (token or "").strip()
+    if not text:
+        return None
+    key = (fmt, text, box_size)
+    hit = _qr_cache.get(key)
+    if hit is not None:
+        return hit
+    value = _ENCODERS[fmt](text, box_size)
+    if value is not None:
+        _qr_cache.set(key, value)
+    return value
+
+
+def qr_png_data_uri(token: str, box_size: int = 7) -> Optional[str]:
+    """
+    Sinh data URI PNG cho QR in trên phiếu.
+    box_size=7: đủ sắc nét khi in ~34mm.
+    """
+    return _cached("png", token, box_size)
+
+
+def qr_svg(token: str, box_size: int = 7) -> Optional[str]:
+    """Markup <svg> inline (vector) cho QR — dùng với |safe trong template."""
+    return _cached("svg", token, box_size)
+
+
+def _get_qr_pool() -> ProcessPoolExecutor:
+    global _qr_pool
+    if _qr_pool is None:
+        _qr_pool = ProcessPoolExecutor(
+            max_workers=QR_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _qr_pool
+
+
+def _reset_qr_pool(pool: ProcessPoolExecutor) -> None:
+    """Bỏ pool hỏng — lô sau tạo pool mới thay vì rơi về thread mãi."""
+    global _qr_pool
+    if _qr_pool is pool:
+        _qr_pool = None
+    try:
+        pool.shutdown(wait=False, cancel_futures=True)
+    except Exception:
+        pass
+
+
+def stop_qr_pool() -> None:
+    """Gọi khi app shutdown."""
+    global _qr_pool
+    pool, _qr_pool = _qr_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def qr_batch(
+    tokens: Sequence[Optional[str]],
+    *,
+    box_size: int = 7,
+    fmt: str = "png",
+) -> List[Optional[str]]:
+    """
+    Encode nhiều token, giữ thứ tự. Token trùng chỉ encode 1 lần; lỗi pool -> encode
+    trong thread (không bao giờ chặn event loop).
+    """
+    if fmt not in _ENCODERS:
+        raise ValueError(f"unsupported QR format: {fmt}")
+    texts = [(t or "").strip() for t in tokens]
+    out: List[Optional[str]] = [None] * len(texts)
+    missing: dict[str, List[int]] = {}
+    for i, text in enumerate(texts):
+        if not text:
+            continue
+        hit = _qr_cache.get((fmt, text, box_size))
+        if hit is not None:
+            out[i] = hit
+        else:
+            missing.setdefault(text, []).append(i)
+    if not missing:
+        return out
+
+    todo = list(missing)
+    loop = asyncio.get_running_loop()
+    chunks = [todo[i : i + QR_POOL_CHUNK] for i in range(0, len(todo), QR_POOL_CHUNK)]
+    use_pool = QR_POOL_WORKERS > 0 and len(todo) >= QR_POOL_MIN_BATCH
+    pool: Optional[ProcessPoolExecutor] = None
+    try:
+        if use_pool:
+            pool = _get_qr_pool()
+            results = await asyncio.gather(
+                *[loop.run_in_executor(pool, _encode_many, c, box_size, fmt) for c in chunks]
+            )
+        else:
+            results = [await asyncio.to_thread(_encode_many, c, box_size, fmt) for c in chunks]
+    except Exception as exc:
+        if pool is not None and isinstance(exc, BrokenProcessPool):
+            _reset_qr_pool(pool)
+        logger.warning("qr batch pool failed (%s) — fallback thread", exc)
+        results = [await asyncio.to_thread(_encode_many, c, box_size, fmt) for c in chunks]
+
+    for chunk, values in zip(chunks, results):
+        for text, value in zip(chunk, values):
+            if value is None:
+                continue
+            _qr_cache.set((fmt, text, box_size), value)
+            for i in missing[text]:
+                out[i] = value
+    return out
@@ -8,7 +8,12 @@ from zoneinfo import ZoneInfo
 
 from starlette.requests import Request
 
-from utils.docgen_contract_render import apply_lot_table, html_to_pdf_bytes, inject_preview_bridge
+from utils.docgen_contract_render import (
+    apply_lot_table,
+    html_to_pdf_bytes,
+    html_to_pdf_bytes_async,
+    inject_preview_bridge,
+)
 from utils.docgen_regulations_render import _amount_words_vnd
 from utils.templates import templates
 
@@ -288,6 +293,7 @@ __all__ = [
     "attachment_content_disposition",
     "download_filename",
     "html_to_pdf_bytes",
+    "html_to_pdf_bytes_async",
     "merge_fields_for_render",
     "render_auction_minutes_html",
 ]
@@ -3,12 +3,12 @@ from __future__ import annotations
 
 import json
 import re
-from io import BytesIO
 from typing import Any, Dict, Optional
 from urllib.parse import quote
 
 from starlette.requests import Request
 
+from utils.pdf_render_pool import render_pdf, render_pdf_sync
 from utils.docgen_service_fee_land import compute_land_service_fee, total_starting_from_lots
 from utils.templates import templates
 
@@ -317,17 +317,13 @@ async def render_contract_html(
 
 
 def html_to_pdf_bytes(html: str) -> bytes:
-    try:
-        from xhtml2pdf import pisa
-    except ImportError as exc:
-        raise RuntimeError("Thiếu thư viện xhtml2pdf. Chạy: pip install xhtml2pdf") from exc
+    """Render đồng bộ — chỉ dùng ngoài event loop (script, worker); handler dùng bản async."""
+    return render_pdf_sync(html)
 
-    buf = BytesIO()
-    result = pisa.CreatePDF(html, dest=buf, encoding="utf-8")
-    if result.err:
-        raise RuntimeError("Không tạo được file PDF")
-    return buf.getvalue()
 
+async def html_to_pdf_bytes_async(html: str) -> bytes:
+    """Render trong process pool (utils.pdf_render_pool), không chặn event loop."""
+    return await render_pdf(html)
 
 
 def download_filename(inst: Dict[str, Any], ext: str) -> str:
@@ -17,6 +17,7 @@ from utils.docgen_contract_render import (
     ctx_for_editor,
     download_filename as _download_filename,
     html_to_pdf_bytes,
+    html_to_pdf_bytes_async,
     inject_preview_bridge,
 )
 from utils.templates import templates
@@ -26,6 +27,7 @@ __all__ = [
     "ctx_for_editor",
     "download_filename",
     "html_to_pdf_bytes",
+    "html_to_pdf_bytes_async",
     "merge_ctx_values_for_render",
     "merge_fields_for_render",
     "render_regulations_html",
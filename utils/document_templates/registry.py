@@ -15,11 +15,16 @@ Resolve:
   1. COMPANY_TEMPLATES (hardcode path tường minh, nếu có)
   2. File tồn tại trong pages/documents/{company}/ → dùng tự động
   3. Fallback pages/documents/default/
+
+Kết quả resolve được nhớ theo (company_code, doc_kind); bảng tự xoá khi thư mục
+pages/documents (hoặc thư mục con của công ty) đổi mtime — thêm/xoá file mẫu không cần
+restart. Kiểm tra mtime tối đa 1 lần / TEMPLATE_RESOLVE_CHECK_SECONDS.
 """
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, Optional
+import time
+from typing import Any, Dict, Optional, Tuple
 
 # templates/ root (Service B)
 _TEMPLATES_ROOT = os.path.abspath(
@@ -28,6 +33,12 @@ _TEMPLATES_ROOT = os.path.abspath(
 
 _DOCUMENTS_ROOT = "pages/documents"
 
+TEMPLATE_RESOLVE_CHECK_SECONDS = float(os.getenv("TEMPLATE_RESOLVE_CHECK_SECONDS", "5"))
+
+_resolved: Dict[Tuple[str, str], str] = {}
+_resolved_stamp: Optional[Tuple[Any, ...]] = None
+_stamp_checked_at = 0.0
+
 
 class DocKind:
     REGISTRATION_NORMAL = "registration_normal"
@@ -132,11 +143,54 @@ def extract_company_code(
     return ""
 
 
+def _documents_stamp() -> Tuple[Any, ...]:
+    """mtime của pages/documents và từng thư mục con (đổi khi thêm/xoá/đổi tên file mẫu)."""
+    root = os.path.join(_TEMPLATES_ROOT, _DOCUMENTS_ROOT)
+    try:
+        entries = [("", os.stat(root).st_mtime_ns)]
+        with os.scandir(root) as it:
+            for e in it:
+                if e.is_dir():
+                    entries.append((e.name, e.stat().st_mtime_ns))
+    except OSError:
+        return ()
+    return tuple(sorted(entries))
+
+
+def _refresh_resolved_table() -> None:
+    global _resolved_stamp, _stamp_checked_at
+    now = time.monotonic()
+    if _resolved_stamp is not None and now - _stamp_checked_at < TEMPLATE_RESOLVE_CHECK_SECONDS:
+        return
+    _stamp_checked_at = now
+    stamp = _documents_stamp()
+    if stamp != _resolved_stamp:
+        _resolved.clear()
+        _resolved_stamp = stamp
+
+
+def invalidate_template_resolution() -> None:
+    """Xoá bảng resolve (vd. sau khi deploy thêm mẫu mà không muốn chờ chu kỳ kiểm tra)."""
+    global _resolved_stamp
+    _resolved.clear()
+    _resolved_stamp = None
+
+
 def resolve_template(company_code: Optional[str], doc_kind: str) -> str:
     if doc_kind not in TEMPLATE_FILES:
         raise ValueError(f"Unknown doc_kind: {doc_kind}")
 
     cc = (company_code or "").strip().lower()
+    _refresh_resolved_table()
+    key = (cc, doc_kind)
+    hit = _resolved.get(key)
+    if hit is None:
+        hit = _resolve_uncached(cc, doc_kind)
+        _resolved[key] = hit
+    return hit
+
+
+def _resolve_uncached(cc: str, doc_kind: str) -> str:
     if cc:
         explicit = (COMPANY_TEMPLATES.get(cc) or {}).get(doc_kind)
         if explicit:
@@ -9,7 +9,6 @@ from io import BytesIO
 from typing import Any, Dict, List, Optional, Tuple
 
 import httpx
-from openpyxl import load_workbook
 
 from utils.project_import_verifier import ProjectImportVerifier, is_strict_non_negative_integer
 
@@ -101,6 +100,8 @@ def _to_float(v: Any):
 
 def _read_sheets(file_bytes: bytes) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[str]]:
     """projects, lots, template_errors"""
+    from openpyxl import load_workbook
+
     try:
         wb = load_workbook(filename=BytesIO(file_bytes), data_only=True)
     except Exception:
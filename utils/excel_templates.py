@@ -1,18 +1,60 @@
 import io
-import pandas as pd
+import os
+import re
+import zipfile
 from datetime import datetime
-from fastapi.responses import StreamingResponse
-from openpyxl.styles import Alignment, Font, PatternFill, Border, Side, NamedStyle
-from openpyxl.utils import get_column_letter
-import httpx, os
+from xml.sax.saxutils import escape as _xml_escape
 
-SERVICE_A_BASE_URL = os.getenv("SERVICE_A_BASE_URL", "http://127.0.0.1:8824")
+import httpx
+from fastapi.responses import Response
 
+from utils.ttl_cache import TTLCache
 
-async def _next_project_code(access: str, company_code: str) -> str:
-    """
-    Trả về project_code dạng COMPANYCODEN (N>=1) nhỏ nhất chưa tồn tại.
-    """
+SERVICE_A_BASE_URL = os.getenv("SERVICE_A_BASE_URL", "http://127.0.0.1:8824")
+
+# Index project_code theo công ty (TTL ngắn; xoá khi tạo/import dự án).
+PROJECT_CODE_INDEX_TTL = float(os.getenv("PROJECT_CODE_INDEX_TTL", "60"))
+_project_code_index = TTLCache(ttl_seconds=PROJECT_CODE_INDEX_TTL, maxsize=256)
+
+# Chuỗi giữ chỗ trong skeleton — thay bằng project_code thật ở mỗi request.
+_PROJECT_CODE_PLACEHOLDER = "__PROJECT_CODE_SAMPLE__"
+_template_skeleton: bytes | None = None
+_template_patch_entries: frozenset[str] = frozenset()
+
+# ---- Cấu trúc cột
+PROJ_COLS = ["project_code", "name", "description", "location"]
+LOT_COLS = [
+    "project_code",
+    "lot_code",
+    "name",
+    "description",
+    "starting_price",
+    "deposit_amount",
+    "area",
+    "bid_step_vnd",   # ⭐ NEW: bước giá mỗi lô
+]
+
+
+def _used_code_numbers(base: str, codes: set[str]) -> set[int]:
+    """Lấy các N đã dùng trong dạng BASE+N (N>=1) — phần còn lại không ảnh hưởng."""
+    pat = re.compile(rf"^{re.escape(base)}([1-9][0-9]*)$")
+    out: set[int] = set()
+    for c in codes:
+        m = pat.match(c)
+        if m:
+            out.add(int(m.group(1)))
+    return out
+
+
+def invalidate_project_code_index(company_code: str | None = None) -> None:
+    """Xoá index project_code của 1 công ty (None = tất cả) sau khi tạo/import dự án."""
+    if company_code:
+        _project_code_index.invalidate(company_code.upper())
+    else:
+        _project_code_index.clear()
+
+
+async def _fetch_used_code_numbers(access: str, company_code: str) -> set[int] | None:
     headers = {"Authorization": f"Bearer {access}"}
     async with httpx.AsyncClient(base_url=SERVICE_A_BASE_URL, timeout=10.0) as client:
         r = await client.get(
@@ -20,160 +62,187 @@ async def _next_project_code(access: str, company_code: str) -> str:
             params={"company_code": company_code, "size": 1000},
             headers=headers,
         )
-        if r.status_code == 200:
-            data = r.json()
-            existing = {p["project_code"].upper() for p in data.get("data", [])}
-        else:
-            existing = set()
+    if r.status_code != 200:
+        return None
+    data = r.json()
+    existing = {(p.get("project_code") or "").upper() for p in data.get("data", [])}
+    return _used_code_numbers(company_code.upper(), existing)
+
 
+async def _next_project_code(access: str, company_code: str) -> str:
+    """
+    Trả về project_code dạng COMPANYCODEN (N>=1) nhỏ nhất chưa tồn tại.
+    Dùng index N đã dùng cache theo công ty; chỉ gọi Service A khi hết hạn.
+    """
     base = company_code.upper()
+    used = _project_code_index.get(base)
+    if used is None:
+        used = await _fetch_used_code_numbers(access, company_code)
+        if used is None:
+            # lỗi upstream: giữ hành vi cũ (coi như chưa có dự án), không cache
+            used = set()
+        else:
+            _project_code_index.set(base, used)
+
     n = 1
-    while True:
-        cand = f"{base}{n}"
-        if cand not in existing:
-            return cand
+    while n in used:
         n += 1
+    return f"{base}{n}"
 
 
-async def build_projects_lots_template(access: str, company_code: str) -> StreamingResponse:
+def _build_template_skeleton() -> bytes:
     """
-    Sinh file Excel template đẹp cho import dự án + lô
-    - project_code mẫu = COMPANYCODEN chưa tồn tại
-    - Dự án mặc định INACTIVE, lô mặc định ACTIVE (sẽ do API xử lý sau)
+    Dựng workbook mẫu 1 lần (style, header, dòng mẫu); project_code mẫu là placeholder
+    để vá theo request mà không phải dựng lại workbook.
     """
-    proj_code = await _next_project_code(access, company_code)
+    from openpyxl import Workbook
+    from openpyxl.styles import Alignment, Font, PatternFill, Border, Side, NamedStyle
+    from openpyxl.utils import get_column_letter
 
-    # ---- Cấu trúc cột
-    proj_cols = ["project_code", "name", "description", "location"]
-    lot_cols = [
-        "project_code",
-        "lot_code",
-        "name",
-        "description",
-        "starting_price",
-        "deposit_amount",
-        "area",
-        "bid_step_vnd",   # ⭐ NEW: bước giá mỗi lô
-    ]
+    wb = Workbook()
+    ws_p = wb.active
+    ws_p.title = "projects"
+    ws_l = wb.create_sheet("lots")
 
     # ---- Dòng mẫu
-    dfp = pd.DataFrame(
-        [
-            {
-                "project_code": proj_code,
-                "name": "Dự án mẫu",
-                "description": "",
-                "location": "Quận 1, TP.HCM",
-            }
-        ],
-        columns=proj_cols,
-    )
+    ws_p.append(PROJ_COLS)
+    ws_p.append([_PROJECT_CODE_PLACEHOLDER, "Dự án mẫu", "", "Quận 1, TP.HCM"])
 
-    dfl = pd.DataFrame(
+    ws_l.append(LOT_COLS)
+    ws_l.append(
         [
-            {
-                "project_code": proj_code,
-                "lot_code": "L-A01",
-                "name": "Lô A01",
-                "description": "",
-                "starting_price": 1_500_000_000,
-                "deposit_amount": 150_000_000,
-                "area": 80.0,
-                "bid_step_vnd": 50_000_000,  # ⭐ Ví dụ bước giá
-            }
-        ],
-        columns=lot_cols,
+            _PROJECT_CODE_PLACEHOLDER,
+            "L-A01",
+            "Lô A01",
+            "",
+            1_500_000_000,
+            150_000_000,
+            80.0,
+            50_000_000,  # ⭐ Ví dụ bước giá
+        ]
     )
 
-    buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="openpyxl") as w:
-        dfp.to_excel(w, index=False, sheet_name="projects")
-        dfl.to_excel(w, index=False, sheet_name="lots")
-
-        wb = w.book
-        ws_p = w.sheets["projects"]
-        ws_l = w.sheets["lots"]
-
-        # ===== Styles =====
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill("solid", fgColor="4F81BD")
-        thin = Side(style="thin", color="D9D9D9")
-        header_border = Border(left=thin, right=thin, top=thin, bottom=thin)
-        cell_border = Border(left=thin, right=thin, top=thin, bottom=thin)
-
-        money_style = NamedStyle(name="money_vn")
-        money_style.number_format = "#,##0"
-        money_style.alignment = Alignment(horizontal="right")
-        if "money_vn" not in wb.named_styles:
-            wb.add_named_style(money_style)
-
-        area_style = NamedStyle(name="area_vn")
-        area_style.number_format = "#,##0.00"
-        area_style.alignment = Alignment(horizontal="right")
-        if "area_vn" not in wb.named_styles:
-            wb.add_named_style(area_style)
-
-        wrap_left = Alignment(wrap_text=True, horizontal="left", vertical="top")
-
-        def format_sheet(ws, widths, money_cols=None, area_cols=None):
-            max_col = ws.max_column
-            max_row = ws.max_row
-
-            # Header
-            for col in range(1, max_col + 1):
-                cell = ws.cell(row=1, column=col)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.border = header_border
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-
-            # Column widths
-            for idx, width in enumerate(widths, start=1):
-                ws.column_dimensions[get_column_letter(idx)].width = width
-
-            # Freeze & filter
-            ws.freeze_panes = "A2"
-            ws.auto_filter.ref = f"A1:{get_column_letter(max_col)}{max_row}"
-
-            # Body borders + wrap cho description
-            desc_col_idx = None
+    # ===== Styles =====
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill("solid", fgColor="4F81BD")
+    thin = Side(style="thin", color="D9D9D9")
+    header_border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    cell_border = Border(left=thin, right=thin, top=thin, bottom=thin)
+
+    money_style = NamedStyle(name="money_vn")
+    money_style.number_format = "#,##0"
+    money_style.alignment = Alignment(horizontal="right")
+    wb.add_named_style(money_style)
+
+    area_style = NamedStyle(name="area_vn")
+    area_style.number_format = "#,##0.00"
+    area_style.alignment = Alignment(horizontal="right")
+    wb.add_named_style(area_style)
+
+    wrap_left = Alignment(wrap_text=True, horizontal="left", vertical="top")
+
+    def format_sheet(ws, widths, money_cols=None, area_cols=None):
+        max_col = ws.max_column
+        max_row = ws.max_row
+
+        # Header
+        for col in range(1, max_col + 1):
+            cell = ws.cell(row=1, column=col)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.border = header_border
+            cell.alignment = Alignment(horizontal="center", vertical="center")
+
+        # Column widths
+        for idx, width in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(idx)].width = width
+
+        # Freeze & filter
+        ws.freeze_panes = "A2"
+        ws.auto_filter.ref = f"A1:{get_column_letter(max_col)}{max_row}"
+
+        # Body borders + wrap cho description
+        desc_col_idx = None
+        for c in range(1, max_col + 1):
+            if (ws.cell(row=1, column=c).value or "").strip().lower() == "description":
+                desc_col_idx = c
+                break
+
+        for r in range(2, max_row + 1):
             for c in range(1, max_col + 1):
-                if (ws.cell(row=1, column=c).value or "").strip().lower() == "description":
-                    desc_col_idx = c
-                    break
+                cell = ws.cell(row=r, column=c)
+                cell.border = cell_border
+                if desc_col_idx and c == desc_col_idx:
+                    cell.alignment = wrap_left
 
+        # Number formats
+        for col in (money_cols or []):
             for r in range(2, max_row + 1):
-                for c in range(1, max_col + 1):
-                    cell = ws.cell(row=r, column=c)
-                    cell.border = cell_border
-                    if desc_col_idx and c == desc_col_idx:
-                        cell.alignment = wrap_left
-
-            # Number formats
-            for col in (money_cols or []):
-                for r in range(2, max_row + 1):
-                    ws.cell(row=r, column=col).style = money_style
-
-            for col in (area_cols or []):
-                for r in range(2, max_row + 1):
-                    ws.cell(row=r, column=col).style = area_style
-
-        # Apply style cho projects
-        format_sheet(ws_p, widths=[14, 26, 40, 22])
-
-        # Apply style cho lots
-        format_sheet(
-            ws_l,
-            widths=[14, 14, 20, 36, 16, 16, 12, 16],  # ⭐ thêm width cho cột bid_step_vnd
-            money_cols=[5, 6, 8],                     # ⭐ starting_price, deposit_amount, bid_step_vnd
-            area_cols=[7],
-        )
+                ws.cell(row=r, column=col).style = money_style
+
+        for col in (area_cols or []):
+            for r in range(2, max_row + 1):
+                ws.cell(row=r, column=col).style = area_style
+
+    # Apply style cho projects
+    format_sheet(ws_p, widths=[14, 26, 40, 22])
+
+    # Apply style cho lots
+    format_sheet(
+        ws_l,
+        widths=[14, 14, 20, 36, 16, 16, 12, 16],  # ⭐ thêm width cho cột bid_step_vnd
+        money_cols=[5, 6, 8],                     # ⭐ starting_price, deposit_amount, bid_step_vnd
+        area_cols=[7],
+    )
+
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def _template_skeleton_bytes() -> bytes:
+    global _template_skeleton, _template_patch_entries
+    if _template_skeleton is None:
+        data = _build_template_skeleton()
+        marker = _PROJECT_CODE_PLACEHOLDER.encode("utf-8")
+        with zipfile.ZipFile(io.BytesIO(data)) as z:
+            # openpyxl ghi inline string trong sheet XML (có thể là sharedStrings tuỳ bản)
+            _template_patch_entries = frozenset(n for n in z.namelist() if marker in z.read(n))
+        _template_skeleton = data
+    return _template_skeleton
+
+
+def render_projects_lots_template(project_code: str) -> bytes:
+    """Vá project_code mẫu vào skeleton đã cache (chỉ viết lại các part chứa placeholder)."""
+    skeleton = _template_skeleton_bytes()
+    placeholder = _PROJECT_CODE_PLACEHOLDER.encode("utf-8")
+    value = _xml_escape(project_code).encode("utf-8")
+
+    out = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(skeleton)) as zin, zipfile.ZipFile(
+        out, "w", compression=zipfile.ZIP_DEFLATED
+    ) as zout:
+        for info in zin.infolist():
+            data = zin.read(info.filename)
+            if info.filename in _template_patch_entries:
+                data = data.replace(placeholder, value)
+            zout.writestr(info, data)
+    return out.getvalue()
+
+
+async def build_projects_lots_template(access: str, company_code: str) -> Response:
+    """
+    Sinh file Excel template đẹp cho import dự án + lô
+    - project_code mẫu = COMPANYCODEN chưa tồn tại
+    - Dự án mặc định INACTIVE, lô mặc định ACTIVE (sẽ do API xử lý sau)
+    """
+    proj_code = await _next_project_code(access, company_code)
+    content = render_projects_lots_template(proj_code)
 
-    buf.seek(0)
     filename = f"auction_import_template_{company_code}_{datetime.now():%Y%m%d}.xlsx"
     headers = {"Content-Disposition": f'attachment; filename=\"{filename}\"'}
-    return StreamingResponse(
-        buf,
+    return Response(
+        content=content,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers=headers,
     )
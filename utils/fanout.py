@@ -0,0 +1,72 @@
+# utils/fanout.py
+"""
+Fan-out có giới hạn: chạy 1 coroutine cho mỗi item với trần concurrency,
+timeout riêng từng item và cô lập lỗi (item lỗi -> default, không làm hỏng cả lô).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import weakref
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class SharedLimit:
+    """
+    Trần concurrency dùng chung cho cả worker (vd mọi request ballot-counts tới A).
+    asyncio.Semaphore gắn với 1 event loop -> giữ 1 semaphore cho mỗi loop đang chạy.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = max(1, int(limit))
+        self._by_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        sem = self._by_loop.get(loop)
+        if sem is None:
+            sem = asyncio.Semaphore(self.limit)
+            self._by_loop[loop] = sem
+        return sem
+
+
+async def bounded_gather(
+    items: Iterable[T],
+    fn: Callable[[T], Awaitable[R]],
+    *,
+    concurrency: int = 8,
+    timeout: Optional[float] = None,
+    default: Any = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    label: str = "fan-out",
+) -> List[R]:
+    """
+    Trả list kết quả cùng thứ tự items.
+    - semaphore: truyền vào để dùng chung trần giữa nhiều lời gọi (vd toàn worker);
+      không truyền thì tạo mới theo concurrency.
+    - timeout: giây cho từng item (None = không giới hạn).
+    """
+    sem = semaphore or asyncio.Semaphore(max(1, int(concurrency)))
+
+    async def _run(item: T) -> R:
+        async with sem:
+            try:
+                if timeout is not None and timeout > 0:
+                    return await asyncio.wait_for(fn(item), timeout)
+                return await fn(item)
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                logger.warning("%s item %r timed out after %ss", label, item, timeout)
+            except Exception as exc:
+                logger.warning("%s item %r failed: %s", label, item, exc)
+            return default
+
+    return list(await asyncio.gather(*[_run(x) for x in items]))
@@ -0,0 +1,205 @@
+# utils/live_hub.py
+"""
+Hub SSE cho màn hình trình chiếu (máy chiếu/TV/điện thoại cùng xem 1 phiên/dự án).
+
+- Mỗi key (loại màn hình, subscriber_scope, id...) có đúng 1 task poll Service A, dùng
+  chung cho mọi màn hình đang mở của cùng 1 người -> tải lên A theo số phiên x người xem,
+  không theo số màn hình. subscriber_scope = công ty + user ĐÃ VERIFY (auth_me), không
+  verify được -> riêng theo token: không ai nhận dữ liệu A trả cho token của người khác.
+- Chỉ đẩy event khi hash payload (status + body) đổi; màn hình mới vào nhận ngay bản
+  mới nhất. Subscriber chậm chỉ giữ 1 event chờ (bản mới thay bản cũ).
+- Subscriber cuối cùng ngắt -> dừng poll sau LIVE_HUB_IDLE_GRACE giây (tải lại trang
+  không làm mất poller).
+- Poll bằng token vừa được A chấp nhận (còn kết nối), không có thì token của subscriber
+  vào sau cùng. A trả 401/403 -> event `upstream_error` CHỈ gửi cho các màn hình dùng
+  token đó rồi đóng stream của chúng (trang quay về chế độ poll cũ, đi qua auth guard /
+  đăng nhập); màn hình khác thử ngay bằng token kế tiếp, không bị ảnh hưởng.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from starlette.responses import StreamingResponse
+
+from utils.auth import verified_cache_scope
+
+logger = logging.getLogger(__name__)
+
+# chu kỳ poll A mặc định của 1 key (màn hình trình chiếu cũ poll 2s)
+LIVE_HUB_POLL_MS = max(500, int(os.getenv("LIVE_HUB_POLL_MS", "2000")))
+LIVE_HUB_KEEPALIVE = float(os.getenv("LIVE_HUB_KEEPALIVE", "15"))
+LIVE_HUB_IDLE_GRACE = float(os.getenv("LIVE_HUB_IDLE_GRACE", "5"))
+# EventSource tự kết nối lại sau N ms khi mất mạng
+LIVE_HUB_RETRY_MS = int(os.getenv("LIVE_HUB_RETRY_MS", "3000"))
+
+FetchFn = Callable[[str], Awaitable[Tuple[int, Any]]]
+
+_sub_ids = itertools.count(1)
+# A từ chối token -> chỉ báo cho màn hình dùng token đó
+_AUTH_ERRORS = {401, 403}
+
+
+def subscriber_scope(request, token: str) -> str:
+    """Phần key theo người xem: công ty + user đã verify; không verify được -> hash token."""
+    scope = verified_cache_scope(request, token, per_user=True)
+    if scope:
+        return scope
+    return "t:" + hashlib.sha1(token.encode("utf-8")).hexdigest()[:16]
+
+
+def _event(name: str, data: Any, event_id: Optional[str] = None) -> bytes:
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+    head = f"id: {event_id}\n" if event_id else ""
+    return (head + f"event: {name}\n" + "".join(f"data: {line}\n" for line in body.split("\n")) + "\n").encode("utf-8")
+
+
+class _Topic:
+    def __init__(self, key: Hashable, fetch: FetchFn, interval: float) -> None:
+        self.key = key
+        self.fetch = fetch
+        self.interval = interval
+        self.subscribers: Dict[int, Tuple[str, asyncio.Queue]] = {}
+        self.latest: Optional[bytes] = None
+        self.latest_hash: Optional[str] = None
+        self.good_token: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self.stop_handle: Optional[asyncio.TimerHandle] = None
+
+    def token(self) -> Optional[str]:
+        if not self.subscribers:
+            return None
+        tokens = [tok for tok, _ in self.subscribers.values()]
+        if self.good_token in tokens:
+            return self.good_token
+        # chưa token nào được A nhận: subscriber vào sau cùng (ít khả năng hết hạn)
+        return tokens[-1]
+
+    @staticmethod
+    def _put(q: asyncio.Queue, item: Tuple[bytes, bool]) -> None:
+        if q.full():
+            try:
+                q.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        q.put_nowait(item)
+
+    def publish(self, frame: bytes) -> None:
+        self.latest = frame
+        for _, q in self.subscribers.values():
+            self._put(q, (frame, False))
+
+    def reject(self, token: str, status: int, body: Any) -> None:
+        """A từ chối token: báo + đóng stream của các màn hình dùng token này, bỏ khỏi topic."""
+        frame = _event("upstream_error", {"status": status, "body": body})
+        for sub_id, (tok, q) in list(self.subscribers.items()):
+            if tok == token:
+                del self.subscribers[sub_id]
+                self._put(q, (frame, True))
+        if self.good_token == token:
+            self.good_token = None
+
+    async def run(self) -> None:
+        while self.subscribers:
+            token = self.token()
+            try:
+                status, body = await self.fetch(token)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("live hub %r fetch failed: %s", self.key, e)
+                status, body = 599, {"detail": str(e) or e.__class__.__name__}
+            if status in _AUTH_ERRORS:
+                # lỗi của riêng token này: không phát cho người khác, thử ngay token kế tiếp
+                self.reject(token, status, body)
+                continue
+            if status == 200:
+                self.good_token = token
+            raw = json.dumps([status, body], sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+            digest = hashlib.sha1(raw).hexdigest()[:16]
+            if digest != self.latest_hash:
+                self.latest_hash = digest
+                if status == 200:
+                    self.publish(_event("snapshot", body, digest))
+                else:
+                    self.publish(_event("upstream_error", {"status": status, "body": body}, digest))
+            await asyncio.sleep(self.interval)
+
+
+class LiveHub:
+    """key -> 1 poller + N subscriber; dùng stream() trong route SSE."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._topics: Dict[Hashable, _Topic] = {}
+
+    def stats(self) -> Dict[str, int]:
+        return {"topics": len(self._topics), "subscribers": sum(len(t.subscribers) for t in self._topics.values())}
+
+    def _join(self, key: Hashable, fetch: FetchFn, interval: float, token: str) -> Tuple[_Topic, int, asyncio.Queue]:
+        topic = self._topics.get(key)
+        if topic is None:
+            topic = _Topic(key, fetch, interval)
+            self._topics[key] = topic
+        if topic.stop_handle is not None:
+            topic.stop_handle.cancel()
+            topic.stop_handle = None
+        sub_id = next(_sub_ids)
+        q: asyncio.Queue = asyncio.Queue(maxsize=1)
+        if topic.latest is not None:
+            q.put_nowait((topic.latest, False))
+        topic.subscribers[sub_id] = (token, q)
+        if topic.task is None or topic.task.done():
+            topic.task = asyncio.get_running_loop().create_task(topic.run())
+        return topic, sub_id, q
+
+    def _leave(self, topic: _Topic, sub_id: int) -> None:
+        topic.subscribers.pop(sub_id, None)
+        if topic.subscribers:
+            return
+
+        def _stop() -> None:
+            topic.stop_handle = None
+            if topic.subscribers:
+                return
+            if topic.task is not None and not topic.task.done():
+                topic.task.cancel()
+            if self._topics.get(topic.key) is topic:
+                del self._topics[topic.key]
+
+        if LIVE_HUB_IDLE_GRACE > 0:
+            topic.stop_handle = asyncio.get_running_loop().call_later(LIVE_HUB_IDLE_GRACE, _stop)
+        else:
+            _stop()
+
+    async def _frames(self, key: Hashable, fetch: FetchFn, interval: float, token: str) -> AsyncIterator[bytes]:
+        topic, sub_id, q = self._join(key, fetch, interval, token)
+        try:
+            yield f"retry: {LIVE_HUB_RETRY_MS}\n\n".encode("ascii")
+            while True:
+                try:
+                    frame, final = await asyncio.wait_for(q.get(), timeout=LIVE_HUB_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                yield frame
+                if final:
+                    return
+        finally:
+            self._leave(topic, sub_id)
+
+    def stream(self, key: Hashable, fetch: FetchFn, *, interval: float, token: str) -> StreamingResponse:
+        """
+        StreamingResponse text/event-stream cho 1 màn hình.
+        fetch(token) -> (status, body) gọi A; key phải gồm subscriber_scope(request, token).
+        """
+        return StreamingResponse(
+            self._frames(key, fetch, max(0.5, float(interval)), token),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
@@ -0,0 +1,173 @@
+# utils/pdf_render_pool.py
+"""
+Render PDF (xhtml2pdf) trong process pool có giới hạn — pisa.CreatePDF chạy CPU
+vài giây/tài liệu, gọi thẳng trong handler async sẽ treo cả event loop của worker.
+
+- PDF_RENDER_WORKERS: số process (0 = chạy trong thread của loop, không tách process).
+- PDF_RENDER_MAX_PENDING: tối đa bao nhiêu tài liệu đang chờ/đang render; vượt -> PdfRenderBusy.
+- PDF_RENDER_TIMEOUT: giây cho 1 tài liệu; quá hạn -> pool đó "nghỉ hưu": tài liệu mới sang
+  pool mới, các tài liệu khác đang render trên pool cũ vẫn chạy xong, rồi mới kill process
+  (gồm process treo). Pool hỏng (BrokenProcessPool) -> bỏ ngay, lần sau tạo pool mới.
+- Worker khởi tạo bằng spawn, import xhtml2pdf/reportlab + render 1 tài liệu nhỏ trong
+  initializer (chỉ bỏ chi phí import + khởi tạo lần đầu; font/CSS của mẫu in thật vẫn parse
+  theo từng tài liệu). start_pdf_pool() gọi ở lifespan để warm trước request đầu.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Any, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+PDF_RENDER_WORKERS = max(0, int(os.getenv("PDF_RENDER_WORKERS", "2")))
+PDF_RENDER_MAX_PENDING = max(1, int(os.getenv("PDF_RENDER_MAX_PENDING", "8")))
+PDF_RENDER_TIMEOUT = float(os.getenv("PDF_RENDER_TIMEOUT", "90"))
+
+_WARMUP_HTML = (
+    "<html><head><meta charset='utf-8'><style>body{font-family:Times New Roman;font-size:12pt}"
+    "table{border-collapse:collapse}td{border:1px solid #000}</style></head>"
+    "<body><p><b>Khởi động</b> — tiếng Việt có dấu</p><table><tr><td>1</td></tr></table></body></html>"
+)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pending = 0
+# pool -> số job đang chạy (chưa xong, chưa quá hạn); pool đã nghỉ hưu chờ về 0 rồi kill
+_active: Dict[ProcessPoolExecutor, int] = {}
+_retiring: Set[ProcessPoolExecutor] = set()
+
+
+class PdfRenderBusy(RuntimeError):
+    """Hàng đợi render PDF đã đầy — client nên thử lại sau."""
+
+
+def render_pdf_sync(html: str) -> bytes:
+    try:
+        from xhtml2pdf import pisa
+    except ImportError as exc:
+        raise RuntimeError("Thiếu thư viện xhtml2pdf. Chạy: pip install xhtml2pdf") from exc
+
+    buf = BytesIO()
+    result = pisa.CreatePDF(html, dest=buf, encoding="utf-8")
+    if result.err:
+        raise RuntimeError("Không tạo được file PDF")
+    return buf.getvalue()
+
+
+def _worker_init() -> None:
+    try:
+        render_pdf_sync(_WARMUP_HTML)
+    except Exception:
+        # không chặn worker — lỗi thật sẽ báo ở lần render đầu
+        pass
+
+
+def _worker_ping() -> int:
+    return os.getpid()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=PDF_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_worker_init,
+        )
+    return _pool
+
+
+def _kill_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    if _pool is pool:
+        _pool = None
+    _retiring.discard(pool)
+    _active.pop(pool, None)
+    procs = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for p in procs:
+        try:
+            p.kill()
+        except Exception:
+            pass
+
+
+def _retire_pool(pool: ProcessPoolExecutor) -> None:
+    """Job mới sang pool mới; pool cũ bị kill khi các job còn lại trên nó xong."""
+    global _pool
+    if _pool is pool:
+        _pool = None
+    _retiring.add(pool)
+    if _active.get(pool, 0) <= 0:
+        _kill_pool(pool)
+
+
+def _job_done(pool: ProcessPoolExecutor) -> None:
+    n = _active.get(pool, 0) - 1
+    if n > 0:
+        _active[pool] = n
+        return
+    _active.pop(pool, None)
+    if pool in _retiring:
+        _kill_pool(pool)
+
+
+async def start_pdf_pool() -> None:
+    """Warm pool ở startup: spawn đủ worker, mỗi worker chạy initializer (import + font/CSS)."""
+    if PDF_RENDER_WORKERS <= 0:
+        return
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    try:
+        await asyncio.gather(
+            *[loop.run_in_executor(pool, _worker_ping) for _ in range(PDF_RENDER_WORKERS)]
+        )
+    except Exception as e:
+        logger.warning("pdf pool warmup failed: %s", e)
+
+
+def stop_pdf_pool() -> None:
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+    for old in list(_retiring):
+        _kill_pool(old)
+
+
+async def _run(fn: Callable[..., Any], *args: Any, timeout: Optional[float]) -> Any:
+    """Chạy fn(*args) trong pool (hoặc thread khi PDF_RENDER_WORKERS=0) với trần pending + timeout."""
+    global _pending
+    if _pending >= PDF_RENDER_MAX_PENDING:
+        raise PdfRenderBusy("Hệ thống đang tạo nhiều file PDF, vui lòng thử lại sau ít phút.")
+    limit = PDF_RENDER_TIMEOUT if timeout is None else timeout
+    loop = asyncio.get_running_loop()
+    _pending += 1
+    pool = _get_pool() if PDF_RENDER_WORKERS > 0 else None
+    if pool is not None:
+        _active[pool] = _active.get(pool, 0) + 1
+    try:
+        fut = loop.run_in_executor(pool, fn, *args)
+        return await asyncio.wait_for(fut, limit if limit and limit > 0 else None)
+    except asyncio.TimeoutError:
+        if pool is not None:
+            _retire_pool(pool)
+        raise RuntimeError(f"Tạo PDF quá thời gian ({limit:.0f}s)") from None
+    except BrokenProcessPool:
+        if pool is not None:
+            _kill_pool(pool)
+        raise RuntimeError("Tiến trình tạo PDF bị dừng đột ngột, vui lòng thử lại") from None
+    finally:
+        _pending -= 1
+        if pool is not None:
+            _job_done(pool)
+
+
+async def render_pdf(html: str, *, timeout: Optional[float] = None) -> bytes:
+    """Render HTML -> PDF không chặn event loop. Raise PdfRenderBusy khi hàng đợi đầy."""
+    return await _run(render_pdf_sync, html, timeout=timeout)
@@ -5,9 +5,33 @@ Chỉ chạy trên Service B (đọc lô qua API Service A hiện có).
 """
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import os
+from collections import Counter
+from operator import itemgetter
+from decimal import Decimal
+from typing import Any, Dict, Hashable, List, Optional, Tuple
 
-from utils.project_import_verifier import ProjectImportVerifier
+from utils.project_import_verifier import ProjectImportVerifier, lot_result, quantize_lot_percent
+from utils.ttl_cache import TTLCache
+
+# Cache kết quả validate theo dự án (0 = tắt, luôn verify lại từ đầu).
+PROJECT_VALIDATE_CACHE_TTL = float(os.getenv("PROJECT_VALIDATE_CACHE_TTL", "1800"))
+_validate_cache = TTLCache(ttl_seconds=PROJECT_VALIDATE_CACHE_TTL, maxsize=64)
+
+# Field đầu vào verifier (trừ row) — đổi 1 trong các field này thì lô được verify lại.
+_FINGERPRINT_FIELDS = (
+    "project_code",
+    "lot_code",
+    "name",
+    "description",
+    "starting_price",
+    "deposit_amount",
+    "bid_step_vnd",
+    "area",
+    "lot_id",
+    "status_lot",
+)
+_lot_fingerprint = itemgetter(*_FINGERPRINT_FIELDS)
 
 
 def map_sa_lot_to_verify_input(
@@ -32,14 +56,7 @@ def map_sa_lot_to_verify_input(
     }
 
 
-def build_existing_project_preview(
-    project: Dict[str, Any],
-    sa_lots: List[Dict[str, Any]],
-) -> Dict[str, Any]:
-    """
-    Chạy verify trên tất cả lô của 1 dự án đã tồn tại.
-    Trả dict cùng shape gần với handle_import_preview (để tái dùng import_preview.html).
-    """
+def _map_project_lots(project: Dict[str, Any], sa_lots: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     code = (project.get("project_code") or "").strip()
     lots_in: List[Dict[str, Any]] = []
     for i, lot in enumerate(sa_lots or [], start=1):
@@ -52,8 +69,26 @@ def build_existing_project_preview(
                 row=i,
             )
         )
+    return lots_in
 
-    verification = ProjectImportVerifier(lots_in).run()
+
+def build_existing_project_preview(
+    project: Dict[str, Any],
+    sa_lots: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    Chạy verify trên tất cả lô của 1 dự án đã tồn tại.
+    Trả dict cùng shape gần với handle_import_preview (để tái dùng import_preview.html).
+    """
+    verification = ProjectImportVerifier(_map_project_lots(project, sa_lots)).run()
+    return _preview_from_verification(project, verification)
+
+
+def _preview_from_verification(
+    project: Dict[str, Any],
+    verification: Dict[str, Any],
+) -> Dict[str, Any]:
+    code = (project.get("project_code") or "").strip()
 
     flat_errors: List[Dict[str, Any]] = []
     for lr in verification.get("lots") or []:
@@ -110,6 +145,214 @@ def build_existing_project_preview(
     }
 
 
+class IncrementalProjectValidator:
+    """
+    Verify lô của 1 dự án theo kiểu tăng dần — cùng kết quả ProjectImportVerifier.run().
+    Rule từng lô dùng chung của verifier (check_lot / check_lot_in_project / lot_result);
+    ở đây chỉ giữ phần memo:
+    - Pass 1 (số nguyên + khoảng giá trị) chỉ chạy lại cho lô có fingerprint đổi.
+    - Tổng giá khởi điểm / tổng cọc / phân bố % cọc được cộng trừ theo lô đổi.
+    - Pass 2 (outlier theo trung bình, % cọc khác % phổ biến) chỉ chạy lại khi
+      lô đổi hoặc trung bình / % đại diện của dự án đổi.
+    Chỉ dùng cho lô cùng 1 project_code (validate dự án đã tạo).
+    """
+
+    def __init__(self) -> None:
+        self.verifier = ProjectImportVerifier([])
+        self.states: Dict[Hashable, Dict[str, Any]] = {}
+        self.sum_sp = 0
+        self.sum_dp = 0
+        self.n_valid = 0
+        self.pct_counter: Counter = Counter()
+        self.last_checked = 0
+        self._last_signature: Optional[Tuple[Any, ...]] = None
+        self._last_verification: Optional[Dict[str, Any]] = None
+
+    # ----- per-lot state -----
+    def _pass1(self, lot_in: Dict[str, Any], fp: Tuple[Any, ...]) -> Dict[str, Any]:
+        st = self.verifier.check_lot(lot_in)
+        st.update(
+            fp=fp,
+            pct_key=quantize_lot_percent(st["pct"]) if st["pct"] is not None else None,
+            pass2_key=None,
+            pass2=[],
+            result_key=None,
+            result=None,
+        )
+        return st
+
+    def _add(self, st: Dict[str, Any]) -> None:
+        if not st["valid"]:
+            return
+        self.sum_sp += st["sp"]
+        self.sum_dp += st["dp"]
+        self.n_valid += 1
+        if st["pct_key"] is not None:
+            self.pct_counter[st["pct_key"]] += 1
+
+    def _remove(self, st: Dict[str, Any]) -> None:
+        if not st["valid"]:
+            return
+        self.sum_sp -= st["sp"]
+        self.sum_dp -= st["dp"]
+        self.n_valid -= 1
+        if st["pct_key"] is not None:
+            self.pct_counter[st["pct_key"]] -= 1
+            if self.pct_counter[st["pct_key"]] <= 0:
+                del self.pct_counter[st["pct_key"]]
+
+    def _representative(self) -> Optional[Decimal]:
+        if not self.pct_counter:
+            return None
+        # cùng rule determine_representative_deposit_percent: nhiều nhất, hoà thì % nhỏ hơn
+        return sorted(self.pct_counter.items(), key=lambda kv: (-kv[1], kv[0]))[0][0]
+
+    @staticmethod
+    def _lot_result(lot_in: Dict[str, Any], st: Dict[str, Any]) -> Dict[str, Any]:
+        return lot_result(
+            lot_in,
+            errors=st["errors"],
+            warnings=st["warnings"] + st["pass2"],
+            starting_price=st["sp"],
+            deposit=st["dp"],
+            lot_deposit_percent=str(st["pct_key"]) if st["pct_key"] is not None else None,
+        )
+
+    @staticmethod
+    def _shallow(verification: Dict[str, Any]) -> Dict[str, Any]:
+        # dict ngoài + list lots mới (rẻ, O(số lô)); lot result bên trong là bản memo dùng chung
+        return {**verification, "lots": list(verification["lots"])}
+
+    def run(self, lots_in: List[Dict[str, Any]], project_code: str) -> Dict[str, Any]:
+        """
+        Trả verification payload giống ProjectImportVerifier(lots_in).run().
+        Lot result trong "lots" được memo theo lô: chỉ đọc — caller cần sửa thì tự copy.
+        """
+        keyed: List[Tuple[Hashable, Tuple[Any, ...], Dict[str, Any]]] = []
+        used_keys: set = set()
+        for lot_in in lots_in:
+            key: Hashable = lot_in.get("lot_id")
+            if key is None or key in used_keys:
+                key = ("row", lot_in.get("row"))
+            used_keys.add(key)
+            fp = _lot_fingerprint(lot_in)
+            keyed.append((key, fp, lot_in))
+
+        signature = (project_code,) + tuple((k, lot_in.get("row"), fp) for k, fp, lot_in in keyed)
+        if signature == self._last_signature and self._last_verification is not None:
+            self.last_checked = 0
+            return self._shallow(self._last_verification)
+
+        checked = 0
+        for key, fp, lot_in in keyed:
+            st = self.states.get(key)
+            if st is not None and st["fp"] == fp:
+                continue
+            if st is not None:
+                self._remove(st)
+            st = self._pass1(lot_in, fp)
+            self._add(st)
+            self.states[key] = st
+            checked += 1
+        for key in [k for k in self.states if k not in used_keys]:
+            self._remove(self.states.pop(key))
+        self.last_checked = checked
+
+        v = self.verifier
+        avg = (Decimal(self.sum_sp) / Decimal(self.n_valid)) if self.n_valid else None
+        project_pct = v.calculate_project_deposit_percent(self.sum_dp, self.sum_sp)
+        project_warnings = v.verify_project_deposit_percent(project_pct)
+        representative = self._representative()
+        pass2_key = (avg, representative)
+
+        lot_results: List[Dict[str, Any]] = []
+        p_err = 0
+        p_warn = 0
+        for key, fp, lot_in in keyed:
+            st = self.states[key]
+            if st["valid"] and st["pass2_key"] != pass2_key:
+                st["pass2"] = v.check_lot_in_project(st["sp"], st["pct"], avg, representative)
+                st["pass2_key"] = pass2_key
+                st["result"] = None
+            result_key = (lot_in.get("row"), st["pass2_key"])
+            if st["result"] is None or st["result_key"] != result_key:
+                st["result"] = self._lot_result(lot_in, st)
+                st["result_key"] = result_key
+            lr = st["result"]
+            p_err += len(lr["errors"])
+            p_warn += len(lr["warnings"])
+            lot_results.append(lr)
+
+        has_row_errors = any(lr["status"] == "ERROR" for lr in lot_results)
+        total_warning_count = p_warn + len(project_warnings)
+        pct_q = project_pct.quantize(Decimal("0.0001")) if project_pct is not None else None
+
+        verification: Dict[str, Any] = {
+            "totalLots": len(lots_in),
+            "errorCount": p_err,
+            "warningCount": total_warning_count,
+            "totalStartingPrice": self.sum_sp,
+            "totalDeposit": self.sum_dp,
+            "projectDepositPercent": float(pct_q) if pct_q is not None else None,
+            "projectDepositPercentRaw": str(pct_q) if pct_q is not None else None,
+            "representativeDepositPercent": (
+                float(representative) if representative is not None else None
+            ),
+            "averageStartingPrice": None,
+            "projectWarnings": list(project_warnings),
+            "projectErrors": [],
+            "projects": [],
+            "lots": lot_results,
+            "can_continue": not has_row_errors,
+            "has_errors": has_row_errors,
+            "has_warnings": total_warning_count > 0,
+        }
+        if lots_in:
+            verification["projects"] = [
+                v.project_summary(
+                    project_code,
+                    total_lots=len(lots_in),
+                    valid_lots=self.n_valid,
+                    error_count=p_err,
+                    warning_count=p_warn,
+                    total_starting=self.sum_sp,
+                    total_deposit=self.sum_dp,
+                    project_pct=project_pct,
+                    representative=representative,
+                    average=avg,
+                    project_warnings=project_warnings,
+                )
+            ]
+
+        self._last_signature = signature
+        self._last_verification = verification
+        return self._shallow(verification)
+
+
+def build_existing_project_preview_cached(
+    project: Dict[str, Any],
+    sa_lots: List[Dict[str, Any]],
+    *,
+    cache_key: Hashable,
+) -> Dict[str, Any]:
+    """
+    Như build_existing_project_preview nhưng giữ IncrementalProjectValidator theo cache_key
+    (vd (company, project_id)) — bấm Validate lại chỉ verify các lô đã đổi.
+    """
+    code = (project.get("project_code") or "").strip()
+    if not code or not _validate_cache.enabled:
+        return build_existing_project_preview(project, sa_lots)
+
+    validator = _validate_cache.get(cache_key)
+    if validator is None:
+        validator = IncrementalProjectValidator()
+    # set lại mỗi lần để gia hạn TTL cho dự án đang được validate
+    _validate_cache.set(cache_key, validator)
+
+    verification = validator.run(_map_project_lots(project, sa_lots), code)
+    return _preview_from_verification(project, verification)
+
+
 async def fetch_all_lots_for_project(
     sa_list_lots_fn,
     client,
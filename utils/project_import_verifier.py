@@ -109,6 +109,43 @@ def quantize_lot_percent(pct: Decimal) -> Decimal:
     return pct.quantize(LOT_DEPOSIT_PERCENT_QUANTIZE, rounding=ROUND_HALF_UP)
 
 
+def lot_result(
+    lot: Dict[str, Any],
+    *,
+    errors: List[Dict[str, Any]],
+    warnings: List[Dict[str, Any]],
+    starting_price: Optional[int],
+    deposit: Optional[int],
+    lot_deposit_percent: Optional[str],
+) -> Dict[str, Any]:
+    """1 dòng `lots` của payload verify (status theo errors/warnings)."""
+    if errors:
+        status = "ERROR"
+    elif warnings:
+        status = "WARNING"
+    else:
+        status = "VALID"
+    return {
+        "row": lot.get("row"),
+        "project_code": lot.get("project_code"),
+        "lot_code": lot.get("lot_code"),
+        "name": lot.get("name"),
+        "description": lot.get("description"),
+        # không hợp lệ -> giữ giá trị gốc để hiển thị
+        "starting_price": starting_price if starting_price is not None else lot.get("starting_price"),
+        "deposit_amount": deposit if deposit is not None else lot.get("deposit_amount"),
+        "bid_step_vnd": lot.get("bid_step_vnd"),
+        "area": lot.get("area"),
+        "lot_deposit_percent": lot_deposit_percent,
+        "status": status,
+        "errors": errors,
+        "warnings": warnings,
+        # clean ints for apply when valid
+        "starting_price_int": starting_price,
+        "deposit_amount_int": deposit,
+    }
+
+
 class ProjectImportVerifier:
     """
     Verify lô sau khi parse Excel.
@@ -319,29 +356,90 @@ class ProjectImportVerifier:
             )
         ]
 
+    # ----- Per-lot (dùng chung với IncrementalProjectValidator) -----
+    def check_lot(self, lot: Dict[str, Any]) -> Dict[str, Any]:
+        """Rule 1 + 2 của 1 lô (không phụ thuộc lô khác) + % cọc của lô nếu hợp lệ."""
+        errs, sp, dp = self.verify_integer_fields(lot)
+        warns = self.verify_value_range(starting_price=sp, deposit=dp)
+        valid = sp is not None and dp is not None and not errs
+        pct = None
+        if valid and sp > 0:
+            pct = (Decimal(dp) * Decimal(100)) / Decimal(sp)
+        return {
+            "errors": list(errs),
+            "warnings": list(warns),
+            "sp": sp,
+            "dp": dp,
+            "valid": valid,
+            "pct": pct,
+        }
+
+    def check_lot_in_project(
+        self,
+        starting_price: int,
+        lot_pct: Optional[Decimal],
+        average: Optional[Decimal],
+        representative: Optional[Decimal],
+    ) -> List[Dict[str, Any]]:
+        """Pass 2 cho lô hợp lệ: outlier theo trung bình + % cọc khác % đại diện dự án."""
+        warnings = self.verify_starting_price_outlier(starting_price, average)
+        if lot_pct is not None:
+            warnings.extend(self.verify_lot_deposit_percent(lot_pct, representative))
+        return warnings
+
+    def project_summary(
+        self,
+        project_code: str,
+        *,
+        total_lots: int,
+        valid_lots: int,
+        error_count: int,
+        warning_count: int,
+        total_starting: int,
+        total_deposit: int,
+        project_pct: Optional[Decimal],
+        representative: Optional[Decimal],
+        average: Optional[Decimal],
+        project_warnings: List[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        pct_q = project_pct.quantize(Decimal("0.0001")) if project_pct is not None else None
+        return {
+            "project_code": project_code,
+            "totalLots": total_lots,
+            "validLots": valid_lots,
+            "errorCount": error_count,
+            "warningCount": warning_count,
+            "totalStartingPrice": total_starting,
+            "totalDeposit": total_deposit,
+            "projectDepositPercent": float(pct_q) if pct_q is not None else None,
+            "projectDepositPercentRaw": str(pct_q) if pct_q is not None else None,
+            "representativeDepositPercent": (
+                float(representative) if representative is not None else None
+            ),
+            "averageStartingPrice": (
+                float(average.quantize(Decimal("1"))) if average is not None else None
+            ),
+            "projectWarnings": project_warnings,
+            "projectErrors": [],
+        }
+
     def run(self) -> Dict[str, Any]:
         """
         Returns verification payload for preview.
         """
         # Pass 1: integers + valid pairs
-        working: List[Dict[str, Any]] = []
+        working: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
         for lot in self.lots:
             row = dict(lot)
             row_no = int(row.get("row") or row.get("row_number") or 0)
-            errs, sp, dp = self.verify_integer_fields(row)
-            warns = self.verify_value_range(starting_price=sp, deposit=dp)
-            row["_sp"] = sp
-            row["_dp"] = dp
-            row["_errors"] = list(errs)
-            row["_warnings"] = list(warns)
             row["row"] = row_no or row.get("row")
-            working.append(row)
+            working.append((row, self.check_lot(row)))
 
         # Group by project for project-level metrics
-        by_project: Dict[str, List[Dict[str, Any]]] = {}
-        for row in working:
+        by_project: Dict[str, List[Tuple[Dict[str, Any], Dict[str, Any]]]] = {}
+        for row, chk in working:
             pc = row.get("project_code") or ""
-            by_project.setdefault(pc, []).append(row)
+            by_project.setdefault(pc, []).append((row, chk))
 
         project_summaries: List[Dict[str, Any]] = []
         lot_results: List[Dict[str, Any]] = []
@@ -352,121 +450,61 @@ class ProjectImportVerifier:
         grand_valid = 0
 
         for project_code, rows in by_project.items():
-            valid_pairs: List[Tuple[Dict[str, Any], int, int]] = []
-            for row in rows:
-                sp, dp = row["_sp"], row["_dp"]
-                if sp is not None and dp is not None and not row["_errors"]:
-                    valid_pairs.append((row, sp, dp))
-
-            valid_sps = [sp for _, sp, _ in valid_pairs]
-            avg = self.calculate_average_starting_price(valid_sps)
-            total_sp = sum(sp for _, sp, _ in valid_pairs)
-            total_dp = sum(dp for _, _, dp in valid_pairs)
+            valid = [chk for _, chk in rows if chk["valid"]]
+
+            avg = self.calculate_average_starting_price([c["sp"] for c in valid])
+            total_sp = sum(c["sp"] for c in valid)
+            total_dp = sum(c["dp"] for c in valid)
             project_pct = self.calculate_project_deposit_percent(total_dp, total_sp)
             project_warnings = self.verify_project_deposit_percent(project_pct)
+            representative = self.determine_representative_deposit_percent(
+                [c["pct"] for c in valid if c["pct"] is not None]
+            )
 
-            lot_pcts: List[Decimal] = []
-            for _, sp, dp in valid_pairs:
-                if sp > 0:
-                    lot_pcts.append((Decimal(dp) * Decimal(100)) / Decimal(sp))
-
-            representative = self.determine_representative_deposit_percent(lot_pcts)
-
-            # Pass 2: outliers + % differ
-            for row, sp, dp in valid_pairs:
-                row["_warnings"].extend(self.verify_starting_price_outlier(sp, avg))
-                if sp > 0:
-                    lp = (Decimal(dp) * Decimal(100)) / Decimal(sp)
-                    row["_warnings"].extend(
-                        self.verify_lot_deposit_percent(lp, representative)
-                    )
-                    row["_lot_deposit_percent"] = str(quantize_lot_percent(lp))
-                else:
-                    row["_lot_deposit_percent"] = None
-
-            # Build lot result rows for this project
+            # Pass 2: outliers + % differ, then lot result rows for this project
             p_err = 0
             p_warn = 0
-            for row in rows:
-                errors = row["_errors"]
-                warnings = row["_warnings"]
-                if errors:
-                    status = "ERROR"
-                elif warnings:
-                    status = "WARNING"
-                else:
-                    status = "VALID"
-                p_err += len(errors)
-                p_warn += len(warnings)
-
-                # Sanitize amounts for display / re-apply
-                sp_out = row["_sp"]
-                dp_out = row["_dp"]
-                # if invalid, keep original for display
-                if sp_out is None and row.get("starting_price") not in (None, ""):
-                    sp_display = row.get("starting_price")
-                else:
-                    sp_display = sp_out
-                if dp_out is None and row.get("deposit_amount") not in (None, ""):
-                    dp_display = row.get("deposit_amount")
-                else:
-                    dp_display = dp_out
-
-                lot_results.append(
-                    {
-                        "row": row.get("row"),
-                        "project_code": row.get("project_code"),
-                        "lot_code": row.get("lot_code"),
-                        "name": row.get("name"),
-                        "description": row.get("description"),
-                        "starting_price": sp_display if sp_out is not None else row.get("starting_price"),
-                        "deposit_amount": dp_display if dp_out is not None else row.get("deposit_amount"),
-                        "bid_step_vnd": row.get("bid_step_vnd"),
-                        "area": row.get("area"),
-                        "lot_deposit_percent": row.get("_lot_deposit_percent"),
-                        "status": status,
-                        "errors": errors,
-                        "warnings": warnings,
-                        # clean ints for apply when valid
-                        "starting_price_int": sp_out,
-                        "deposit_amount_int": dp_out,
-                    }
+            for row, chk in rows:
+                warnings = list(chk["warnings"])
+                lot_pct_str = None
+                if chk["valid"]:
+                    warnings.extend(
+                        self.check_lot_in_project(chk["sp"], chk["pct"], avg, representative)
+                    )
+                    if chk["pct"] is not None:
+                        lot_pct_str = str(quantize_lot_percent(chk["pct"]))
+                lr = lot_result(
+                    row,
+                    errors=chk["errors"],
+                    warnings=warnings,
+                    starting_price=chk["sp"],
+                    deposit=chk["dp"],
+                    lot_deposit_percent=lot_pct_str,
                 )
+                p_err += len(lr["errors"])
+                p_warn += len(lr["warnings"])
+                lot_results.append(lr)
 
             total_error_count += p_err
             total_warning_count += p_warn
             grand_sp += total_sp
             grand_dp += total_dp
-            grand_valid += len(valid_pairs)
+            grand_valid += len(valid)
 
             project_summaries.append(
-                {
-                    "project_code": project_code,
-                    "totalLots": len(rows),
-                    "validLots": len(valid_pairs),
-                    "errorCount": p_err,
-                    "warningCount": p_warn,
-                    "totalStartingPrice": total_sp,
-                    "totalDeposit": total_dp,
-                    "projectDepositPercent": (
-                        float(project_pct.quantize(Decimal("0.0001")))
-                        if project_pct is not None
-                        else None
-                    ),
-                    "projectDepositPercentRaw": (
-                        str(project_pct.quantize(Decimal("0.0001")))
-                        if project_pct is not None
-                        else None
-                    ),
-                    "representativeDepositPercent": (
-                        float(representative) if representative is not None else None
-                    ),
-                    "averageStartingPrice": (
-                        float(avg.quantize(Decimal("1"))) if avg is not None else None
-                    ),
-                    "projectWarnings": project_warnings,
-                    "projectErrors": [],
-                }
+                self.project_summary(
+                    project_code,
+                    total_lots=len(rows),
+                    valid_lots=len(valid),
+                    error_count=p_err,
+                    warning_count=p_warn,
+                    total_starting=total_sp,
+                    total_deposit=total_dp,
+                    project_pct=project_pct,
+                    representative=representative,
+                    average=avg,
+                    project_warnings=project_warnings,
+                )
             )
 
         # Flatten project warnings into row-less count for UI
@@ -0,0 +1,231 @@
+# utils/render_cache.py
+"""
+Cache nội dung tài liệu đã render (HTML, PDF) trên đĩa — hợp đồng, quy chế, biên bản.
+
+- HTML: key = sha256(template path + mtime template và mọi partial include/extends/import
+  + JSON ngữ cảnh render). Template có include tên động -> thêm mtime mới nhất của cả
+  thư mục templates.
+  Ngữ cảnh vẫn lấy mới từ Service A mỗi lần (đã qua kiểm quyền), chỉ bỏ qua Jinja.
+- PDF: key = sha256(HTML) — cùng HTML thì PDF giống hệt, không cần chạy xhtml2pdf lại.
+- File nằm theo instance: RENDER_CACHE_DIR/{instance_id}/{key}.{html|pdf}; lưu/chốt/mở lại
+  instance (services.docgen_v1_client) xoá thư mục của instance đó.
+- Giới hạn dung lượng RENDER_CACHE_MAX_MB, vượt thì xoá file ít dùng nhất (mtime, được
+  "touch" mỗi lần hit).
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+RENDER_CACHE_ENABLED = os.getenv("RENDER_CACHE_ENABLED", "1").strip().lower() not in ("0", "false", "no", "off")
+RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "var", "render_cache"
+)
+RENDER_CACHE_MAX_MB = float(os.getenv("RENDER_CACHE_MAX_MB", "256"))
+
+# template -> (file của nó + partial tham chiếu tĩnh, có tham chiếu động, mtime các file)
+_template_deps: Dict[str, Tuple[Tuple[str, ...], bool, Tuple[float, ...]]] = {}
+_total_bytes: Optional[int] = None
+
+
+def _mtimes(files: Tuple[str, ...]) -> Tuple[float, ...]:
+    out = []
+    for f in files:
+        try:
+            out.append(os.stat(f).st_mtime)
+        except OSError:
+            out.append(0.0)
+    return tuple(out)
+
+
+def _scan_deps(env, template_path: str) -> Tuple[Tuple[str, ...], bool]:
+    """File của template + mọi template include/extends/import (đệ quy, tên tĩnh)."""
+    from jinja2 import meta
+
+    files = []
+    dynamic = False
+    seen = set()
+    todo = [template_path]
+    while todo:
+        name = todo.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        try:
+            source, filename, _ = env.loader.get_source(env, name)
+        except Exception:
+            continue
+        if filename:
+            files.append(filename)
+        try:
+            refs = meta.find_referenced_templates(env.parse(source))
+        except Exception:
+            dynamic = True
+            continue
+        for ref in refs:
+            if ref is None:
+                dynamic = True
+            else:
+                todo.append(ref)
+    return tuple(files), dynamic
+
+
+def _newest_template_mtime(env) -> float:
+    newest = 0.0
+    for base in getattr(env.loader, "searchpath", None) or []:
+        for root, _dirs, names in os.walk(base):
+            for n in names:
+                try:
+                    newest = max(newest, os.stat(os.path.join(root, n)).st_mtime)
+                except OSError:
+                    pass
+    return newest
+
+
+def _template_fingerprint(template_path: str, env=None) -> str:
+    """mtime của template + partial; đổi 1 file (kể cả thêm include mới) -> fingerprint mới."""
+    if env is None:
+        from utils.templates import templates
+
+        env = templates.env
+    entry = _template_deps.get(template_path)
+    if entry is None or _mtimes(entry[0]) != entry[2]:
+        files, dynamic = _scan_deps(env, template_path)
+        entry = (files, dynamic, _mtimes(files))
+        _template_deps[template_path] = entry
+    parts = list(entry[2])
+    if entry[1]:
+        parts.append(_newest_template_mtime(env))
+    return ",".join(repr(x) for x in parts)
+
+
+def html_cache_key(template_path: str, payload: Dict[str, Any]) -> str:
+    h = hashlib.sha256()
+    h.update(f"{template_path}\0{_template_fingerprint(template_path)}\0".encode("utf-8"))
+    h.update(json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _path(instance_id: int, key: str, ext: str) -> str:
+    return os.path.join(RENDER_CACHE_DIR, str(int(instance_id)), f"{key}.{ext}")
+
+
+def _iter_files():
+    for root, _dirs, files in os.walk(RENDER_CACHE_DIR):
+        for name in files:
+            p = os.path.join(root, name)
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            yield p, st
+
+
+def _read(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)
+        return data
+    except OSError:
+        return None
+
+
+def _evict(limit: int) -> None:
+    global _total_bytes
+    files = sorted(_iter_files(), key=lambda x: x[1].st_mtime)
+    total = sum(st.st_size for _, st in files)
+    target = int(limit * 0.9)
+    for p, st in files:
+        if total <= target:
+            break
+        try:
+            os.remove(p)
+            total -= st.st_size
+        except OSError:
+            pass
+    _total_bytes = total
+
+
+def _write(path: str, data: bytes) -> None:
+    global _total_bytes
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    if _total_bytes is None:
+        _total_bytes = sum(st.st_size for _, st in _iter_files())
+    else:
+        _total_bytes += len(data)
+    limit = int(RENDER_CACHE_MAX_MB * 1024 * 1024)
+    if limit > 0 and _total_bytes > limit:
+        _evict(limit)
+
+
+async def _get(instance_id: int, key: str, ext: str) -> Optional[bytes]:
+    if not RENDER_CACHE_ENABLED:
+        return None
+    path = _path(instance_id, key, ext)
+    if not os.path.exists(path):
+        return None
+    return await asyncio.to_thread(_read, path)
+
+
+async def _put(instance_id: int, key: str, ext: str, data: bytes) -> None:
+    if not RENDER_CACHE_ENABLED:
+        return
+    try:
+        await asyncio.to_thread(_write, _path(instance_id, key, ext), data)
+    except Exception as e:
+        logger.warning("render cache write failed (instance=%s): %s", instance_id, e)
+
+
+async def cached_html(
+    instance_id: int,
+    template_path: str,
+    payload: Dict[str, Any],
+    render: Callable[[], Union[str, Awaitable[str]]],
+) -> str:
+    """Trả HTML từ cache nếu (template + partial, mtime, payload) đã render; không thì render và lưu."""
+    key = html_cache_key(template_path, payload)
+    hit = await _get(instance_id, key, "html")
+    if hit is not None:
+        return hit.decode("utf-8")
+    html = render()
+    if inspect.isawaitable(html):
+        html = await html
+    await _put(instance_id, key, "html", html.encode("utf-8"))
+    return html
+
+
+async def cached_pdf(
+    instance_id: int,
+    html: str,
+    render: Callable[[str], Awaitable[bytes]],
+) -> bytes:
+    """PDF theo nội dung HTML; render (thường là pool PDF) chỉ chạy khi chưa có."""
+    key = hashlib.sha256(html.encode("utf-8")).hexdigest()
+    hit = await _get(instance_id, key, "pdf")
+    if hit is not None:
+        return hit
+    pdf = await render(html)
+    await _put(instance_id, key, "pdf", pdf)
+    return pdf
+
+
+def invalidate_rendered(instance_id: int) -> None:
+    """Xoá mọi bản render của 1 instance (sau lưu/chốt/mở lại)."""
+    global _total_bytes
+    d = os.path.join(RENDER_CACHE_DIR, str(int(instance_id)))
+    if os.path.isdir(d):
+        shutil.rmtree(d, ignore_errors=True)
+        _total_bytes = None
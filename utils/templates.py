@@ -1,11 +1,52 @@
 # utils/templates.py
+import jinja2
+from starlette.responses import StreamingResponse
 from starlette.templating import Jinja2Templates
 from .auth import get_access_token, fetch_me, account_menu_info  # re-use
+import logging
 import os
+from typing import Any, Dict, Iterator, Mapping, Optional
 
-templates = Jinja2Templates(directory="templates")
+logger = logging.getLogger(__name__)
+
+_TRUTHY = ("1", "true", "yes", "on")
+
+# Bytecode cache trên đĩa: worker mới / template bị đẩy khỏi cache RAM không phải compile lại.
+TEMPLATE_BYTECODE_CACHE = os.getenv("TEMPLATE_BYTECODE_CACHE", "1").strip().lower() in _TRUTHY
+TEMPLATE_BYTECODE_CACHE_DIR = os.getenv("TEMPLATE_BYTECODE_CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "var", "jinja_bytecode"
+)
+# 0 ở production: không stat file template mỗi lần render (sửa template phải restart)
+TEMPLATE_AUTO_RELOAD = os.getenv("TEMPLATE_AUTO_RELOAD", "1").strip().lower() in _TRUTHY
+TEMPLATE_CACHE_SIZE = int(os.getenv("TEMPLATE_CACHE_SIZE", "400"))
+# 1: compile sẵn toàn bộ template khi startup (nền, trong thread)
+TEMPLATE_PRECOMPILE = os.getenv("TEMPLATE_PRECOMPILE", "0").strip().lower() in _TRUTHY
+
+
+def _bytecode_cache() -> Optional[jinja2.BytecodeCache]:
+    if not TEMPLATE_BYTECODE_CACHE:
+        return None
+    try:
+        os.makedirs(TEMPLATE_BYTECODE_CACHE_DIR, exist_ok=True)
+        return jinja2.FileSystemBytecodeCache(TEMPLATE_BYTECODE_CACHE_DIR)
+    except OSError as e:
+        logger.warning("jinja bytecode cache disabled (%s): %s", TEMPLATE_BYTECODE_CACHE_DIR, e)
+        return None
+
+
+templates = Jinja2Templates(
+    env=jinja2.Environment(
+        loader=jinja2.FileSystemLoader("templates"),
+        autoescape=True,
+        auto_reload=TEMPLATE_AUTO_RELOAD,
+        cache_size=TEMPLATE_CACHE_SIZE,
+        bytecode_cache=_bytecode_cache(),
+    )
+)
 
 ACCESS_COOKIE_NAME = os.getenv("ACCESS_COOKIE_NAME", "access_token")
+# trang in lớn (hàng nghìn phiếu/dòng) stream ra theo khối ~N KB thay vì render 1 chuỗi
+TEMPLATE_STREAM_CHUNK_KB = max(4, int(os.getenv("TEMPLATE_STREAM_CHUNK_KB", "64")))
 
 
 def is_logged_in(request) -> bool:
@@ -28,3 +69,61 @@ def datetimeformat(value, fmt="%d/%m/%Y %H:%M:%S"):
         return str(value)
 
 templates.env.filters["datetimeformat"] = datetimeformat
+
+
+def _iter_template_chunks(template, context: Dict[str, Any], chunk_chars: int) -> Iterator[bytes]:
+    buf = []
+    size = 0
+    try:
+        for piece in template.generate(context):
+            buf.append(piece)
+            size += len(piece)
+            if size >= chunk_chars:
+                yield "".join(buf).encode("utf-8")
+                buf.clear()
+                size = 0
+    except Exception:
+        # header 200 đã gửi — chỉ log được, client nhận trang bị cắt
+        logger.exception("stream template %s failed mid-response", template.name)
+        raise
+    if buf:
+        yield "".join(buf).encode("utf-8")
+
+
+def stream_template(
+    name: str,
+    context: Dict[str, Any],
+    *,
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None,
+) -> StreamingResponse:
+    """
+    Như templates.TemplateResponse(name, context) nhưng dùng Jinja generate(): trình duyệt
+    nhận & dàn trang những trang đầu ngay, bộ nhớ đầu ra mỗi request chỉ ~1 khối.
+    Lỗi template trước byte đầu tiên (không tìm thấy file) vẫn raise như bình thường.
+    """
+    request = context.get("request")
+    if request is None:
+        raise ValueError('context must include a "request" key')
+    template = templates.get_template(name)
+    ctx = dict(context)
+    for processor in templates.context_processors:
+        ctx.update(processor(request))
+    return StreamingResponse(
+        _iter_template_chunks(template, ctx, TEMPLATE_STREAM_CHUNK_KB * 1024),
+        status_code=status_code,
+        headers=headers,
+        media_type="text/html; charset=utf-8",
+    )
+
+
+def precompile_templates() -> int:
+    """Nạp (compile + ghi bytecode cache) mọi template .html; trả số template đã nạp."""
+    n = 0
+    for name in templates.env.list_templates(filter_func=lambda x: x.endswith(".html")):
+        try:
+            templates.env.get_template(name)
+            n += 1
+        except Exception as e:
+            logger.warning("precompile template %s failed: %s", name, e)
+    return n
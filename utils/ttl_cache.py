@@ -0,0 +1,62 @@
+# utils/ttl_cache.py
+"""
+Cache in-process có TTL + giới hạn số key (LRU) — dùng cho các blob đọc nhiều,
+đổi ít lấy từ Service A. Mỗi worker giữ cache riêng; không dùng cho dữ liệu
+cần nhất quán tuyệt đối giữa các worker.
+"""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, ttl_seconds: float, maxsize: int = 1024) -> None:
+        self.ttl_seconds = float(ttl_seconds)
+        self.maxsize = max(1, int(maxsize))
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if not self.enabled:
+            return default
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            return default
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else float(ttl_seconds)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Xoá mọi key thoả predicate; trả số key đã xoá."""
+        keys = [k for k in self._data if predicate(k)]
+        for k in keys:
+            self._data.pop(k, None)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,148 @@
+# utils/zip_stream.py
+"""
+Xuất hàng loạt tài liệu thành 1 file ZIP stream — render song song (N worker), tài liệu
+nào xong thì ghi ngay vào ZIP và đẩy bytes ra client. Bộ nhớ chỉ giữ tối đa ~2N tài
+liệu đang render/chờ ghi, không phụ thuộc tổng số tài liệu.
+
+Dùng: StreamingResponse(stream_documents_zip(jobs, as_pdf=...), media_type="application/zip").
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+import unicodedata
+import zipfile
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BULK_EXPORT_CONCURRENCY = max(1, int(os.getenv("BULK_EXPORT_CONCURRENCY", "4")))
+BULK_EXPORT_PDF_RETRY_SECONDS = float(os.getenv("BULK_EXPORT_PDF_RETRY_SECONDS", "300"))
+
+_DONE = object()
+
+
+@dataclass
+class DocumentJob:
+    """1 tài liệu cần render: tên file (không đuôi), template Jinja và context."""
+
+    name: str
+    template: str
+    context: Dict[str, Any] = field(default_factory=dict)
+
+
+def safe_filename(*parts: Any, default: str = "tai-lieu") -> str:
+    """Ghép phần tên, bỏ dấu tiếng Việt, chỉ giữ [A-Za-z0-9_-]."""
+    raw = "_".join(str(p).strip() for p in parts if p is not None and str(p).strip())
+    raw = unicodedata.normalize("NFKD", raw.replace("đ", "d").replace("Đ", "D"))
+    raw = "".join(ch for ch in raw if not unicodedata.combining(ch))
+    raw = re.sub(r"[^A-Za-z0-9_-]+", "-", raw).strip("-_")
+    return raw[:120] or default
+
+
+class _ChunkSink:
+    """File-like chỉ ghi (không seek) — zipfile tự dùng data descriptor cho stream."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._pos = 0
+
+    def write(self, b: bytes) -> int:
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+async def _render_one(job: DocumentJob, as_pdf: bool) -> bytes:
+    from utils.templates import templates
+
+    tpl = templates.get_template(job.template)
+    html = await asyncio.to_thread(tpl.render, job.context)
+    if not as_pdf:
+        return html.encode("utf-8")
+
+    from utils.pdf_render_pool import PdfRenderBusy, render_pdf
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + BULK_EXPORT_PDF_RETRY_SECONDS
+    while True:
+        try:
+            return await render_pdf(html)
+        except PdfRenderBusy:
+            # pool đang bận (có người tải PDF lẻ) — xuất hàng loạt chờ, không báo lỗi ngay
+            if loop.time() > deadline:
+                raise
+            await asyncio.sleep(0.5)
+
+
+async def stream_documents_zip(
+    jobs: Iterable[DocumentJob],
+    *,
+    as_pdf: bool = False,
+    concurrency: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """Async generator bytes ZIP; tài liệu lỗi được liệt kê trong _loi.txt thay vì làm hỏng cả file."""
+    n_workers = max(1, int(concurrency or BULK_EXPORT_CONCURRENCY))
+    ext = "pdf" if as_pdf else "html"
+    job_iter = iter(jobs)
+    results: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=n_workers)
+
+    async def worker() -> None:
+        for job in job_iter:  # iterator dùng chung: mỗi job chỉ 1 worker lấy
+            try:
+                data: Optional[bytes] = await _render_one(job, as_pdf)
+                err = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("bulk export %s failed: %s", job.name, e)
+                data, err = None, str(e) or e.__class__.__name__
+            await results.put((job.name, data, err))
+        await results.put(_DONE)
+
+    tasks = [asyncio.create_task(worker()) for _ in range(n_workers)]
+    sink = _ChunkSink()
+    used: Dict[str, int] = {}
+    errors: List[Tuple[str, str]] = []
+    try:
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            alive = n_workers
+            while alive:
+                item = await results.get()
+                if item is _DONE:
+                    alive -= 1
+                    continue
+                name, data, err = item
+                if data is None:
+                    errors.append((name, err or ""))
+                    continue
+                k = used.get(name, 0)
+                used[name] = k + 1
+                arcname = f"{name}.{ext}" if k == 0 else f"{name}-{k + 1}.{ext}"
+                zf.writestr(arcname, data)
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+            if errors:
+                zf.writestr("_loi.txt", "\n".join(f"{n}: {e}" for n, e in errors))
+        tail = sink.drain()
+        if tail:
+            yield tail
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()